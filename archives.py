@@ -0,0 +1,253 @@
+"""Scan inside zip, tar and gzip archives without extracting them.
+
+With archives=ArchiveScanner() passed to scanner.iter_scan / scan_files,
+every file that is an archive (recognised by its magic bytes, not its
+name) is opened after it has been hashed, and each member is streamed
+from the decompressor through SHA-256 and the byte patterns. Nothing is
+written to disk. Members are reported as "archive.zip!dir/evil.exe" with
+ScanResult.container set to the archive on disk; nested archives are
+descended up to max_depth ("a.zip!b.tar.gz!evil.exe"). An archive with an
+infected member is reported as infected itself, so it can be quarantined.
+
+Limits against zip bombs, per top-level archive: nesting depth, total
+unpacked bytes and number of members. When one is hit the archive gets an
+error result and the rest of it is not read; members scanned until then
+are still reported.
+
+Members of large zip files are hashed in parallel: every thread opens the
+zip on its own, and zlib and hashlib release the GIL. tar and gzip are one
+compressed stream and are read in order.
+
+An archive is read twice: once by the scan engine for its own hash (not
+at all on a hash cache hit), then here to unpack it. The second read
+mostly comes from the page cache. Sharing one read would mean holding
+the whole archive in memory until its members have been scanned.
+"""
+import gzip
+import hashlib
+import io
+import os
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from scanner import ScanResult
+
+MEMBER_SEP = "!"
+DEFAULT_MAX_DEPTH = 3
+DEFAULT_MAX_MB = 1024  # unpacked bytes per top-level archive
+DEFAULT_MAX_MEMBERS = 10000
+MAX_NESTED_BYTES = 64 * 1024 * 1024  # nested archives are held in memory up to this size
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024  # zip files unpacking to more use several threads
+ARCHIVE_WORKERS = min(4, os.cpu_count() or 1)
+HEAD_BYTES = 512
+BLOCK = 256 * 1024
+
+ZIP, TAR, GZIP = "zip", "tar", "gzip"
+
+_buffers = threading.local()
+
+
+class ArchiveLimitError(Exception):
+    pass
+
+
+def archive_kind(head):
+    """ZIP, TAR, GZIP (a .tar.gz or a single gzip file) or None, from the first bytes."""
+    if head[:4] in (b"PK\x03\x04", b"PK\x05\x06"):
+        return ZIP
+    if head[:2] == b"\x1f\x8b":
+        return GZIP
+    if head[:3] == b"BZh" or head[:6] == b"\xfd7zXZ\x00":
+        return TAR  # only scanned inside when it is a compressed tar
+    if head[257:262] == b"ustar":
+        return TAR
+    return None
+
+
+def _buffer():
+    view = getattr(_buffers, "view", None)
+    if view is None:
+        view = _buffers.view = memoryview(bytearray(BLOCK))
+    return view
+
+
+class _Budget:
+    """Unpacked bytes and members left for one top-level archive (shared by threads)."""
+
+    def __init__(self, max_bytes, max_members):
+        self.max_bytes = max_bytes
+        self.max_members = max_members
+        self.bytes = 0
+        self.members = 0
+        self._lock = threading.Lock()
+
+    def member(self):
+        with self._lock:
+            self.members += 1
+            if self.members > self.max_members:
+                raise ArchiveLimitError(f"more than {self.max_members} members")
+
+    def read(self, n):
+        with self._lock:
+            self.bytes += n
+            if self.bytes > self.max_bytes:
+                raise ArchiveLimitError(f"more than {self.max_bytes // (1024 * 1024)} MB unpacked")
+
+
+class ArchiveScanner:
+    def __init__(self, max_depth=DEFAULT_MAX_DEPTH, max_mb=DEFAULT_MAX_MB,
+                 max_members=DEFAULT_MAX_MEMBERS, workers=ARCHIVE_WORKERS):
+        self.max_depth = max_depth
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_members = max_members
+        self.workers = workers
+
+    @classmethod
+    def from_settings(cls, settings):
+        """None unless archive scanning is switched on."""
+        if not settings.get("scan_archives", False):
+            return None
+        return cls(max_depth=settings.get("archive_max_depth", DEFAULT_MAX_DEPTH),
+                   max_mb=settings.get("archive_max_mb", DEFAULT_MAX_MB),
+                   max_members=settings.get("archive_max_members", DEFAULT_MAX_MEMBERS))
+
+    def scan(self, path, signatures, metrics=None):
+        """ScanResults for the members of the archive at path ([] if it is not one)."""
+        results = []
+        try:
+            with open(path, "rb") as f:
+                kind = archive_kind(f.read(HEAD_BYTES))
+                if kind is None:
+                    return results
+                f.seek(0)
+                budget = _Budget(self.max_bytes, self.max_members)
+                for result in self._members(f, path, kind, signatures, budget, 1, path):
+                    results.append(result)
+        except ArchiveLimitError as e:
+            results.append(ScanResult(path, None, False, f"archive not fully scanned: {e}",
+                                      container=path))
+        except Exception as e:
+            results.append(ScanResult(path, None, False, f"unreadable archive: {e}", container=path))
+        if metrics is not None and results:
+            metrics.count("archive_members", len(results))
+        return results
+
+    # --- formats ---
+    def _members(self, f, display, kind, signatures, budget, depth, container):
+        if kind == ZIP:
+            yield from self._zip(f, display, signatures, budget, depth, container)
+            return
+        try:
+            tar = tarfile.open(fileobj=f, mode="r|*")
+        except tarfile.ReadError:
+            if kind != GZIP:
+                return  # bz2 / xz that is not a tar: not an archive we descend into
+            f.seek(0)
+            name = os.path.basename(display.rpartition(MEMBER_SEP)[2])
+            name = name[:-3] if name.endswith(".gz") else name
+            budget.member()
+            with gzip.GzipFile(fileobj=f) as member:
+                yield from self._member(member, display + MEMBER_SEP + name, signatures, budget,
+                                        depth, container)
+            return
+        with tar:
+            for info in tar:
+                budget.member()
+                if not info.isfile():
+                    continue
+                yield from self._member(tar.extractfile(info), display + MEMBER_SEP + info.name,
+                                        signatures, budget, depth, container)
+
+    def _zip(self, f, display, signatures, budget, depth, container):
+        with zipfile.ZipFile(f) as zf:
+            infos = [info for info in zf.infolist() if not info.is_dir()]
+            # Never queue more than the member limit allows
+            left = budget.max_members - budget.members
+            over = len(infos) > left
+            infos = infos[:max(0, left)]
+            unpacked = sum(info.file_size for info in infos)
+            if depth == 1 and self.workers > 1 and len(infos) > 1 and unpacked >= PARALLEL_MIN_BYTES:
+                yield from self._zip_parallel(container, infos, signatures, budget)
+            else:
+                for info in infos:
+                    budget.member()
+                    with zf.open(info) as member:
+                        yield from self._member(member, display + MEMBER_SEP + info.filename,
+                                                signatures, budget, depth, container)
+        if over:
+            raise ArchiveLimitError(f"more than {budget.max_members} members")
+
+    def _zip_parallel(self, path, infos, signatures, budget):
+        local = threading.local()
+        opened = []
+        lock = threading.Lock()
+
+        def scan_member(info):
+            zf = getattr(local, "zf", None)
+            if zf is None:
+                zf = local.zf = zipfile.ZipFile(path)
+                with lock:
+                    opened.append(zf)
+            with zf.open(info) as member:
+                return list(self._member(member, path + MEMBER_SEP + info.filename, signatures,
+                                         budget, 1, path))
+
+        for _ in infos:
+            budget.member()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sict-archive")
+        try:
+            # Results come back in archive order
+            for future in [pool.submit(scan_member, info) for info in infos]:
+                yield from future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            for zf in opened:
+                zf.close()
+
+    # --- one member ---
+    def _member(self, f, display, signatures, budget, depth, container):
+        """Hash one member as it is unpacked; descend into it if it is an archive too."""
+        sha256 = hashlib.sha256()
+        stream = signatures.patterns.stream() if signatures.patterns else None
+        buf = _buffer()
+        nested = kind = None
+        size = 0
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            budget.read(n)
+            block = buf[:n]
+            sha256.update(block)
+            if stream is not None:
+                stream.feed(block)
+            if size == 0 and depth < self.max_depth:
+                kind = archive_kind(block[:HEAD_BYTES])
+                if kind is not None:
+                    nested = io.BytesIO()
+            if nested is not None:
+                if size + n > MAX_NESTED_BYTES:
+                    nested = None
+                else:
+                    nested.write(block)
+            size += n
+        digest = sha256.digest()
+        match = stream.match if stream is not None else None
+        yield ScanResult(display, digest.hex(), digest in signatures or match is not None, None, size,
+                         None, match, container)
+        if kind is None:
+            return
+        if nested is None:
+            yield ScanResult(display, None, False,
+                             f"nested archive over {MAX_NESTED_BYTES // (1024 * 1024)} MB not scanned inside",
+                             size, container=container)
+            return
+        nested.seek(0)
+        try:
+            yield from self._members(nested, display, kind, signatures, budget, depth + 1, container)
+        except ArchiveLimitError:
+            raise
+        except Exception as e:
+            yield ScanResult(display, None, False, f"unreadable archive: {e}", size, container=container)
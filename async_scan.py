@@ -0,0 +1,170 @@
+"""asyncio front end to the scan engine, for embedding in async services.
+
+    async for result in scan_async("/srv/share", signatures, cache=cache):
+        ...
+    result = await scan_file_async("/srv/upload/a.pdf", signatures, cache=cache)
+
+scan_async takes a directory (walked in batches off the event loop), an
+iterable of paths or an async iterable of paths, and yields ScanResults in
+completion order. Files are hashed on a thread pool (workers threads, or an
+existing executor); the event loop only keeps one future per file in
+flight, never a thread or task per file.
+
+Backpressure: at most max_pending files are hashing or waiting to be
+consumed. When the consumer stops reading, no new files are submitted and
+the walk pauses too. Cancellation replaces scanner.scan_stopped: cancel the
+consuming task or leave the async for loop (the generator is closed) and
+files not yet hashed are dropped; a file already being hashed finishes on
+its thread and its result is discarded.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import scanner
+
+DEFAULT_MAX_PENDING = 4  # files in flight per worker
+WALK_BATCH = 256  # directory entries fetched per hop to the walk thread
+MAX_CHUNK = 16  # files hashed per executor call when many are ready at once
+
+
+def _take(iterator, n):
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= n:
+            break
+    return batch
+
+
+async def _batches(source, stopped, loop):
+    """Lists of targets from source, as many as are ready at once."""
+    if isinstance(source, (str, os.PathLike)):
+        entries = scanner.walk_entries(source, stopped)
+        while True:
+            # walk_entries blocks on the file system: advance it on the default executor
+            batch = await loop.run_in_executor(None, _take, entries, WALK_BATCH)
+            if not batch:
+                return
+            yield batch
+    elif hasattr(source, "__aiter__"):
+        async for target in source:
+            yield [target]
+    else:
+        targets = iter(source)
+        while True:
+            batch = _take(targets, WALK_BATCH)
+            if not batch:
+                return
+            yield batch
+
+
+async def scan_async(source, signatures=None, workers=scanner.DEFAULT_WORKERS, cache=None,
+                     executor=None, max_pending=None, metrics=None, archives=None, dedup=None):
+    """Yield a ScanResult for every file of source as soon as it is scanned.
+
+    source is a directory, or an iterable / async iterable of paths or
+    os.DirEntry objects. The options are the same as scanner.scan_files;
+    max_pending (default workers * 4) bounds the files in flight.
+
+    When many files are ready at once (a walked directory), they go to the
+    pool in chunks of up to MAX_CHUNK, so thousands of small files do not
+    cost one event-loop round trip each.
+    """
+    loop = asyncio.get_running_loop()
+    signatures = scanner.as_signatures(signatures)
+    directory = run = None
+    if isinstance(source, (str, os.PathLike)):
+        source = directory = os.path.abspath(source)
+        run = cache.begin_run() if cache is not None else None
+    stopped = threading.Event()
+    max_pending = max_pending or workers * DEFAULT_MAX_PENDING
+    window = asyncio.Semaphore(max_pending)
+    done = asyncio.Queue()  # finished futures, bounded by window
+    futures = set()
+    outstanding = 0
+    owned = None
+    if executor is None:
+        executor = owned = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sict-async")
+
+    def scan_chunk(targets):
+        results = []
+        for target in targets:
+            if stopped.is_set():
+                break
+            results.extend(scanner.scan_entry(target, signatures, cache, metrics, archives, dedup, run))
+        return len(targets), results
+
+    def finished(future):
+        futures.discard(future)
+        if not future.cancelled():
+            done.put_nowait(future)
+
+    async def feed():
+        nonlocal outstanding
+        try:
+            async for batch in _batches(source, stopped, loop):
+                # Enough chunks to keep every worker busy, none bigger than MAX_CHUNK
+                size = max(1, min(MAX_CHUNK, len(batch) // workers, max_pending))
+                for i in range(0, len(batch), size):
+                    chunk = batch[i:i + size]
+                    for _ in chunk:
+                        await window.acquire()
+                    outstanding += len(chunk)
+                    future = loop.run_in_executor(executor, scan_chunk, chunk)
+                    futures.add(future)
+                    future.add_done_callback(finished)
+        finally:
+            done.put_nowait(None)  # no more files
+
+    feeder = loop.create_task(feed())
+    feeding = True
+    completed = False
+    try:
+        while feeding or outstanding:
+            future = await done.get()
+            if future is None:
+                feeding = False
+                continue
+            files, results = future.result()
+            outstanding -= files
+            for _ in range(files):
+                window.release()
+            for result in results:
+                if metrics is not None:
+                    _count(metrics, result)
+                yield result
+        await feeder  # raises if the walk or the path source failed
+        completed = True
+    finally:
+        stopped.set()
+        feeder.cancel()
+        for future in futures:
+            future.cancel()
+        if owned is not None:
+            owned.shutdown(wait=False, cancel_futures=True)
+        if metrics is not None:
+            metrics.finish()
+        if cache is not None:
+            # Writes the batched rows: a disk write, so not on the event loop
+            await loop.run_in_executor(None, cache.flush)
+    if directory is not None and cache is not None and completed:
+        await loop.run_in_executor(None, cache.prune, directory, run)
+
+
+def _count(metrics, result):
+    # Same counters as scanner.scan_files
+    metrics.count("files")
+    if result.error:
+        metrics.count("errors")
+    elif result.infected:
+        metrics.count("infected")
+    elif result.skipped:
+        metrics.count("skipped_" + result.skipped)
+
+
+async def scan_file_async(target, signatures=None, cache=None, executor=None):
+    """scanner.scan_file on executor (the loop's default if None)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, scanner.scan_file, target, signatures, cache)
@@ -0,0 +1,348 @@
+"""Benchmark suite for the scan pipeline, with JSON output for regression checks.
+
+    python benchmarks/bench_scan.py [--scale 1.0] [--workers N] [-o results.json]
+    python benchmarks/bench_scan.py --compare old.json -o new.json
+
+Synthetic trees are generated from a fixed seed, so two runs with the same
+--scale scan the same bytes. Shapes:
+
+    tiny     many 0-2 KiB files (--scale 10 for about a million)
+    huge     a few large files
+    deep     a long chain of nested directories
+    mixed    assorted sizes, about 1% of files match the signature DB
+
+Every measurement runs in a fresh process. Timings are repeated (--repeat,
+default 3) and the median is reported with the spread between runs; a
+rate only counts as a regression if it drops by more than
+REGRESSION_THRESHOLD plus the spread of both runs. Peak RSS is measured
+in a separate process that runs nothing but the scan, before any path list
+exists. Trees are read once before timing: figures are for a warm page
+cache. Use --tree-dir to keep the trees between runs instead of
+regenerating them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scanner  # noqa: E402
+from signature_index import SignatureIndex  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SEED = 1337
+DB_SIGNATURES = 1_000_000
+LOOKUPS = 200_000
+REGRESSION_THRESHOLD = 0.10  # a rate 10% lower than the baseline, beyond run-to-run noise
+DEFAULT_REPEAT = 3
+
+
+# === TREE GENERATION ===
+def _write(path, rng, size):
+    with open(path, "wb") as f:
+        while size > 0:
+            n = min(size, 1024 * 1024)
+            f.write(rng.randbytes(n))
+            size -= n
+
+
+def make_tiny(root, rng, scale):
+    count = int(100_000 * scale)
+    for i in range(count):
+        directory = os.path.join(root, f"d{i // 1000:04d}")
+        if i % 1000 == 0:
+            os.makedirs(directory, exist_ok=True)
+        _write(os.path.join(directory, f"f{i}.txt"), rng, rng.randint(0, 2048))
+
+
+def make_huge(root, rng, scale):
+    os.makedirs(root, exist_ok=True)
+    for i in range(4):
+        _write(os.path.join(root, f"huge{i}.bin"), rng, int(256 * 1024 * 1024 * scale))
+
+
+def make_deep(root, rng, scale):
+    path = root
+    for depth in range(int(300 * scale) or 1):
+        path = os.path.join(path, f"level{depth}")
+        os.makedirs(path, exist_ok=True)
+        for i in range(10):
+            _write(os.path.join(path, f"f{i}.dat"), rng, rng.randint(512, 64 * 1024))
+
+
+def make_mixed(root, rng, scale):
+    count = int(20_000 * scale)
+    for i in range(count):
+        directory = os.path.join(root, f"dir{i % 97}", f"sub{i % 13}")
+        os.makedirs(directory, exist_ok=True)
+        size = int(rng.paretovariate(1.2) * 4096) % (8 * 1024 * 1024)
+        _write(os.path.join(directory, f"file{i}.bin"), rng, size)
+
+
+SCENARIOS = {"tiny": make_tiny, "huge": make_huge, "deep": make_deep, "mixed": make_mixed}
+INFECTED_RATIO = {"mixed": 0.01}
+
+
+def generate(tree_dir, name, scale):
+    """Build the tree for one scenario unless an identical one is already there."""
+    root = os.path.join(tree_dir, name)
+    stamp = os.path.join(tree_dir, f"{name}.done")
+    try:
+        with open(stamp) as f:
+            if json.load(f) == {"scale": scale, "seed": SEED}:
+                return root
+    except (OSError, ValueError):
+        pass
+    print(f"🛠️ Generating {name} tree (scale {scale})...", flush=True)
+    SCENARIOS[name](root, random.Random(f"{SEED}-{name}"), scale)
+    with open(stamp, "w") as f:
+        json.dump({"scale": scale, "seed": SEED}, f)
+    return root
+
+
+def make_db(tree_dir, roots, signatures):
+    """Text and index DBs: random signatures plus the chosen "infected" files."""
+    rng = random.Random(SEED)
+    digests = [rng.randbytes(32) for _ in range(signatures)]
+    expected = {}
+    for name, root in roots.items():
+        ratio = INFECTED_RATIO.get(name, 0)
+        pick = random.Random(f"{SEED}-{name}-infected")
+        infected = [path for path in sorted(scanner.iter_files(root)) if pick.random() < ratio]
+        digests.extend(scanner._hash_file(path) for path in infected)
+        expected[name] = len(infected)
+    text_path = os.path.join(tree_dir, "bench-db.txt")
+    with open(text_path, "w") as f:
+        f.writelines(d.hex() + "\n" for d in digests)
+    index_path = os.path.join(tree_dir, "bench-db.idx")
+    SignatureIndex.from_digests(digests).save(index_path)
+    return text_path, index_path, expected
+
+
+# === MEASUREMENTS (run in a child process) ===
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _rates(files, size, seconds):
+    return {"seconds": round(seconds, 4),
+            "files_per_sec": round(files / seconds, 1) if seconds else None,
+            "mb_per_sec": round(size / seconds / 1e6, 2) if seconds else None}
+
+
+def run_peak_rss(root, index_path, workers):
+    """Peak RSS of a scan on its own: no path list, no hashing pass before it."""
+    signatures = scanner.load_signatures(index_path)
+    for _ in scanner.iter_scan(root, signatures, workers=workers):
+        pass
+    return _peak_rss_mb()
+
+
+def run_scenario(root, index_path, workers):
+    signatures = scanner.load_signatures(index_path)
+    paths = list(scanner.iter_files(root))
+    size = sum(os.path.getsize(p) for p in paths)
+    for path in paths:
+        scanner.calculate_sha256(path)  # warm the page cache
+
+    start = time.perf_counter()
+    for path in paths:
+        scanner.calculate_sha256(path)
+    hashing = _rates(len(paths), size, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    first = None
+    files = infected = 0
+    for result in scanner.iter_scan(root, signatures, workers=workers):
+        if first is None:
+            first = time.perf_counter() - start
+        files += 1
+        infected += result.infected
+    scan = _rates(files, size, time.perf_counter() - start)
+    scan["time_to_first_result_ms"] = round(first * 1000, 2) if first is not None else None
+    scan["workers"] = workers
+
+    return {"files": len(paths), "bytes": size, "infected": infected, "hash": hashing, "scan": scan}
+
+
+def run_db(text_path, index_path):
+    start = time.perf_counter()
+    text = scanner.load_signatures(text_path)
+    text_load = time.perf_counter() - start
+    start = time.perf_counter()
+    index = scanner.load_signatures(index_path)
+    index_load = time.perf_counter() - start
+
+    rng = random.Random(SEED + 1)
+    probes = [rng.randbytes(32) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for digest in probes:
+        digest in index
+    lookup = time.perf_counter() - start
+    return {"signatures": len(text),
+            "text_load_seconds": round(text_load, 4),
+            "index_load_seconds": round(index_load, 6),
+            "lookups_per_sec": round(LOOKUPS / lookup, 1),
+            "peak_rss_mb": _peak_rss_mb()}
+
+
+def in_child(func, *args):
+    # A fresh interpreter per measurement keeps peak RSS and caches separate
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def _spread(values):
+    """(max - min) / median of repeated measurements, 0 for a single one."""
+    values = [v for v in values if v]
+    if len(values) < 2:
+        return 0.0
+    return round((max(values) - min(values)) / statistics.median(values), 4)
+
+
+def repeated(runs, keys):
+    """The first run with each of keys ((stage, key) pairs) replaced by the median of runs.
+
+    The relative spread of each key goes into its stage's "spread" dict.
+    """
+    result = runs[0]
+    for stage, key in keys:
+        values = [v for v in (run[stage][key] if stage else run[key] for run in runs) if v is not None]
+        target = result[stage] if stage else result
+        target[key] = round(statistics.median(values), 4) if values else None
+        target.setdefault("spread", {})[key] = _spread(values)
+    result["runs"] = len(runs)
+    return result
+
+
+# === REPORT ===
+RATE_KEYS = [("hash", "files_per_sec"), ("hash", "mb_per_sec"),
+             ("scan", "files_per_sec"), ("scan", "mb_per_sec")]
+
+
+def _noise(section, key):
+    return section.get("spread", {}).get(key, 0.0)
+
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    """Lines describing every rate that dropped by more than threshold plus the noise of both runs."""
+    regressions = []
+    for name, result in new["results"].items():
+        before = old.get("results", {}).get(name)
+        if not before or name == "db":
+            continue
+        for stage, key in RATE_KEYS:
+            old_stage, new_stage = before.get(stage, {}), result[stage]
+            a, b = old_stage.get(key), new_stage[key]
+            allowed = threshold + _noise(old_stage, key) + _noise(new_stage, key)
+            if a and b and b < a * (1 - allowed):
+                regressions.append(f"{name} {stage} {key}: {a} -> {b} ({(b / a - 1) * 100:+.1f}%,"
+                                   f" allowed -{allowed * 100:.0f}%)")
+    old_db, new_db = old.get("results", {}).get("db"), new["results"].get("db")
+    if old_db and new_db:
+        allowed = threshold + _noise(old_db, "lookups_per_sec") + _noise(new_db, "lookups_per_sec")
+        if new_db["lookups_per_sec"] < old_db["lookups_per_sec"] * (1 - allowed):
+            regressions.append(f"db lookups_per_sec: {old_db['lookups_per_sec']} -> {new_db['lookups_per_sec']}"
+                               f" (allowed -{allowed * 100:.0f}%)")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies file counts and sizes")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only these scenarios (repeatable)")
+    parser.add_argument("--workers", type=int, default=scanner.DEFAULT_WORKERS)
+    parser.add_argument("--signatures", type=int, default=DB_SIGNATURES, help="signature DB size")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="timed runs per measurement; the median is reported")
+    parser.add_argument("--tree-dir", help="keep generated trees here and reuse them")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--compare", metavar="JSON", help="baseline results; exit 1 on regressions")
+    args = parser.parse_args(argv)
+
+    names = args.scenario or list(SCENARIOS)
+    tmp = None
+    if args.tree_dir:
+        tree_dir = args.tree_dir
+        os.makedirs(tree_dir, exist_ok=True)
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        tree_dir = tmp.name
+    try:
+        roots = {name: generate(tree_dir, name, args.scale) for name in names}
+        text_path, index_path, expected = make_db(tree_dir, roots, args.signatures)
+
+        repeat = max(1, args.repeat)
+        results = {"db": repeated([in_child(run_db, text_path, index_path) for _ in range(repeat)],
+                                  [(None, "text_load_seconds"), (None, "index_load_seconds"),
+                                   (None, "lookups_per_sec")])}
+        db = results["db"]
+        print(f"db      {db['signatures']} signatures: text {db['text_load_seconds']}s,"
+              f" index {db['index_load_seconds'] * 1000:.2f} ms, {db['lookups_per_sec']:.0f} lookups/s")
+        for name, root in roots.items():
+            runs = [in_child(run_scenario, root, index_path, args.workers) for _ in range(repeat)]
+            result = repeated(runs, [(stage, key) for stage in ("hash", "scan")
+                                     for key in ("seconds", "files_per_sec", "mb_per_sec")]
+                              + [("scan", "time_to_first_result_ms")])
+            result["peak_rss_mb"] = in_child(run_peak_rss, root, index_path, args.workers)
+            if result["infected"] != expected[name]:
+                print(f"⚠️ {name}: expected {expected[name]} infected files, found {result['infected']}")
+            results[name] = result
+            scan = result["scan"]
+            print(f"{name:<7} {result['files']} files, {result['bytes'] / 1e6:.0f} MB:"
+                  f" {scan['files_per_sec']} files/s, {scan['mb_per_sec']} MB/s,"
+                  f" first result {scan['time_to_first_result_ms']} ms, peak RSS {result['peak_rss_mb']} MB")
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {"scale": args.scale, "workers": args.workers, "signatures": args.signatures,
+                 "repeat": args.repeat},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"✅ Results saved to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report)
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
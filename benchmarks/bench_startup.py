@@ -0,0 +1,95 @@
+"""Startup time of the GUI app and of the modules it used to import eagerly.
+
+    python benchmarks/bench_startup.py [--runs 5] [-o startup.json]
+
+Two measurements, each in fresh processes:
+
+    imports  cold import time of every module main.py depends on; the
+             notification, tray and sound libraries are now only imported
+             when first used, so their share is what startup no longer pays
+    gui      main.py run with SICT_STARTUP_BENCH=1: it prints the
+             milliseconds until the window is shown and until the local
+             virus DB copy is loaded, then exits (needs a display; skipped
+             without one)
+
+Run it from a directory with settings.json / a downloaded DB to measure a
+warm start.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EAGER_MODULES = ["tkinter", "scanner", "hash_cache", "realtime", "metrics", "throttle", "checkpoint",
+                 "jobs", "archives", "dedup", "quarantine"]
+LAZY_MODULES = ["pystray", "PIL.Image", "plyer", "win10toast", "playsound"]
+GUI_TIMEOUT = 60
+
+
+def import_ms(module):
+    """Cold import time of module in a fresh interpreter, or None if it is not installed."""
+    code = ("import sys, time; sys.path.insert(0, sys.argv[1]); t = time.perf_counter(); "
+            f"import {module}; print((time.perf_counter() - t) * 1000)")
+    proc = subprocess.run([sys.executable, "-c", code, REPO], capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def gui_startup():
+    """{"window": ms, "db_local" / "db_refreshed": ms} from one GUI start, or None."""
+    env = dict(os.environ, SICT_STARTUP_BENCH="1")
+    try:
+        proc = subprocess.run([sys.executable, os.path.join(REPO, "main.py")], env=env,
+                              capture_output=True, text=True, timeout=GUI_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return None
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            return json.loads(line[len("STARTUP "):])
+    return None
+
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="repetitions (the median is reported)")
+    parser.add_argument("--no-gui", action="store_true", help="only measure imports")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {"imports": {}, "gui": None}
+    for kind, modules in (("eager", EAGER_MODULES), ("lazy", LAZY_MODULES)):
+        for module in modules:
+            ms = median(import_ms(module) for _ in range(args.runs))
+            results["imports"][module] = {"ms": ms, "kind": kind}
+            shown = "not installed" if ms is None else f"{ms:8.1f} ms"
+            print(f"import {module:12} {kind:5} {shown}")
+    lazy = sum(info["ms"] or 0 for info in results["imports"].values() if info["kind"] == "lazy")
+    print(f"deferred from startup: {lazy:.1f} ms of imports")
+
+    if not args.no_gui:
+        runs = [gui_startup() for _ in range(args.runs)]
+        runs = [run for run in runs if run]
+        if runs:
+            results["gui"] = {key: median(run.get(key) for run in runs)
+                              for key in ("window", "db_local", "db_refreshed")}
+            print("gui " + " ".join(f"{key}={ms} ms" for key, ms in results["gui"].items() if ms is not None))
+        else:
+            print("gui: main.py did not report startup times (no display?), skipped")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Resumable scans.
+
+A ScanCheckpoint passed to scanner.iter_scan (checkpoint=...) makes the walk
+deterministic (directory entries sorted by name) and regularly saves how
+far the scan got, plus the infected files found so far, to
+CHECKPOINT_DIR. If the scan is stopped, the app quits or crashes, the next
+scan of the same root loads the checkpoint and skips every file up to the
+saved position, unless the file was modified or created after the
+interrupted scan started. Those are scanned again, so changes made while
+the scan was interrupted are still picked up. A scan that completes
+deletes its checkpoint.
+
+With several hashing threads files finish out of walk order, so the saved
+position is the low-water mark: the last file such that it and every file
+before it have completed.
+"""
+import collections
+import hashlib
+import json
+import os
+import time
+
+CHECKPOINT_DIR = "scan_checkpoints"
+SAVE_INTERVAL = 10.0  # seconds between checkpoint writes
+
+
+def walk_key(root, path):
+    """Sort key of path in the sorted walk of root (files before subdirectories)."""
+    parts = os.path.relpath(path, root).split(os.sep)
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+def checkpoint_path(root, directory=CHECKPOINT_DIR):
+    name = hashlib.sha1(os.path.abspath(root).encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(directory, name + ".json")
+
+
+class ScanCheckpoint:
+    def __init__(self, root, directory=CHECKPOINT_DIR, interval=SAVE_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.path = checkpoint_path(self.root, directory)
+        self.interval = interval
+        self.position = None  # walk key of the low-water mark
+        self.started_ns = time.time_ns()
+        self.scanned = 0
+        self.infected = []
+        self.run = None  # HashCache run token of the interrupted scan
+        self.resumed = False
+        self._issued = collections.deque()  # (path, key) handed to the scanner, in walk order
+        self._completed = set()
+        self._infected = set()
+        self._saved_at = time.monotonic()
+
+    @classmethod
+    def load(cls, root, directory=CHECKPOINT_DIR, interval=SAVE_INTERVAL):
+        """The saved checkpoint for root if there is one, else a fresh one."""
+        checkpoint = cls(root, directory, interval)
+        try:
+            with open(checkpoint.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("root") != checkpoint.root:
+                return checkpoint
+            checkpoint.position = tuple(tuple(part) for part in data["position"]) if data["position"] else None
+            checkpoint.started_ns = data["started_ns"]
+            checkpoint.scanned = data["scanned"]
+            checkpoint.run = data.get("run")
+            # Infected files deleted or quarantined meanwhile are dropped
+            checkpoint.infected = [p for p in data["infected"] if os.path.exists(p)]
+            checkpoint._infected = set(checkpoint.infected)
+            checkpoint.resumed = True
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Ignoring unreadable scan checkpoint {checkpoint.path}: {e}")
+        return checkpoint
+
+    @staticmethod
+    def exists(root, directory=CHECKPOINT_DIR):
+        return os.path.exists(checkpoint_path(root, directory))
+
+    # --- used by iter_scan ---
+    def track(self, entries, on_skip=None):
+        """Pass through the sorted walk, skipping files done before the interruption."""
+        for entry in entries:
+            key = walk_key(self.root, entry.path)
+            if self.position is not None and key <= self.position and not self._changed(entry):
+                if on_skip is not None:
+                    on_skip()
+                continue
+            self._issued.append((entry.path, key))
+            yield entry
+
+    def _changed(self, entry):
+        try:
+            st = entry.stat()
+        except OSError:
+            return False
+        # ctime catches files moved in with an old mtime
+        return max(st.st_mtime_ns, st.st_ctime_ns) >= self.started_ns
+
+    def done(self, result):
+        """Record a finished file; saves the checkpoint every interval seconds."""
+        if result.infected:
+            if result.path not in self._infected:
+                self._infected.add(result.path)
+                self.infected.append(result.path)
+        elif result.path in self._infected:
+            # rescanned after a change and clean now
+            self._infected.discard(result.path)
+            self.infected.remove(result.path)
+        self._completed.add(result.path)
+        while self._issued and self._issued[0][0] in self._completed:
+            path, self.position = self._issued.popleft()
+            self._completed.discard(path)
+            self.scanned += 1
+        if time.monotonic() - self._saved_at >= self.interval:
+            self.save()
+
+    def save(self):
+        data = {"root": self.root, "position": self.position, "started_ns": self.started_ns,
+                "scanned": self.scanned, "infected": self.infected, "run": self.run,
+                "saved": time.strftime("%Y-%m-%d %H:%M:%S")}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not save scan checkpoint: {e}")
+        self._saved_at = time.monotonic()
+
+    def finish(self):
+        """The scan completed: the checkpoint is no longer needed."""
+        self.discard()
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ Could not remove scan checkpoint: {e}")
@@ -0,0 +1,96 @@
+"""Hash each file only once per scan, however many names it has.
+
+A ScanDedup passed to scanner.iter_scan / scan_files (dedup=...) remembers
+files with several hard links by (st_dev, st_ino): the first link is
+hashed, the others get its verdict. With content=True, files of at least
+CONTENT_MIN_SIZE bytes are also keyed by their SHA-256: a file whose hash
+is already in the hash cache (unchanged since it was hashed) gets the
+verdict of a file with the same hash scanned earlier in this run, without
+being read. Nothing is compared byte by byte. Unchanged files are usually
+answered by the cache anyway; this matters when byte patterns are in use
+and the cache entry was made with another pattern set (after a signature
+update every file has to be read again, but each content only once).
+
+Deduplicated files are still reported, with skipped="duplicate" and the
+sha256 of the file they match. files / bytes_saved count them.
+"""
+import os
+import threading
+
+CONTENT_MIN_SIZE = 64 * 1024
+
+
+class _Slot:
+    __slots__ = ("ready", "result")
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.result = None
+
+
+class ScanDedup:
+    def __init__(self, content=False, min_size=CONTENT_MIN_SIZE):
+        self.content = content
+        self.min_size = min_size
+        self.files = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._links = {}  # (st_dev, st_ino) -> _Slot, files with several links only
+        self._digests = {}  # hex SHA-256 -> result of the first file scanned with it
+
+    @classmethod
+    def from_settings(cls, settings):
+        mode = settings.get("dedup", "links")
+        if mode not in ("links", "content"):
+            return None
+        return cls(content=mode == "content")
+
+    def scan(self, target, st, hash_file, sha256=None):
+        """Result for target (stat st): an earlier identical file's, else hash_file().
+
+        sha256 is target's hex digest from the hash cache, if it has one.
+        """
+        filepath = os.fspath(target)
+        slot = None
+        if st.st_nlink > 1 and st.st_ino:
+            key = (st.st_dev, st.st_ino)
+            with self._lock:
+                slot = self._links.get(key)
+                owner = slot is None
+                if owner:
+                    slot = self._links[key] = _Slot()
+            if not owner:
+                # Another thread may still be hashing the first link
+                slot.ready.wait()
+                if slot.result is not None and not slot.result.error:
+                    return self._reuse(slot.result, filepath, st)
+                return hash_file()
+        try:
+            result = None
+            content = self.content and st.st_size >= self.min_size
+            if content and sha256 is not None:
+                with self._lock:
+                    twin = self._digests.get(sha256)
+                if twin is not None:
+                    result = self._reuse(twin, filepath, st)
+            if result is None:
+                result = hash_file()
+                if content and result.sha256 is not None and result.skipped is None:
+                    with self._lock:
+                        self._digests.setdefault(result.sha256, result)
+            if slot is not None:
+                slot.result = result
+            return result
+        finally:
+            if slot is not None:
+                slot.ready.set()
+
+    def _reuse(self, result, filepath, st):
+        with self._lock:
+            self.files += 1
+            self.bytes_saved += st.st_size
+        return result._replace(path=filepath, skipped="duplicate", size=st.st_size, container=None,
+                               duration=None)
+
+    def summary(self):
+        return f"♻️ {self.files} duplicate files not hashed again ({self.bytes_saved / 1e6:.1f} MB saved)"
@@ -0,0 +1,516 @@
+"""Split one large scan across several worker processes or machines.
+
+    python distributed.py coordinate /mnt/share --host 0.0.0.0 --port 7342 --token SECRET [-o infected.json]
+    python distributed.py work coordinator-host:7342 --db virus-db.txt [--token SECRET]
+
+The coordinator walks the top of the tree until it has about --units work
+units: whole subtrees, plus the loose files of the directories it opened,
+in chunks. Workers connect over TCP, take one unit at a time, scan it with
+the normal engine (their own thread pool and hash cache) and send back the
+number of files scanned, the errors and the infected results. The
+coordinator merges them into one infected_files list. Every worker must see
+the tree under the same path and should use the same virus DB.
+
+A unit handed out is leased: the worker renews the lease with a heartbeat
+every few seconds. When a worker disconnects, or stops sending heartbeats
+for --lease seconds (hung, or a dead machine), its unit goes back to the
+queue. Once the queue is empty, idle workers also get a second copy of a
+unit that has been running longer than --straggler seconds; whichever copy
+finishes first counts. A unit that fails --max-attempts times is reported
+as failed.
+
+For a test run on one machine, --local-workers N starts N worker processes
+that connect to the coordinator by themselves. The coordinator listens on
+127.0.0.1 unless --host says otherwise; since workers' reports are
+trusted, any other address requires --token.
+
+Protocol (JSON lines): the worker sends hello {name, token, signatures},
+then next; the coordinator answers unit {unit, kind, paths} or finished.
+While scanning the worker sends progress {unit, scanned}, and at the end
+done {unit, scanned, errors, infected}, followed by the next "next".
+"""
+import argparse
+import collections
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+import scan_cli
+import scanner
+from hash_cache import HashCache
+from scan_daemon import result_dict
+
+DEFAULT_PORT = 7342
+DEFAULT_UNITS = 256
+FILES_PER_UNIT = 5000
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 5
+STRAGGLER_SECONDS = 600
+MAX_ATTEMPTS = 3
+CONNECT_RETRY_SECONDS = 30
+
+TREE, FILES = "tree", "files"
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class WorkUnit:
+    __slots__ = ("id", "kind", "paths", "state", "attempts", "holders", "started", "copies")
+
+    def __init__(self, unit_id, kind, paths):
+        self.id = unit_id
+        self.kind = kind
+        self.paths = paths
+        self.state = QUEUED
+        self.attempts = 0
+        self.holders = {}  # worker id -> lease deadline
+        self.started = None
+        self.copies = 0  # extra copies handed out for a straggler
+
+    def message(self):
+        return {"op": "unit", "unit": self.id, "kind": self.kind, "paths": self.paths}
+
+
+def shard(root, units=DEFAULT_UNITS, files_per_unit=FILES_PER_UNIT):
+    """Work units covering everything under root, about units of them.
+
+    Directories are opened breadth first until there are enough pending
+    subtrees; each opened directory's own files become FILES units. Symlinks
+    are treated like scanner.walk_entries does: links to files are scanned,
+    links to directories are not followed.
+    """
+    result = []
+    files = []
+    pending = collections.deque([os.path.abspath(root)])
+
+    def flush_files(force=False):
+        while len(files) >= files_per_unit or (force and files):
+            result.append(WorkUnit(len(result) + 1, FILES, files[:files_per_unit]))
+            del files[:files_per_unit]
+
+    while pending and len(pending) + len(result) < units:
+        directory = pending.popleft()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file():
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"⚠️ Cannot open {directory}: {e}", file=sys.stderr)
+            continue
+        flush_files()
+    flush_files(force=True)
+    for directory in pending:
+        result.append(WorkUnit(len(result) + 1, TREE, [directory]))
+    return result
+
+
+# === COORDINATOR ===
+class Coordinator:
+    """Hands work units to workers and merges what they report."""
+
+    def __init__(self, units, lease=LEASE_SECONDS, straggler_after=STRAGGLER_SECONDS,
+                 max_attempts=MAX_ATTEMPTS, token=None):
+        self.units = {unit.id: unit for unit in units}
+        self.lease = lease
+        self.straggler_after = straggler_after
+        self.max_attempts = max_attempts
+        self.token = token
+        self.scanned = 0
+        self.errors = 0
+        self.infected = []  # result dicts
+        self.infected_files = []
+        self.failed = []
+        self.workers = {}  # worker id -> name
+        self.started = time.time()
+        self._queue = collections.deque(units)
+        self._left = len(units)
+        self._cond = threading.Condition()
+        self._worker_ids = 0
+
+    def register(self, name):
+        with self._cond:
+            self._worker_ids += 1
+            self.workers[self._worker_ids] = name
+            return self._worker_ids
+
+    def next_unit(self, worker, timeout=None):
+        """The next unit for worker, waiting for one; None once everything is done."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._left:
+                self._expire()
+                unit = self._take() or self._straggler()
+                if unit is not None:
+                    unit.state = RUNNING
+                    unit.holders[worker] = time.monotonic() + self.lease
+                    if unit.started is None:
+                        unit.started = time.monotonic()
+                    return unit
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                self._cond.wait(1.0)
+            return None
+
+    def _take(self):
+        while self._queue:
+            unit = self._queue.popleft()
+            if unit.state == QUEUED:
+                unit.attempts += 1
+                return unit
+        return None
+
+    def _straggler(self):
+        # Only once nothing is queued: a second copy of the longest-running unit
+        now = time.monotonic()
+        running = [unit for unit in self.units.values()
+                   if unit.state == RUNNING and not unit.copies and now - unit.started >= self.straggler_after]
+        if not running:
+            return None
+        unit = min(running, key=lambda u: u.started)
+        unit.copies += 1
+        return unit
+
+    def _expire(self):
+        now = time.monotonic()
+        for unit in self.units.values():
+            if unit.state != RUNNING:
+                continue
+            for worker, deadline in list(unit.holders.items()):
+                if deadline < now:
+                    print(f"⚠️ Unit {unit.id}: no heartbeat from {self.workers.get(worker)}, re-queued",
+                          file=sys.stderr)
+                    del unit.holders[worker]
+            if not unit.holders:
+                self._requeue(unit)
+
+    def _requeue(self, unit):
+        if unit.attempts >= self.max_attempts:
+            unit.state = FAILED
+            self.failed.append(unit)
+            self._left -= 1
+            self._cond.notify_all()
+            print(f"❌ Unit {unit.id} failed {unit.attempts} times: {unit.paths[0]}", file=sys.stderr)
+            return
+        unit.state = QUEUED
+        unit.started = None
+        unit.copies = 0
+        self._queue.appendleft(unit)
+        self._cond.notify_all()
+
+    def renew(self, worker, unit_id):
+        with self._cond:
+            unit = self.units.get(unit_id)
+            if unit is not None and worker in unit.holders:
+                unit.holders[worker] = time.monotonic() + self.lease
+
+    def complete(self, worker, unit_id, scanned, errors, infected):
+        """Merge a finished unit. Returns False for a late second copy."""
+        with self._cond:
+            unit = self.units.get(unit_id)
+            if unit is None:
+                return False
+            unit.holders.pop(worker, None)
+            if unit.state in (DONE, FAILED):
+                return False
+            paths = [item["path"] for item in infected]  # a bad report fails before anything changes
+            unit.state = DONE
+            unit.holders.clear()
+            self._left -= 1
+            self.scanned += scanned
+            self.errors += errors
+            self.infected.extend(infected)
+            self.infected_files.extend(paths)
+            self._cond.notify_all()
+            return True
+
+    def release(self, worker):
+        """worker went away: its units go back to the queue."""
+        with self._cond:
+            for unit in self.units.values():
+                if unit.state == RUNNING and unit.holders.pop(worker, None) is not None and not unit.holders:
+                    self._requeue(unit)
+
+    def wait(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._left == 0, timeout)
+
+    def summary(self):
+        elapsed = time.time() - self.started
+        return (f"✅ Scanned {self.scanned} files in {len(self.units)} units on {len(self.workers)} workers "
+                f"in {elapsed:.1f}s: {len(self.infected_files)} infected, {self.errors} errors, "
+                f"{len(self.failed)} units failed")
+
+
+class _WorkerHandler(socketserver.StreamRequestHandler):
+    def send(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = None
+        try:
+            hello = json.loads(self.rfile.readline() or b"{}")
+            if hello.get("op") != "hello":
+                return
+            if coordinator.token and not hmac.compare_digest(str(hello.get("token") or ""), coordinator.token):
+                self.send({"op": "error", "error": "bad token"})
+                return
+            name = f"{hello.get('name')}@{self.client_address[0]}"
+            worker = coordinator.register(name)
+            print(f"🔗 Worker {name} joined ({hello.get('signatures')} signatures)", file=sys.stderr)
+            self.send({"op": "welcome", "worker": worker})
+            for line in self.rfile:
+                message = json.loads(line)
+                op = message.get("op")
+                if op == "next":
+                    unit = coordinator.next_unit(worker)
+                    self.send(unit.message() if unit is not None else {"op": "finished"})
+                elif op == "progress":
+                    coordinator.renew(worker, message["unit"])
+                elif op == "done":
+                    coordinator.complete(worker, message["unit"], int(message["scanned"]),
+                                         int(message["errors"]), list(message["infected"]))
+        except Exception as e:
+            # A dropped connection or a malformed message: the worker's units are re-queued
+            print(f"⚠️ Worker {worker}: {type(e).__name__}: {e}", file=sys.stderr)
+        finally:
+            if worker is not None:
+                coordinator.release(worker)
+
+
+class _CoordinatorServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(coordinator, host="127.0.0.1", port=DEFAULT_PORT):
+    """Start accepting workers on a background thread; returns the server.
+
+    Any host that can connect may report results, so an address other than
+    loopback needs a token (ValueError otherwise).
+    """
+    if not coordinator.token and not is_loopback(host):
+        raise ValueError(f"refusing to accept workers on {host} without --token")
+    server = _CoordinatorServer((host, port), _WorkerHandler)
+    server.coordinator = coordinator
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# === WORKER ===
+class ScanWorker:
+    """Takes units from a coordinator until it says everything is finished."""
+
+    def __init__(self, address, signatures, workers=scanner.DEFAULT_WORKERS, cache=None, token=None,
+                 name=None):
+        self.address = address
+        self.signatures = signatures
+        self.workers = workers
+        self.cache = cache
+        self.token = token
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopped = threading.Event()
+        self.units = 0
+        self._send_lock = threading.Lock()
+
+    def _connect(self):
+        deadline = time.monotonic() + CONNECT_RETRY_SECONDS
+        while True:
+            try:
+                return socket.create_connection(self.address)
+            except OSError:
+                # The coordinator may still be sharding the tree
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def send(self, message):
+        with self._send_lock:
+            self.sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+    def receive(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("coordinator closed the connection")
+        return json.loads(line)
+
+    def run(self):
+        self.sock = self._connect()
+        self.rfile = self.sock.makefile("rb")
+        try:
+            self.send({"op": "hello", "name": self.name, "token": self.token,
+                       "signatures": len(self.signatures)})
+            reply = self.receive()
+            if reply.get("op") != "welcome":
+                raise ConnectionError(reply.get("error", "rejected by coordinator"))
+            while not self.stopped.is_set():
+                self.send({"op": "next"})
+                message = self.receive()
+                if message.get("op") != "unit":
+                    return
+                self.send(self.scan_unit(message))
+                self.units += 1
+        finally:
+            self.rfile.close()
+            self.sock.close()
+
+    def scan_unit(self, unit):
+        scanned = errors = 0
+        infected = []
+        active = threading.Event()
+
+        def heartbeat():
+            while not active.wait(HEARTBEAT_SECONDS):
+                self.send({"op": "progress", "unit": unit["unit"], "scanned": scanned})
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            if unit["kind"] == TREE:
+                results = scanner.iter_scan(unit["paths"][0], self.signatures, stopped=self.stopped,
+                                            workers=self.workers, cache=self.cache)
+            else:
+                results = scanner.scan_files(unit["paths"], self.signatures, stopped=self.stopped,
+                                             workers=self.workers, cache=self.cache)
+            for result in results:
+                scanned += 1
+                if result.error:
+                    errors += 1
+                elif result.infected:
+                    infected.append(result_dict(result))
+        finally:
+            active.set()
+        return {"op": "done", "unit": unit["unit"], "scanned": scanned, "errors": errors, "infected": infected}
+
+
+# === COMMAND LINE ===
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Distributed SICT scan: one coordinator, many workers.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    coord = sub.add_parser("coordinate", help="shard a tree and hand it to workers")
+    coord.add_argument("root")
+    coord.add_argument("--host", default="127.0.0.1",
+                       help="address to accept workers on (anything but loopback needs --token)")
+    coord.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coord.add_argument("--units", type=int, default=DEFAULT_UNITS, help="about this many work units")
+    coord.add_argument("--files-per-unit", type=int, default=FILES_PER_UNIT)
+    coord.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                       help="re-queue a unit after this long without a heartbeat")
+    coord.add_argument("--straggler", type=float, default=STRAGGLER_SECONDS,
+                       help="give idle workers a copy of units running longer than this")
+    coord.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    coord.add_argument("--local-workers", type=int, default=0, help="start N worker processes here")
+    coord.add_argument("-o", "--output", help="write the infected results as JSON")
+    work = sub.add_parser("work", help="scan units for a coordinator")
+    work.add_argument("coordinator", help="HOST:PORT")
+    work.add_argument("--workers", type=int, default=scanner.DEFAULT_WORKERS)
+    work.add_argument("--cache", metavar="FILE", help="SQLite hash cache on this node")
+    work.add_argument("--name")
+    for cmd in (coord, work):
+        cmd.add_argument("--token", default=os.environ.get("SICT_CLUSTER_TOKEN"),
+                         help="shared secret workers must present (default $SICT_CLUSTER_TOKEN)")
+        cmd.add_argument("--db", action="append", default=[],
+                         help="signature file or index (default: download); may be repeated")
+        cmd.add_argument("--url", default=scanner.VIRUS_DB_URL)
+    return parser
+
+
+def start_local_workers(count, port, args):
+    command = [sys.executable, os.path.abspath(__file__), "work", f"127.0.0.1:{port}", "--url", args.url]
+    for path in args.db:
+        command += ["--db", path]
+    env = dict(os.environ, SICT_CLUSTER_TOKEN=args.token or "")
+    return [subprocess.Popen(command + ["--name", f"local{i + 1}"], env=env) for i in range(count)]
+
+
+def coordinate(args):
+    units = shard(args.root, args.units, args.files_per_unit)
+    print(f"📦 {len(units)} work units under {os.path.abspath(args.root)}", file=sys.stderr)
+    coordinator = Coordinator(units, args.lease, args.straggler, args.max_attempts, args.token)
+    try:
+        server = serve(coordinator, args.host, args.port)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not start the coordinator: {e}", file=sys.stderr)
+        return 2
+    port = server.server_address[1]
+    print(f"🛡️ Coordinator listening on {args.host}:{port}", file=sys.stderr)
+    local = start_local_workers(args.local_workers, port, args) if args.local_workers else []
+    try:
+        coordinator.wait()
+    except KeyboardInterrupt:
+        print("⚠️ Scan interrupted", file=sys.stderr)
+        return 130
+    finally:
+        server.shutdown()
+        server.server_close()
+        for proc in local:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    for path in coordinator.infected_files:
+        print(f"[!] Infected: {path}")
+    print(coordinator.summary(), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scanned": coordinator.scanned, "errors": coordinator.errors,
+                       "failed_units": [unit.paths for unit in coordinator.failed],
+                       "infected": coordinator.infected}, f, indent=2)
+    if coordinator.failed:
+        return 3
+    return 1 if coordinator.infected_files else 0
+
+
+def work(args):
+    try:
+        signatures = scan_cli.load_db(args)
+    except Exception as e:
+        print(f"⚠️ Could not load virus DB: {e}", file=sys.stderr)
+        return 2
+    cache = HashCache(args.cache) if args.cache else None
+    worker = ScanWorker(parse_address(args.coordinator), signatures, args.workers, cache, args.token, args.name)
+    try:
+        worker.run()
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Worker {worker.name}: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"✅ Worker {worker.name} finished {worker.units} units", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return coordinate(args) if args.command == "coordinate" else work(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
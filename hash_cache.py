@@ -0,0 +1,145 @@
+"""Persistent SHA-256 cache so unchanged files are not hashed again.
+
+Each file is stored with the size, mtime_ns and inode it had when it was
+hashed. A later scan reuses the hash only if all three still match; the
+verdict is always recomputed against the current signature DB, so a
+signature update still catches old files. Byte patterns cannot be checked
+from a hash, so a file is only answered from the cache when it was found
+clean by the same pattern set (its fingerprint is stored with the row).
+
+Every folder scan takes its own run token from begin_run() and passes it
+as run= to lookup / store / prune, so scans sharing one cache (jobs,
+real-time rescans) cannot change each other's token. A row keeps the
+highest token that saw it.
+
+Paths are stored absolute, whatever form the caller passes, so prune()
+finds every row under a root.
+"""
+import os
+import sqlite3
+import threading
+
+CACHE_FILE = "scan_cache.db"
+
+
+def _key(path):
+    return os.path.abspath(os.fspath(path))
+
+
+class HashCache:
+    def __init__(self, path=CACHE_FILE, batch_size=2000):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,"
+            " inode INTEGER, sha256 TEXT, run INTEGER, patterns TEXT) WITHOUT ROWID"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(files)")]
+        if "patterns" not in columns:  # cache written by an older version
+            self._db.execute("ALTER TABLE files ADD COLUMN patterns TEXT")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()
+        self.last_run = row[0] if row else 0
+        self._stores = []
+        self._touches = []
+        self.hits = 0
+        self.misses = 0
+
+    def begin_run(self):
+        """Start a new scan run and return its token, owned by the caller."""
+        with self._lock:
+            self.last_run += 1
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('run', ?)", (self.last_run,))
+            self._db.commit()
+            return self.last_run
+
+    def resume_run(self, run):
+        """The token to continue an earlier run with (a resumed scan), so prune keeps what it saw."""
+        with self._lock:
+            return min(run, self.last_run)
+
+    def lookup(self, path, st, patterns=None, run=None):
+        """Return the cached hex digest if path is unchanged since it was hashed.
+
+        patterns is the fingerprint of the byte-pattern set in use, if any.
+        run is the caller's token: the row is marked as seen by that run.
+        """
+        path = _key(path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, mtime_ns, inode, sha256, run, patterns FROM files WHERE path = ?", (path,)
+            ).fetchone()
+            if (row is None or row[:3] != (st.st_size, st.st_mtime_ns, st.st_ino)
+                    or (patterns is not None and row[5] != patterns)):
+                self.misses += 1
+                return None
+            self.hits += 1
+            if run is not None and row[4] < run:
+                self._touches.append((run, path))
+                self._maybe_flush()
+            return row[3]
+
+    def store(self, path, st, sha256, patterns=None, run=None):
+        """Remember a hash. Without a run token the row counts as seen by the latest run."""
+        path = _key(path)
+        with self._lock:
+            run = self.last_run if run is None else run
+            self._stores.append((path, st.st_size, st.st_mtime_ns, st.st_ino, sha256, run, patterns))
+            self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self._stores) + len(self._touches) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._stores:
+            # A scan with an older token (a resumed one) must not lower another scan's mark
+            self._db.executemany(
+                "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET"
+                " size = excluded.size, mtime_ns = excluded.mtime_ns, inode = excluded.inode,"
+                " sha256 = excluded.sha256, run = MAX(run, excluded.run), patterns = excluded.patterns",
+                self._stores)
+            self._stores = []
+        if self._touches:
+            self._db.executemany("UPDATE files SET run = MAX(run, ?) WHERE path = ?", self._touches)
+            self._touches = []
+        self._db.commit()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def prune(self, root, run):
+        """Evict entries under root not seen since run began (deleted files).
+
+        Only call this after a scan of root that ran to completion.
+        """
+        prefix = os.path.join(_key(root), "")
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self._lock:
+            self._flush()
+            cur = self._db.execute(
+                "DELETE FROM files WHERE path > ? AND path < ? AND run < ?", (prefix, upper, run)
+            )
+            self._db.commit()
+            return cur.rowcount
+
+    def compact(self):
+        """Give the space of evicted rows back to the filesystem."""
+        with self._lock:
+            self._flush()
+            self._db.execute("VACUUM")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
@@ -0,0 +1,231 @@
+"""Scan several roots (folders, drives, mounted volumes) side by side.
+
+    manager = ScanJobManager(workers=16, cache=HashCache())
+    jobs = [manager.submit(root) for root in ("/mnt/a", "/mnt/b")]
+    manager.wait()
+
+Every job has its own pause / stop switches, progress, infected list and
+counters, so pausing or stopping one job leaves the others running. All
+jobs hash on one shared thread pool. Each job keeps the same number of
+files queued on it, and the pool serves its queue in order, so running jobs
+get an equal share of the workers whatever the size of their tree. At most
+max_jobs walk at the same time; later submissions wait in the queue.
+"""
+import collections
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import scanner
+from checkpoint import ScanCheckpoint
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+STOPPED = "stopped"
+DONE = "done"
+FAILED = "failed"
+
+_job_ids = itertools.count(1)
+
+
+class ScanJob:
+    def __init__(self, root, options):
+        self.id = next(_job_ids)
+        self.root = root
+        self.options = options
+        self.state = QUEUED
+        self.error = None
+        self.paused = scanner.PauseEvent()
+        self.stopped = threading.Event()
+        self.progress = None
+        self.infected = []
+        self.errors = 0
+        self.scanned = 0
+        self.recent = collections.deque(maxlen=1000)  # last results, for UIs
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    def pause(self):
+        self.paused.set()
+        if self.state == RUNNING:
+            self.state = PAUSED
+
+    def resume(self):
+        self.paused.clear()
+        if self.state == PAUSED:
+            self.state = RUNNING
+
+    def stop(self):
+        self.stopped.set()
+        self.paused.wake()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def is_finished(self):
+        return self._done.is_set()
+
+    def percent(self):
+        if self.state == DONE:
+            return 100.0
+        return self.progress.percent() if self.progress is not None else 0.0
+
+    def summary(self):
+        return {"id": self.id, "root": self.root, "state": self.state, "scanned": self.scanned,
+                "infected": len(self.infected), "errors": self.errors,
+                "percent": round(self.percent(), 1), "error": self.error}
+
+
+class ScanJobManager:
+    """Runs ScanJobs on a shared hashing pool.
+
+    on_result(job, result) is called from the job's thread for every file.
+    cache, throttle, metrics, archives and dedup are shared by all jobs
+    (each is thread-safe), so a file linked into two roots is hashed once.
+    Each job's iter_scan takes its own cache run token, so one job pruning
+    its root never drops rows another job has just stored.
+    scope (scope.ScanScope) applies to every root.
+    """
+
+    def __init__(self, workers=scanner.DEFAULT_WORKERS, max_jobs=4, signatures=None, cache=None,
+                 throttle=None, metrics=None, resume=False, on_result=None, on_finish=None,
+                 archives=None, dedup=None, scope=None):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.signatures = signatures
+        self.cache = cache
+        self.throttle = throttle
+        self.metrics = metrics
+        self.archives = archives
+        self.dedup = dedup
+        self.scope = scope
+        self.resume = resume
+        self.on_result = on_result
+        self.on_finish = on_finish
+        initializer = throttle.init_worker if throttle is not None else None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sict-job",
+                                        initializer=initializer)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._queue = collections.deque()
+        self._running = 0
+
+    def submit(self, root, **options):
+        """Queue a scan of root. options: resume (bool) overrides the manager default."""
+        job = ScanJob(root, options)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._queue.append(job)
+        self._start_next()
+        return job
+
+    def _start_next(self):
+        with self._lock:
+            while self._queue and self._running < self.max_jobs:
+                job = self._queue.popleft()
+                if job.stopped.is_set():
+                    job.state = STOPPED
+                    job._done.set()
+                    continue
+                self._running += 1
+                job.state = PAUSED if job.paused.is_set() else RUNNING
+                threading.Thread(target=self._run, args=(job,), daemon=True,
+                                 name=f"sict-job-{job.id}").start()
+
+    def _share(self):
+        # Files each job keeps queued on the pool: an equal split of the
+        # workers among the jobs allowed to run at once
+        return max(1, self.workers // max(1, min(self.max_jobs, len(self._jobs))))
+
+    def _run(self, job):
+        job.started = time.time()
+        try:
+            job.progress = scanner.ScanProgress(job.root, job.stopped, self.scope)
+            checkpoint = None
+            if job.options.get("resume", self.resume):
+                checkpoint = ScanCheckpoint.load(job.root)
+            results = scanner.iter_scan(job.root, self.signatures, job.paused, job.stopped,
+                                        workers=self._share(), progress=job.progress, cache=self.cache,
+                                        metrics=self.metrics, throttle=self.throttle,
+                                        checkpoint=checkpoint, executor=self._pool,
+                                        archives=self.archives, dedup=self.dedup, scope=self.scope)
+            if checkpoint is not None and checkpoint.resumed:
+                job.infected.extend(checkpoint.infected)
+            for result in results:
+                if result.container is None:
+                    job.scanned += 1
+                if result.error:
+                    job.errors += 1
+                elif result.infected and result.container is None and result.path not in job.infected:
+                    job.infected.append(result.path)
+                job.recent.append(result)
+                if self.on_result is not None:
+                    self.on_result(job, result)
+            job.state = STOPPED if job.stopped.is_set() else DONE
+        except Exception as e:
+            job.state = FAILED
+            job.error = str(e)
+            print(f"⚠️ Scan job {job.id} ({job.root}) failed: {e}")
+        finally:
+            job.finished = time.time()
+            job._done.set()
+            with self._lock:
+                self._running -= 1
+            if self.on_finish is not None:
+                self.on_finish(job)
+            self._start_next()
+
+    # --- control ---
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def pause_all(self):
+        for job in self.jobs():
+            job.pause()
+
+    def resume_all(self):
+        for job in self.jobs():
+            job.resume()
+
+    def stop_all(self):
+        for job in self.jobs():
+            job.stop()
+
+    def active(self):
+        return [job for job in self.jobs() if not job.is_finished]
+
+    def wait(self, timeout=None):
+        """Wait for every submitted job. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in self.jobs():
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not job.wait(remaining):
+                return False
+        return True
+
+    def percent(self):
+        """Overall progress across jobs, weighted by their file counts."""
+        jobs = self.jobs()
+        total = sum(max(job.progress.total, job.scanned) for job in jobs if job.progress)
+        if not total:
+            return 0.0
+        scanned = sum(job.scanned for job in jobs)
+        percent = scanned / total * 100
+        counting = any(job.progress is None or job.progress.counting for job in self.active())
+        return min(percent, 99.0) if counting else percent
+
+    def summary(self):
+        return [job.summary() for job in self.jobs()]
+
+    def shutdown(self, wait=True):
+        self.stop_all()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
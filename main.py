@@ -1,19 +1,26 @@
 import os
-import shutil
-import hashlib
-import urllib.request
 import time
-from pystray import Icon as TrayIcon, Menu as TrayMenu, MenuItem as TrayMenuItem
-from PIL import Image, ImageDraw
-from plyer import notification
+STARTUP_STARTED = time.perf_counter()
 import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
-from win10toast import ToastNotifier
-from playsound import playsound
 from tkinter import ttk
 import ctypes
 import json
+import queue
+import scanner
+from scanner import scan_paused, scan_stopped
+from hash_cache import HashCache
+from realtime import RealtimeScanner
+from metrics import MetricsReporter, Profiler, ScanMetrics
+from throttle import Throttle
+from checkpoint import ScanCheckpoint
+from jobs import ScanJobManager, STOPPED
+from archives import ArchiveScanner
+from dedup import ScanDedup
+from quarantine import QuarantineStore
+from results_store import ResultStore
+from scope import DEFAULT_EXCLUDE, ScanScope
 
 def update_setting(key):
     settings[key] = settings_vars[key].get()
@@ -26,7 +33,33 @@ default_settings = {
     "realtime_scan": True,
     "auto_update": True,
     "alerts": True,
-    "sound": True
+    "sound": True,
+    "scan_workers": 0,  # 0 = one per core (see scanner.DEFAULT_WORKERS)
+    "hash_cache": True,  # skip re-hashing files unchanged since the last scan
+    "show_safe_files": True,  # list "[+] Safe" lines in the output box
+    "scan_metrics": False,  # per-stage timings and counters (see metrics.py)
+    "metrics_file": "scan_metrics.prom",  # Prometheus text file, rewritten while scanning
+    "metrics_interval": 10,  # seconds between metrics lines on the console
+    "profile_scans": False,  # False, "sample" or "cprofile"
+    "throttle_mb_per_sec": 0,  # scan read budget, 0 = unlimited
+    "throttle_files_per_sec": 0,  # 0 = unlimited
+    "low_priority_scans": True,  # nice / idle I/O class for hashing threads (automatic scans)
+    "adaptive_throttle": True,  # automatic scans back off when the system is busy, full speed when idle
+    "resume_scans": True,  # checkpoint scans so an interrupted scan can continue later
+    "scan_archives": False,  # look inside zip / tar / gzip files (see archives.py)
+    "archive_max_depth": 3,  # nested archives opened at most this deep
+    "archive_max_mb": 1024,  # unpacked MB read per archive at most
+    "archive_max_members": 10000,  # members read per archive at most
+    "dedup": "links",  # "off", "links" (hard links hashed once) or "content" (identical copies too)
+    "results_db": "",  # file to store every scan result in, e.g. "scan_results.db"; "" = off (see results_store.py)
+    "results_keep_scans": 100,  # only the newest N scans are kept in results_db; 0 = all
+    "scan_exclude": list(DEFAULT_EXCLUDE),  # folders / files left out of scans (see scope.py)
+    "scan_include": [],  # if set, only files matching one of these rules
+    "scan_extensions": [],  # if set, only these extensions
+    "scan_skip_extensions": [],
+    "scan_min_size": 0,  # bytes
+    "scan_max_size_mb": 0,  # 0 = no limit
+    "scan_one_filesystem": False  # do not cross into other mounts
 }
 
 def load_settings():
@@ -67,12 +100,8 @@ class Tooltip:
             self.tipwindow.destroy()
             self.tipwindow = None
 
-# Main GUI
-root = tk.Tk()
 # Load initial settings
 settings = load_settings()
-root.title("Antivirus Settings")
-root.geometry("350x360")
 
 switches = {
     "Realtime Scanning": ("realtime_scan", "Scan files automatically in real-time."),
@@ -81,25 +110,83 @@ switches = {
     "Sound Effects": ("sound", "Play sound alerts on virus detection.")
 }
 switch_vars = {}
-
-# Apply initial background color at startup
-root.configure(bg=settings.get("background_color", "white"))
-# === Integrated Settings Section ===
-integrated_settings_frame = tk.LabelFrame(root, text="⚙ Integrated Settings", padx=10, pady=10, font=("Arial", 11, "bold"))
-integrated_settings_frame.pack(fill="x", padx=15, pady=10)
-
-# Settings Variables
-settings_vars = {
-    "background_color": tk.StringVar(value="white"),
-    "auto_update": tk.BooleanVar(value=settings.get("auto_update", True)),
-    "alerts": tk.BooleanVar(value=settings.get("alerts", True)),
-    "sound": tk.BooleanVar(value=settings.get("sound", True))
-}
-
-# Background Color setting
-tk.Label(integrated_settings_frame, text="Background Color:", font=("Arial", 10)).grid(row=0, column=0, sticky='w', pady=5)
-bg_color_menu = ttk.Combobox(integrated_settings_frame, values=["white", "lightgray", "skyblue", "black", "orange", "tomato"], textvariable=settings_vars["background_color"])
-bg_color_menu.grid(row=0, column=1, pady=5, padx=5)
+settings_vars = {}
+settings_window = None
+
+# The settings window is built the first time it is opened, not at startup
+def open_settings():
+    global settings_window
+    if settings_window is not None and settings_window.winfo_exists():
+        settings_window.deiconify()
+        settings_window.lift()
+        return
+    window = settings_window = tk.Toplevel(root)
+    window.title("Antivirus Settings")
+    window.geometry("350x360")
+    window.configure(bg=settings.get("background_color", "white"))
+
+    # === Integrated Settings Section ===
+    integrated_settings_frame = tk.LabelFrame(window, text="⚙ Integrated Settings", padx=10, pady=10, font=("Arial", 11, "bold"))
+    integrated_settings_frame.pack(fill="x", padx=15, pady=10)
+
+    # Settings Variables
+    settings_vars.update({
+        "background_color": tk.StringVar(value=settings.get("background_color", "white")),
+        "auto_update": tk.BooleanVar(value=settings.get("auto_update", True)),
+        "alerts": tk.BooleanVar(value=settings.get("alerts", True)),
+        "sound": tk.BooleanVar(value=settings.get("sound", True))
+    })
+
+    # Background Color setting
+    tk.Label(integrated_settings_frame, text="Background Color:", font=("Arial", 10)).grid(row=0, column=0, sticky='w', pady=5)
+    bg_color_menu = ttk.Combobox(integrated_settings_frame, values=["white", "lightgray", "skyblue", "black", "orange", "tomato"], textvariable=settings_vars["background_color"])
+    bg_color_menu.grid(row=0, column=1, pady=5, padx=5)
+    bg_color_menu.bind("<<ComboboxSelected>>", apply_bg_color)
+
+    # Auto-update Definitions
+    auto_update_chk = tk.Checkbutton(
+        integrated_settings_frame,
+        text="Auto-update Definitions",
+        variable=settings_vars["auto_update"],
+        command=lambda: update_setting("auto_update"),
+        font=("Arial", 10),
+    )
+    auto_update_chk.grid(row=1, column=0, columnspan=2, sticky='w', pady=2)
+
+    # Notification Alerts
+    alerts_chk = tk.Checkbutton(
+        integrated_settings_frame,
+        text="Notification Alerts",
+        variable=settings_vars["alerts"],
+        command=lambda: update_setting("alerts"),
+        font=("Arial", 10),
+    )
+    alerts_chk.grid(row=2, column=0, columnspan=2, sticky='w', pady=2)
+
+    # Sound Effects
+    sound_chk = tk.Checkbutton(
+        integrated_settings_frame,
+        text="Sound Effects",
+        variable=settings_vars["sound"],
+        command=lambda: update_setting("sound"),
+        font=("Arial", 10),
+    )
+    sound_chk.grid(row=3, column=0, columnspan=2, sticky='w', pady=2)
+
+    # Tooltip for new integrated settings
+    Tooltip(auto_update_chk, "Automatically updates virus definitions periodically.")
+    Tooltip(alerts_chk, "Displays a notification alert upon detecting threats.")
+    Tooltip(sound_chk, "Plays an alert sound upon virus detection.")
+    Tooltip(bg_color_menu, "Changes the background color of the main window.")
+
+    # Create switches with tooltips
+    for feature, (setting_key, tooltip_text) in switches.items():
+        var = tk.BooleanVar(value=settings.get(setting_key, True))
+        chk = ttk.Checkbutton(window, text=feature, variable=var,
+                              command=lambda f=feature: toggle_switch(f))
+        chk.pack(anchor='w', pady=8, padx=20)
+        switch_vars[feature] = var
+        Tooltip(chk, tooltip_text)
 
 def apply_bg_color(event):
     selected_color = settings_vars["background_color"].get()
@@ -107,57 +194,11 @@ def apply_bg_color(event):
     settings["background_color"] = selected_color
     save_settings()
 
-bg_color_menu.bind("<<ComboboxSelected>>", apply_bg_color)
-
-# Auto-update Definitions
-auto_update_chk = tk.Checkbutton(
-    integrated_settings_frame,
-    text="Auto-update Definitions",
-    variable=settings_vars["auto_update"],
-    command=lambda: update_setting("auto_update"),
-    font=("Arial", 10),
-)
-auto_update_chk.grid(row=1, column=0, columnspan=2, sticky='w', pady=2)
-
-# Notification Alerts
-alerts_chk = tk.Checkbutton(
-    integrated_settings_frame,
-    text="Notification Alerts",
-    variable=settings_vars["alerts"],
-    command=lambda: update_setting("alerts"),
-    font=("Arial", 10),
-)
-alerts_chk.grid(row=2, column=0, columnspan=2, sticky='w', pady=2)
-
-# Sound Effects
-sound_chk = tk.Checkbutton(
-    integrated_settings_frame,
-    text="Sound Effects",
-    variable=settings_vars["sound"],
-    command=lambda: update_setting("sound"),
-    font=("Arial", 10),
-)
-sound_chk.grid(row=3, column=0, columnspan=2, sticky='w', pady=2)
-
-# Tooltip for new integrated settings
-Tooltip(auto_update_chk, "Automatically updates virus definitions periodically.")
-Tooltip(alerts_chk, "Displays a notification alert upon detecting threats.")
-Tooltip(sound_chk, "Plays an alert sound upon virus detection.")
-Tooltip(bg_color_menu, "Changes the background color of the main window.")
-
-
 def toggle_switch(feature):
     settings[switches[feature][0]] = switch_vars[feature].get()
     save_settings()
-
-# Create switches with tooltips
-for feature, (setting_key, tooltip_text) in switches.items():
-    var = tk.BooleanVar(value=settings[setting_key])
-    chk = ttk.Checkbutton(root, text=feature, variable=var,
-                          command=lambda f=feature: toggle_switch(f))
-    chk.pack(anchor='w', pady=8, padx=20)
-    switch_vars[feature] = var
-    Tooltip(chk, tooltip_text)
+    if switches[feature][0] == "realtime_scan":
+        update_realtime_watch()
 
 class Tooltip:
     def __init__(self, widget, text):
@@ -211,12 +252,12 @@ def save_config():
         json.dump(config, f, indent=4)
 
 
-scan_paused = threading.Event()
-scan_stopped = threading.Event()
-
 UPDATE_INTERVAL_MINUTES = 5
 def start_auto_update():
     def updater():
+        load_signature_db()
+        if STARTUP_BENCH and signatures_ready.is_set():
+            return  # measuring startup: no network refresh
         while True:
             fetch_and_update_hashes()
             time.sleep(UPDATE_INTERVAL_MINUTES * 60)
@@ -261,6 +302,7 @@ def alert_with_sound_and_blink(label, message="⚠️ Threat Detected!", sound_p
         for i in range(times):
             label.config(text=message, bg="red", fg="white")
             try:
+                from playsound import playsound  # imported on first alert, not at startup
                 playsound(sound_path)
             except Exception as e:
                 print("Sound error:", e)
@@ -272,31 +314,76 @@ def alert_with_sound_and_blink(label, message="⚠️ Threat Detected!", sound_p
 
 def stop_scan():
     scan_stopped.set()
+    scan_paused.wake()  # a paused scan notices the stop right away
+    if job_manager is not None:
+        job_manager.stop_all()
     output_box.insert(tk.END, "🛑 Scan stopped by user.\n")
 
 
 def toggle_pause():
     if scan_paused.is_set():
         scan_paused.clear()
+        if job_manager is not None:
+            job_manager.resume_all()
         pause_button.config(text="⏸ Pause Scan")
         output_box.insert(tk.END, "▶️ Scan Resumed\n")
     else:
         scan_paused.set()
+        if job_manager is not None:
+            job_manager.pause_all()
         pause_button.config(text="▶️ Resume Scan")
         output_box.insert(tk.END, "⏸ Scan Paused\n")
 
+def selected_roots():
+    """Folders / drives in the folder box; several are separated by ";"."""
+    return [path.strip() for path in folder_entry.get().split(";") if path.strip()]
+
 AUTO_SCAN_INTERVAL = 10  # minutes
 def auto_scan():
-    def scanner():
+    def scan_loop():
         while True:
-            folder = folder_entry.get()
-            if folder and os.path.isdir(folder):
-                output_box.insert(tk.END, f"\n[Auto Scan] Scanning folder: {folder}\n")
-                scan_directory(folder, output_box)
+            roots = [path for path in selected_roots() if os.path.isdir(path)]
+            if realtime_watchers:
+                # The real-time watchers already hash every change in the folders
+                log("\n[Auto Scan] Skipped (real-time scanning is on).\n")
+            elif len(roots) > 1:
+                log(f"\n[Auto Scan] Scanning {len(roots)} folders\n")
+                scan_roots(roots, background=True)
+            elif roots:
+                log(f"\n[Auto Scan] Scanning folder: {roots[0]}\n")
+                scan_directory(roots[0], background=True)
             else:
-                output_box.insert(tk.END, "\n[Auto Scan] Skipped (no folder selected).\n")
+                log("\n[Auto Scan] Skipped (no folder selected).\n")
             time.sleep(AUTO_SCAN_INTERVAL * 60)
-    threading.Thread(target=scanner, daemon=True).start()
+    threading.Thread(target=scan_loop, daemon=True).start()
+
+# === REAL-TIME SCANNING ===
+realtime_watchers = []  # one RealtimeScanner per selected folder
+
+def infected_line(result):
+    """Output line for an infected ScanResult, naming the byte pattern if one matched."""
+    if result.match:
+        return f"[!] Infected: {result.path} (pattern {result.match})\n"
+    return f"[!] Infected: {result.path}\n"
+
+def on_realtime_result(result):
+    if result.infected:
+        infected_files.append(result.path)
+        infected_hashes[result.path] = result.sha256
+        log("[Real-Time] " + infected_line(result), alert=True)
+
+def update_realtime_watch():
+    """(Re)start a watcher on each selected folder, or stop them when disabled."""
+    for watcher in realtime_watchers:
+        watcher.stop()
+    realtime_watchers.clear()
+    if realtime_enabled.get() and settings.get("realtime_scan", True):
+        for folder in selected_roots():
+            if os.path.isdir(folder):
+                watcher = RealtimeScanner(folder, on_realtime_result, cache=hash_cache,
+                                          scope=ScanScope.from_settings(settings))
+                watcher.start()
+                realtime_watchers.append(watcher)
 
 class CircularProgressDonut:
     def __init__(self, parent, size=120, width=15):
@@ -344,13 +431,18 @@ class CircularProgressDonut:
 
 def play_alert_sound():
     try:
+        from playsound import playsound
         playsound("./virus_sd2.wav")  # Replace with your sound file path
     except Exception as e:
         print("Sound error:", e)
 
-toaster = ToastNotifier()
+toaster = None
 def show_notification(title, message):
+    global toaster
     try:
+        if toaster is None:
+            from win10toast import ToastNotifier
+            toaster = ToastNotifier()
         toaster.show_toast(title, message, icon_path=None, duration=5, threaded=True)
     except:
         print("Balloon notification failed, falling back to console log.")
@@ -358,6 +450,7 @@ def show_notification(title, message):
 
 def flash_tray_icon(icon, flash_count=6, interval=0.5):
     def flasher():
+        from PIL import Image
         original_image = icon.icon
         blank_image = Image.new('RGB', (64, 64), "white")
         for _ in range(flash_count):
@@ -367,43 +460,22 @@ def flash_tray_icon(icon, flash_count=6, interval=0.5):
             time.sleep(interval)
     threading.Thread(target=flasher, daemon=True).start()
 
-def setup_tray():
-    global tray_icon_ref
-    icon_image = create_image()
-    menu = TrayMenu(
-        TrayMenuItem("Show Antivirus", on_show),
-        TrayMenuItem("Quit", on_quit)
-    )
-    tray_icon_ref = TrayIcon("Antivirus", icon_image, "Python Antivirus", menu)
-    threading.Thread(target=tray_icon_ref.run, daemon=True).start()
-
 
 # === CONFIG ===
-#VIRUS_DB_URL = "https://github.com/Rajapakar/sict/blob/main/mainsict.txt"  # inCorrect Replace with your raw file URL
-#VIRUS_DB_URL = "https://raw.githubusercontent.com/Rajapakar/sict/main/mainsict.txt"  # ✅ Correct, Replace with your raw file URL
-
-VIRUS_DB_URL = "https://github.com/Rajapakar/sict/blob/main/virus-signatures.txt"
-virus_hashes = set()
-last_update_time = ""
+# Signature DB URL, hashing and scanning live in scanner.py (no GUI needed there).
+# The DB is not loaded here: load_signature_db() reads the local copy on the
+# updater thread once the window is up, then refreshes it from the network.
+signatures_ready = threading.Event()
 
-def fetch_and_update_hashes():
-    global virus_hashes, last_update_time
-    try:
-        with urllib.request.urlopen(VIRUS_DB_URL) as response:
-            data = response.read().decode('utf-8')
-            virus_hashes = set(
-                line.strip() for line in data.splitlines() if line.strip()
-            )
-        last_update_time = time.strftime("%Y-%m-%d %H:%M:%S")
-        print(f"✅ Virus DB Updated: {last_update_time} | Signatures: {len(virus_hashes)}")
-    except Exception as e:
-        print(f"⚠️ Error updating Virus DB: {e}")
+# Hashes of unchanged files are reused across scans (see hash_cache.py)
+hash_cache = HashCache() if settings.get("hash_cache", True) else None
 
-# Test the function:
-fetch_and_update_hashes()
+# Results of every scan, kept after the window closes, if enabled (see results_store.py)
+result_store = ResultStore.from_settings(settings)
 
 # === CORE FUNCTIONS ===
 def show_notification(title, message):
+    from plyer import notification
     notification.notify(
         title=title,
         message=message,
@@ -411,78 +483,215 @@ def show_notification(title, message):
     )
 
 
-def calculate_sha256(filepath):
-    sha256 = hashlib.sha256()
-    try:
-        with open(filepath, 'rb') as f:
-            for block in iter(lambda: f.read(4096), b""):
-                sha256.update(block)
-        return sha256.hexdigest()
-    except Exception as e:
-        return None
-
 def fetch_and_update_hashes():
-    global virus_hashes, last_update_time
+    # Runs on the updater thread; the label is changed from the Tk loop
+    if scanner.fetch_and_update_hashes():
+        ui_call(update_label.config, text=f"✅ AntiVirus Updated: {scanner.last_update_time}")
+    else:
+        ui_call(update_label.config, text=f"⚠️ Error updating DB: {scanner.last_update_error}")
+    signatures_ready.set()  # offline with no local copy: scans go ahead with what there is
+    startup_mark("db_refreshed")
+
+def load_signature_db():
+    """Swap in the last downloaded DB from disk (no network), on the updater thread."""
     try:
-        response = urllib.request.urlopen(VIRUS_DB_URL)
-        data = response.read().decode('utf-8')
-        virus_hashes = set(line.strip() for line in data.strip().splitlines() if line.strip())
-        last_update_time = time.strftime("%Y-%m-%d %H:%M:%S")
-        update_label.config(text=f"✅ AntiVirus Updated: {last_update_time}")
+        if scanner.load_cached_hashes():
+            ui_call(update_label.config, text=f"Virus DB: {len(scanner.virus_hashes)} signatures (local copy)")
+            signatures_ready.set()
+            startup_mark("db_local")
     except Exception as e:
-        update_label.config(text=f"⚠️ Error updating DB: {e}")
-
-def scan_directory(directory, output_box, progress_widget=None):
+        print(f"⚠️ Could not load the local virus DB: {e}")
+
+def wait_for_signatures():
+    """Scans started before any DB is loaded wait for it instead of finding nothing."""
+    if not signatures_ready.is_set():
+        log("⏳ Waiting for the virus DB to load...\n", alert=True)
+        signatures_ready.wait()
+
+# === STARTUP TIMING ===
+# Milliseconds from process start to the window / the DB being usable,
+# printed once and measured by benchmarks/bench_startup.py
+startup_times = {}
+STARTUP_BENCH = os.environ.get("SICT_STARTUP_BENCH") == "1"
+
+def startup_mark(name):
+    if name in startup_times:
+        return
+    startup_times[name] = round((time.perf_counter() - STARTUP_STARTED) * 1000, 1)
+    if name == "window":
+        print(f"⏱️ Window shown after {startup_times[name]} ms")
+    elif name in ("db_local", "db_refreshed"):
+        print(f"⏱️ Virus DB ready after {startup_times[name]} ms ({name})")
+    if STARTUP_BENCH and "window" in startup_times and ("db_local" in startup_times or "db_refreshed" in startup_times):
+        # benchmarks/bench_startup.py reads this line and the app exits
+        print("STARTUP " + json.dumps(startup_times), flush=True)
+        ui_call(root.destroy)
+
+infected_files = []
+infected_hashes = {}  # path -> SHA-256 from the scan, names the quarantined copy
+
+def scan_directory(directory, progress_widget=None, resume=True, background=False):
+    """Run a scan on the calling (worker) thread; output goes through the UI queue.
+
+    With resume=False a checkpoint left by an interrupted scan is discarded.
+    Only background (automatic) scans run at low priority with adaptive backoff.
+    """
     global infected_files
+    wait_for_signatures()
     infected_files = []
-    output_box.insert(tk.END, f"Scanning directory: {directory}\n\n")
-
-    # Count total files first
-    all_files = []
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            all_files.append(os.path.join(root, filename))
-
-    total = len(all_files)
-    if total == 0:
-        output_box.insert(tk.END, "No files found to scan.\n")
+    infected_hashes.clear()
+    checkpoint = None
+    if settings.get("resume_scans", True):
+        checkpoint = ScanCheckpoint.load(directory)
+        if checkpoint.resumed and not resume:
+            checkpoint.discard()
+            checkpoint = ScanCheckpoint(directory)
+    if checkpoint is not None and checkpoint.resumed:
+        infected_files = list(checkpoint.infected)
+        log(f"Resuming scan of {directory} after {checkpoint.scanned} files\n\n")
+        for path in infected_files:
+            log(f"[!] Infected: {path}\n", alert=True)
+    else:
+        log(f"Scanning directory: {directory}\n\n")
+    scan_id = result_store.begin_scan(directory) if result_store is not None else None
+
+    # Files are hashed while the tree is still being walked; the total is
+    # counted in the background and the donut percentage refines as it grows
+    scope = ScanScope.from_settings(settings)
+    progress = scanner.ScanProgress(directory, scan_stopped, scope)
+
+    # Pause / stop are handled inside the engine (scan_paused / scan_stopped)
+    global scan_metrics
+    workers = settings.get("scan_workers") or scanner.DEFAULT_WORKERS
+    show_safe = settings.get("show_safe_files", True)
+    scan_metrics = reporter = None
+    dedup = ScanDedup.from_settings(settings)
+    if settings.get("scan_metrics", False):
+        scan_metrics = ScanMetrics(workers)
+        reporter = MetricsReporter(scan_metrics, settings.get("metrics_interval", 10),
+                                   settings.get("metrics_file")).start()
+    try:
+        with Profiler(settings.get("profile_scans", False)):
+            results = scanner.iter_scan(directory, workers=workers, progress=progress,
+                                        cache=hash_cache, metrics=scan_metrics,
+                                        throttle=Throttle.from_settings(settings, background),
+                                        checkpoint=checkpoint,
+                                        archives=ArchiveScanner.from_settings(settings), dedup=dedup,
+                                        scope=scope)
+            for result in results:
+                if result_store is not None:
+                    result_store.record(scan_id, result)
+                if not result.error:
+                    if result.infected and result.container is not None:
+                        # inside an archive; the archive itself is listed as infected
+                        log(infected_line(result), alert=True)
+                    elif result.infected and result.path not in infected_files:
+                        infected_files.append(result.path)
+                        infected_hashes[result.path] = result.sha256
+                        log(infected_line(result), alert=True)
+                    elif show_safe:
+                        log(f"[+] Safe: {result.path}\n")
+
+                # Update donut percent (redrawn at PROGRESS_FPS by the Tk loop)
+                if progress_widget:
+                    set_progress(progress_widget, progress.percent())
+    finally:
+        if reporter is not None:
+            reporter.stop()
+        if result_store is not None:
+            result_store.end_scan(scan_id, "stopped" if scan_stopped.is_set() else "done")
+
+    if scan_stopped.is_set():
+        log("\n⚠️ Scan Stopped.\n", alert=True)
         return
 
-    for i, filepath in enumerate(all_files):
+    if progress.scanned == 0:
+        log("No files found to scan.\n", alert=True)
+        return
+    if progress_widget:
+        set_progress(progress_widget, 100)
 
-        # 🟡 Check for pause
-        while scan_paused.is_set():
-            time.sleep(0.2)  # Wait while paused
+    report_scan_summary(dedup, scope)
 
-        # 🔴 Check for stop (optional if you want stop functionality)
-        if scan_stopped.is_set():
-            output_box.insert(tk.END, "\n⚠️ Scan Stopped.\n")
-            return
+def report_scan_summary(dedup=None, scope=None):
+    summary = "\nScan completed.\n"
+    if dedup is not None and dedup.files:
+        summary += dedup.summary() + "\n"
+    if scope is not None and (scope.pruned or scope.skipped):
+        summary += scope.summary() + "\n"
+    if infected_files:
+        summary += "Infected files found:\n" + "".join(f" - {file}\n" for file in infected_files)
+        log(summary, alert=True)
+    else:
+        log(summary + "No infected files detected.\n", alert=True)
+        ui_call(custom_popup, "Scan Completed", "✅ No threats found.", bg="#e6ffe6", fg="darkgreen", icon="✅", auto_close=4)
 
-        file_hash = calculate_sha256(filepath)
-        if file_hash:
-            if file_hash in virus_hashes:
-                msg = f"[!] Infected: {filepath}\n"
-                infected_files.append(filepath)
-            else:
-                msg = f"[+] Safe: {filepath}\n"
-            output_box.insert(tk.END, msg)
-            output_box.see(tk.END)
+# Multi-root scans: one job per root on a shared hashing pool (see jobs.py)
+job_manager = None
 
-        # Update donut percent
+def scan_roots(roots, progress_widget=None, background=False):
+    """Scan several folders / drives side by side on the calling (worker) thread."""
+    global infected_files, job_manager
+    wait_for_signatures()
+    infected_files = []
+    infected_hashes.clear()
+    infected_lock = threading.Lock()
+    show_safe = settings.get("show_safe_files", True)
+
+    scan_ids = {}
+
+    def on_result(job, result):
+        if result_store is not None:
+            if job.id not in scan_ids:
+                scan_ids[job.id] = result_store.begin_scan(job.root)
+            result_store.record(scan_ids[job.id], result)
+        if not result.error:
+            if result.infected:
+                with infected_lock:
+                    if result.container is None and result.path not in infected_files:
+                        infected_files.append(result.path)
+                        infected_hashes[result.path] = result.sha256
+                log(infected_line(result), alert=True)
+            elif show_safe:
+                log(f"[+] Safe: {result.path}\n")
         if progress_widget:
-            percent = ((i + 1) / total) * 100
-            progress_widget.update_progress(percent)
-
-    output_box.insert(tk.END, "\nScan completed.\n")
-    if infected_files:
-        output_box.insert(tk.END, "Infected files found:\n")
-        for file in infected_files:
-            output_box.insert(tk.END, f" - {file}\n")
-    else:
-        output_box.insert(tk.END, "No infected files detected.\n")
-        custom_popup("Scan Completed", "✅ No threats found.", bg="#e6ffe6", fg="darkgreen", icon="✅", auto_close=4)
-    output_box.see(tk.END)
+            set_progress(progress_widget, manager.percent())
+
+    def on_finish(job):
+        if job.id in scan_ids:
+            result_store.end_scan(scan_ids.pop(job.id), job.state)
+        note = f" ({job.error})" if job.error else ""
+        log(f"\n[{job.root}] {job.state}{note}: {job.scanned} files, {len(job.infected)} infected\n",
+            alert=True)
+
+    dedup = ScanDedup.from_settings(settings)
+    manager = job_manager = ScanJobManager(
+        workers=settings.get("scan_workers") or scanner.DEFAULT_WORKERS, max_jobs=len(roots),
+        cache=hash_cache, throttle=Throttle.from_settings(settings, background),
+        resume=settings.get("resume_scans", True), on_result=on_result, on_finish=on_finish,
+        archives=ArchiveScanner.from_settings(settings), dedup=dedup,
+        scope=ScanScope.from_settings(settings))
+    for path in roots:
+        log(f"Scanning directory: {path}\n")
+        job = manager.submit(path)
+        if scan_paused.is_set():
+            job.pause()
+    manager.wait()
+    manager.shutdown()
+    job_manager = None
+
+    jobs = manager.jobs()
+    for job in jobs:
+        # files found infected before a resumed scan was interrupted
+        for path in job.infected:
+            if path not in infected_files:
+                infected_files.append(path)
+    if any(job.state == STOPPED for job in jobs):
+        log("\n⚠️ Scan Stopped.\n", alert=True)
+        return
+    if progress_widget:
+        set_progress(progress_widget, 100)
+    report_scan_summary(dedup)
 
 def delete_infected_files(output_box):
     if not infected_files:
@@ -493,38 +702,137 @@ def delete_infected_files(output_box):
     if not confirm:
         return
 
-    deleted = []
-    for file in infected_files:
-        try:
-            os.remove(file)
-            deleted.append(file)
-        except Exception as e:
-            output_box.insert(tk.END, f"❌ Failed to delete {file}: {e}\n")
-
-    output_box.insert(tk.END, "\n🗑️ Deleted files:\n")
-    for file in deleted:
-        output_box.insert(tk.END, f" - {file}\n")
-    infected_files.clear()
+    start_file_batch("delete")
 
 def quarantine_files(output_box):
     if not infected_files:
         messagebox.showinfo("Info", "No infected files to quarantine.")
         return
+    start_file_batch("quarantine")
 
-    quarantine_dir = os.path.join(os.getcwd(), "quarantine")
-    os.makedirs(quarantine_dir, exist_ok=True)
+# Quarantine / delete run as journaled batches on a worker pool (see
+# quarantine.py), off the Tk thread; results come back through log()
+quarantine_store = QuarantineStore()
 
-    moved = []
-    for file in infected_files:
-        try:
-            filename = os.path.basename(file)
-            shutil.move(file, os.path.join(quarantine_dir, filename))
-            moved.append(file)
-        except Exception as e:
-            output_box.insert(tk.END, f"❌ Failed to quarantine {file}: {e}\n")
-
-    output_box.insert(tk.END, f"\n📁 Moved {len(moved)} files to quarantine folder.\n")
+def start_file_batch(action):
+    files = list(infected_files)
     infected_files.clear()
+    log(f"\n⏳ {action.capitalize()} {len(files)} files...\n", alert=True)
+    threading.Thread(target=run_file_batch, args=(action, files), daemon=True).start()
+
+def run_file_batch(action, files):
+    failed = []
+
+    def on_done(path, error):
+        if error is not None:
+            failed.append(path)
+            log(f"❌ Failed to {action} {path}: {error}\n", alert=True)
+
+    try:
+        if action == "delete":
+            results = quarantine_store.delete(files, on_done)
+        else:
+            results = quarantine_store.quarantine([(path, infected_hashes.get(path)) for path in files], on_done)
+    except Exception as e:
+        log(f"❌ Failed to {action} files: {e}\n", alert=True)
+        failed = files
+        results = []
+    done = [path for path, error in results if error is None]
+    if action == "delete":
+        log("\n🗑️ Deleted files:\n" + "".join(f" - {path}\n" for path in done), alert=True)
+    else:
+        log(f"\n📁 Moved {len(done)} files to quarantine folder.\n", alert=True)
+    # Files that could not be handled stay listed for another try
+    infected_files.extend(path for path in failed if path not in infected_files)
+
+def recover_quarantine():
+    """Offer to finish or roll back a quarantine / delete batch cut short last time."""
+    count = quarantine_store.pending()
+    if not count:
+        return
+    finish = messagebox.askyesno(
+        "Interrupted Quarantine",
+        f"{count} quarantine / delete operations were interrupted.\n\n"
+        "Yes: finish them\nNo: roll them back (restore quarantined files)")
+
+    def run():
+        for path, message in quarantine_store.recover(rollback=not finish):
+            log(f"📦 {path}: {message}\n", alert=True)
+    threading.Thread(target=run, daemon=True).start()
+
+# === GUI OUTPUT QUEUE ===
+# Tk is not thread-safe, so scan threads never touch widgets. They queue
+# output lines and UI calls, and the Tk main loop drains them on a timer.
+# Lines are inserted in batches, infected / status lines go first, Safe
+# lines are dropped rather than slowing the scan when the GUI falls behind,
+# and the log keeps only the last MAX_LOG_LINES lines.
+OUTPUT_POLL_MS = 50
+MAX_SAFE_LINES_PER_TICK = 2000
+MAX_LOG_LINES = 5000
+PROGRESS_FPS = 10
+
+alert_queue = queue.Queue()  # infected files, status lines, UI calls: never dropped
+safe_queue = queue.Queue(maxsize=20000)
+dropped_safe_lines = 0
+scan_metrics = None  # metrics.ScanMetrics of the current / last scan when enabled
+pending_progress = {}  # progress widget -> latest percent
+
+def log(text, alert=False):
+    """Queue a line for the output box; safe to call from any thread."""
+    global dropped_safe_lines
+    if alert:
+        alert_queue.put(("text", text))
+        return
+    try:
+        safe_queue.put_nowait(text)
+    except queue.Full:
+        dropped_safe_lines += 1
+
+def ui_call(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the Tk thread."""
+    alert_queue.put(("call", (func, args, kwargs)))
+
+def set_progress(widget, percent):
+    pending_progress[widget] = percent
+
+def drain_ui_queue():
+    global dropped_safe_lines
+    chunks = []
+    while True:
+        try:
+            kind, item = alert_queue.get_nowait()
+        except queue.Empty:
+            break
+        if kind == "text":
+            chunks.append(item)
+        else:
+            func, args, kwargs = item
+            func(*args, **kwargs)
+    for _ in range(MAX_SAFE_LINES_PER_TICK):
+        try:
+            chunks.append(safe_queue.get_nowait())
+        except queue.Empty:
+            break
+    if dropped_safe_lines:
+        chunks.append(f"… {dropped_safe_lines} safe files not listed (output too fast)\n")
+        dropped_safe_lines = 0
+    if chunks:
+        start = time.perf_counter()
+        output_box.insert(tk.END, "".join(chunks))
+        # Ring buffer: drop the oldest lines beyond MAX_LOG_LINES
+        lines = int(output_box.index("end-1c").split(".")[0])
+        if lines > MAX_LOG_LINES:
+            output_box.delete("1.0", f"{lines - MAX_LOG_LINES + 1}.0")
+        output_box.see(tk.END)
+        if scan_metrics is not None:
+            scan_metrics.add_time("gui", time.perf_counter() - start)
+    root.after(OUTPUT_POLL_MS, drain_ui_queue)
+
+def redraw_progress():
+    while pending_progress:
+        widget, percent = pending_progress.popitem()
+        widget.update_progress(percent)
+    root.after(1000 // PROGRESS_FPS, redraw_progress)
 
 # === GUI FUNCTIONS ===
 def select_folder():
@@ -532,23 +840,62 @@ def select_folder():
     if folder:
         folder_entry.delete(0, tk.END)
         folder_entry.insert(0, folder)
+        update_realtime_watch()
+
+def add_folder():
+    folder = filedialog.askdirectory()
+    if folder:
+        roots = selected_roots()
+        if folder not in roots:
+            folder_entry.delete(0, tk.END)
+            folder_entry.insert(0, "; ".join(roots + [folder]))
 
 def start_scan():
-    folder = folder_entry.get()
+    roots = selected_roots()
     output_box.delete('1.0', tk.END)
-    if not folder or not os.path.isdir(folder):
+    if not roots or not all(os.path.isdir(path) for path in roots):
         messagebox.showerror("Error", "Please select a valid folder or drive to scan.")
         return
+    if len(roots) > 1:
+        start_multi_scan(roots)
+        return
+    folder = roots[0]
+
+    resume = True
+    if settings.get("resume_scans", True) and ScanCheckpoint.exists(folder):
+        resume = messagebox.askyesno("Resume Scan", "A previous scan of this folder was interrupted.\n"
+                                                    "Continue where it stopped?")
+
+    global scan_thread
+    scan_stopped.clear()  # a previous Stop must not cancel this new scan
+    progress_donut.show()
+    progress_donut.update_progress(0)
+
+    def run_scan():
+        scan_directory(folder, progress_donut, resume)
+        ui_call(progress_donut.hide)
+        ui_call(progress.stop)
+        ui_call(progress.pack_forget)
+    scan_thread = threading.Thread(target=run_scan, daemon=True)
+    scan_thread.start()
+
+    # Start spinner
+    progress.pack(pady=5)
+    progress.start()
 
+def start_multi_scan(roots):
+    global scan_thread
+    scan_stopped.clear()
     progress_donut.show()
     progress_donut.update_progress(0)
 
     def run_scan():
-        scan_directory(folder, output_box, progress_donut)
-        progress_donut.hide()
-        progress.stop()
-        progress.pack_forget()
-    threading.Thread(target=run_scan, daemon=True).start()
+        scan_roots(roots, progress_donut)
+        ui_call(progress_donut.hide)
+        ui_call(progress.stop)
+        ui_call(progress.pack_forget)
+    scan_thread = threading.Thread(target=run_scan, daemon=True)
+    scan_thread.start()
 
     # Start spinner
     progress.pack(pady=5)
@@ -648,6 +995,10 @@ folder_entry.pack(side=tk.LEFT, padx=5)
 browse_button = tk.Button(folder_frame, text="📁 Select Drive/ Folder", command=select_folder)
 browse_button.pack(side=tk.LEFT)
 
+add_button = tk.Button(folder_frame, text="➕", command=add_folder)
+add_button.pack(side=tk.LEFT, padx=2)
+Tooltip(add_button, "Add another folder or drive; they are scanned side by side")
+
 button_frame = tk.Frame(root)
 button_frame.pack(fill="x", padx=10, pady=10)
 
@@ -695,6 +1046,7 @@ def toggle_realtime():
         status_label.config(text="🟢 Real-Time Scanning: ON")
     else:
         status_label.config(text="🔴 Real-Time Scanning: OFF")
+    update_realtime_watch()
     save_config()  # Save immediately on toggle
 
 realtime_check = tk.Checkbutton(
@@ -723,6 +1075,9 @@ delete_button.pack(side=tk.LEFT, padx=10)
 quarantine_button = tk.Button(action_frame, text="📦 Quarantine Infected Files", command=lambda: quarantine_files(output_box), bg="orange", fg="black")
 quarantine_button.pack(side=tk.LEFT)
 
+settings_button = tk.Button(action_frame, text="⚙ Settings", command=open_settings)
+settings_button.pack(side=tk.LEFT, padx=10)
+
 # Progress Donut
 progress_donut = CircularProgressDonut(root)
 progress_donut.hide()
@@ -735,6 +1090,7 @@ footer_label = tk.Label(footer_frame, text="© 2025 ( ISO 9001-2015 Certified )
 footer_label.pack(pady=6)
 
 def create_image():
+    from PIL import Image, ImageDraw
     image = Image.new('RGB', (64, 64), "red")
     draw = ImageDraw.Draw(image)
     draw.rectangle((8, 8, 56, 56), fill="white")
@@ -743,22 +1099,43 @@ def create_image():
 
 def on_quit(icon, item):
     save_config()  # Save window geometry & settings
+    # Let a running scan write its checkpoint so it can be resumed next time
+    if scan_thread is not None and scan_thread.is_alive():
+        scan_stopped.set()
+        scan_paused.wake()
+        if job_manager is not None:
+            job_manager.stop_all()
+        scan_thread.join(timeout=3)
+    # The scan may still be recording results: only close the store once it has stopped
+    if result_store is not None and (scan_thread is None or not scan_thread.is_alive()):
+        result_store.close()  # writes the rows still queued
+    if icon is not None:
+        icon.stop()
     root.destroy()
 
 # Handle manual window close too:
 root.protocol("WM_DELETE_WINDOW", lambda: on_quit(tray_icon_ref, None))
 
 def on_show(icon, item):
-    root.after(0, root.deiconify)
+    ui_call(root.deiconify)
 
 def setup_tray():
-    icon_image = create_image()
-    menu = TrayMenu(
-        TrayMenuItem("Show Antivirus", on_show),
-        TrayMenuItem("Quit", on_quit)
-    )
-    icon = TrayIcon("Antivirus", icon_image, "Python Antivirus", menu)
-    threading.Thread(target=icon.run, daemon=True).start()
+    # pystray and PIL are imported on the tray thread, after the window is up.
+    # Menu callbacks run on that thread too, so they hand off to the Tk thread.
+    def run():
+        global tray_icon_ref
+        try:
+            from pystray import Icon as TrayIcon, Menu as TrayMenu, MenuItem as TrayMenuItem
+            icon_image = create_image()
+            menu = TrayMenu(
+                TrayMenuItem("Show Antivirus", on_show),
+                TrayMenuItem("Quit", lambda icon, item: ui_call(on_quit, icon, item))
+            )
+            tray_icon_ref = TrayIcon("Antivirus", icon_image, "Python Antivirus", menu)
+            tray_icon_ref.run()
+        except Exception as e:
+            print(f"⚠️ Tray icon unavailable: {e}")
+    threading.Thread(target=run, daemon=True).start()
 # Run GUI
 show_toast_overlay("✅ SICT AntiVirus updated successfully!")
 progress = ttk.Progressbar(root, mode='indeterminate', length=200)
@@ -766,7 +1143,12 @@ footer_label.pack(pady=5)
 
 # Initial setups
 tray_icon_ref = None
-setup_tray()
+scan_thread = None
+drain_ui_queue()
+redraw_progress()
+root.after_idle(startup_mark, "window")
+root.after_idle(recover_quarantine)
+root.after(500, setup_tray)
 start_auto_update()
 auto_scan()
 root.mainloop()
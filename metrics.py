@@ -0,0 +1,294 @@
+"""Scan instrumentation: per-stage timers, counters and an optional profiler.
+
+Pass a ScanMetrics to scanner.iter_scan / scan_files (metrics=...) to find
+out where a scan spends its time:
+
+    walk    listing directories
+    stat    stat() of each file
+    cache   hash cache lookups
+    read    readinto() calls
+    hash    sha256.update() (including byte-pattern matching)
+    patterns  byte-pattern matching alone
+    lookup  signature DB lookups
+    gui     inserting output into the GUI (main.py)
+
+With metrics=None (the default) the scanner takes its normal code path, so
+instrumentation costs nothing when it is off. Snapshots can be printed as
+one metrics line or written as a Prometheus text file:
+
+    reporter = MetricsReporter(metrics, interval=10, path="scan_metrics.prom")
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+STAGES = ["walk", "stat", "cache", "read", "hash", "patterns", "lookup", "gui"]
+PROFILE_MODES = ("cprofile", "sample")
+
+
+def _metric_name(name):
+    # Counter names come from the scan (skipped_<reason>): keep them valid metric names
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class ScanMetrics:
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.started = time.monotonic()
+        self.finished = None
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.stage_calls = dict.fromkeys(STAGES, 0)
+        self.busy_seconds = 0.0  # time workers spent on files
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+
+    # --- recording (called from the scan threads) ---
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+            self.stage_calls[stage] += 1
+
+    def add_busy(self, seconds):
+        with self._lock:
+            self.busy_seconds += seconds
+
+    def set_queue_depth(self, depth):
+        self.queue_depth = depth
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def timed(self, stage, func):
+        """func wrapped so every call is added to stage."""
+        clock = time.perf_counter
+
+        def wrapper(*args):
+            start = clock()
+            try:
+                return func(*args)
+            finally:
+                self.add_time(stage, clock() - start)
+        return wrapper
+
+    def timed_reader(self, readinto):
+        """readinto wrapped to time the read stage and count bytes_read."""
+        clock = time.perf_counter
+
+        def wrapper(buf):
+            start = clock()
+            n = readinto(buf)
+            elapsed = clock() - start
+            with self._lock:
+                self.stage_seconds["read"] += elapsed
+                self.stage_calls["read"] += 1
+                self.counters["bytes_read"] += n or 0
+            return n
+        return wrapper
+
+    def timed_iter(self, stage, iterable):
+        """Yield from iterable, timing each next() as stage."""
+        clock = time.perf_counter
+        it = iter(iterable)
+        while True:
+            start = clock()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add_time(stage, clock() - start)
+                return
+            self.add_time(stage, clock() - start)
+            yield item
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    # --- reading ---
+    def snapshot(self):
+        """A plain dict of everything measured so far."""
+        with self._lock:
+            elapsed = (self.finished or time.monotonic()) - self.started
+            counters = dict(self.counters)
+            stages = {stage: {"seconds": round(self.stage_seconds[stage], 6),
+                              "calls": self.stage_calls[stage]} for stage in STAGES}
+            busy = self.busy_seconds
+        files = counters.get("files", 0)
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_sec": round(files / elapsed, 1) if elapsed else 0.0,
+            "mb_per_sec": round(counters.get("bytes_read", 0) / elapsed / 1e6, 2) if elapsed else 0.0,
+            "counters": counters,
+            "stages": stages,
+            "workers": self.workers,
+            "worker_utilization": round(busy / (self.workers * elapsed), 3) if elapsed else 0.0,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def line(self):
+        """One human-readable line, e.g. for a log every few seconds."""
+        snap = self.snapshot()
+        c = snap["counters"]
+        stages = " ".join(f"{stage}={info['seconds']:.2f}s" for stage, info in snap["stages"].items()
+                          if info["calls"])
+        return (f"📊 files={c.get('files', 0)} {snap['files_per_sec']}/s {snap['mb_per_sec']}MB/s"
+                f" infected={c.get('infected', 0)} errors={c.get('errors', 0)}"
+                f" skipped={c.get('skipped_size', 0) + c.get('skipped_head', 0)}"
+                f" dedup={c.get('skipped_duplicate', 0)}"
+                f" cache={c.get('cache_hits', 0)}/{c.get('cache_hits', 0) + c.get('cache_misses', 0)}"
+                f" queue={snap['queue_depth']} util={snap['worker_utilization']:.0%} | {stages}")
+
+    def prometheus(self, prefix="sict_scan"):
+        """Snapshot in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        out = [f"# TYPE {prefix}_elapsed_seconds gauge",
+               f"{prefix}_elapsed_seconds {snap['elapsed_seconds']}"]
+        for name, value in sorted(snap["counters"].items()):
+            name = _metric_name(name)
+            out.append(f"# TYPE {prefix}_{name}_total counter")
+            out.append(f"{prefix}_{name}_total {value}")
+        out.append(f"# TYPE {prefix}_stage_seconds_total counter")
+        for stage, info in snap["stages"].items():
+            out.append(f'{prefix}_stage_seconds_total{{stage="{_label_value(stage)}"}} {info["seconds"]}')
+        out.append(f"# TYPE {prefix}_stage_calls_total counter")
+        for stage, info in snap["stages"].items():
+            out.append(f'{prefix}_stage_calls_total{{stage="{_label_value(stage)}"}} {info["calls"]}')
+        for name in ("workers", "worker_utilization", "queue_depth", "max_queue_depth"):
+            out.append(f"# TYPE {prefix}_{name} gauge")
+            out.append(f"{prefix}_{name} {snap[name]}")
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path):
+        # Written to a temp file first so a scraper never reads half a file
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+
+class MetricsReporter:
+    """Print a metrics line and / or rewrite a Prometheus file every interval seconds."""
+
+    def __init__(self, metrics, interval=10.0, path=None, out=print):
+        self.metrics = metrics
+        self.interval = interval
+        self.path = path
+        self.out = out
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        try:
+            if self.out is not None:
+                self.out(self.metrics.line())
+            if self.path:
+                self.metrics.write_prometheus(self.path)
+        except Exception as e:
+            print(f"⚠️ Could not report scan metrics: {e}")
+
+    def stop(self):
+        """Stop reporting and write one last report."""
+        self._stopped.set()
+        self.report()
+
+
+# === PROFILING ===
+class SamplingProfiler:
+    """Samples the stacks of every thread (including the hashing pool) each interval.
+
+    cProfile only sees the thread it was started on; sampling sees the
+    workers too and costs nothing on the scan threads themselves.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    code = frame.f_code
+                    self.samples[f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def report(self, limit=25):
+        total = sum(self.samples.values()) or 1
+        lines = [f"{count / total:6.1%}  {where}" for where, count in self.samples.most_common(limit)]
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """Profile a scan with mode "cprofile" or "sample" and save the report to path.
+
+    mode=None (profiling off) does nothing, so callers can always use it:
+
+        with Profiler(settings.get("profile_scans")):
+            ...
+    """
+
+    def __init__(self, mode=None, path=None):
+        if mode is True:
+            mode = "sample"
+        self.mode = mode if mode in PROFILE_MODES else None
+        self.path = path or time.strftime(f"scan_profile-%Y%m%d-%H%M%S.{'prof' if mode == 'cprofile' else 'txt'}")
+        self._profiler = None
+
+    def __enter__(self):
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.mode == "sample":
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._profiler is None:
+            return False
+        try:
+            if self.mode == "cprofile":
+                self._profiler.disable()
+                self._profiler.dump_stats(self.path)
+                text = io.StringIO()
+                pstats.Stats(self._profiler, stream=text).sort_stats("cumulative").print_stats(15)
+                print(text.getvalue())
+            else:
+                self._profiler.stop()
+                with open(self.path, "w") as f:
+                    f.write(self._profiler.report())
+            print(f"✅ Scan profile saved to {self.path}")
+        except Exception as e:
+            print(f"⚠️ Could not save scan profile: {e}")
+        return False
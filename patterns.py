@@ -0,0 +1,130 @@
+"""Byte-pattern signatures, matched while a file is streamed for hashing.
+
+Pattern lines live in the same text DB as the SHA-256 list:
+
+    pattern:<name>:<hex bytes>
+
+for example "pattern:Eicar-Test:58354f2150254041505b345c505a58353428505e2937434329377d". Patterns
+must be at least MIN_PATTERN_BYTES long; shorter ones would match all over
+ordinary files.
+
+Matching many patterns in one pass: every pattern registers the 4-byte
+grams at its first `stride` offsets, where stride is the shortest pattern
+length minus 3 (rounded down to a multiple of 4). Any occurrence of a
+pattern then covers one of the 4-byte words at positions 0, stride,
+2*stride, ... of the buffer, so only those words are looked up. They are
+unpacked by one struct call and checked with one set.isdisjoint(), both in
+C. The rare buffers that hit a gram are confirmed with bytes.find for the
+few candidate patterns. Longer patterns allow a longer stride and so a
+faster scan.
+"""
+import functools
+import hashlib
+import struct
+
+PATTERN_PREFIX = "pattern:"
+MIN_PATTERN_BYTES = 16
+MAX_STRIDE = 64
+_GRAM = 4
+
+
+def parse_pattern(line):
+    """(name, pattern bytes) for a "pattern:<name>:<hex>" line, else None."""
+    line = line.strip()
+    if not line.startswith(PATTERN_PREFIX):
+        return None
+    name, _, hex_bytes = line[len(PATTERN_PREFIX):].rpartition(":")
+    try:
+        pattern = bytes.fromhex(hex_bytes)
+    except ValueError:
+        return None
+    if not name or len(pattern) < MIN_PATTERN_BYTES:
+        return None
+    return name, pattern
+
+
+def format_pattern(name, pattern):
+    return f"{PATTERN_PREFIX}{name}:{pattern.hex()}"
+
+
+@functools.lru_cache(maxsize=128)
+def _word_reader(stride, count):
+    # Unpacks the little-endian 4-byte words at 0, stride, 2*stride, ...
+    return struct.Struct("<" + (f"I{stride - _GRAM}x" * (count - 1)) + "I")
+
+
+class PatternSet:
+    def __init__(self, patterns):
+        self.patterns = {}  # pattern bytes -> name
+        for name, pattern in patterns:
+            self.patterns.setdefault(pattern, name)
+        shortest = min(map(len, self.patterns), default=MIN_PATTERN_BYTES)
+        self.stride = max(_GRAM, min(MAX_STRIDE, (shortest - _GRAM + 1) // _GRAM * _GRAM))
+        self.max_len = max(map(len, self.patterns), default=0)
+        self._grams = {}  # 4-byte word -> patterns containing it at offset < stride
+        for pattern in self.patterns:
+            for offset in range(self.stride):
+                word = int.from_bytes(pattern[offset:offset + _GRAM], "little")
+                self._grams.setdefault(word, []).append(pattern)
+        self._keys = frozenset(self._grams)
+        digest = hashlib.sha256()
+        for line in sorted(self.lines()):
+            digest.update(line.encode() + b"\n")
+        self.fingerprint = digest.hexdigest()[:16]
+
+    @classmethod
+    def from_lines(cls, lines):
+        return cls(p for p in map(parse_pattern, lines) if p is not None)
+
+    def lines(self):
+        return [format_pattern(name, pattern) for pattern, name in self.patterns.items()]
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __iter__(self):
+        """(name, pattern) pairs."""
+        return ((name, pattern) for pattern, name in self.patterns.items())
+
+    def search(self, buf):
+        """Name of a pattern that occurs in buf (bytes-like), else None."""
+        n = len(buf)
+        if n < _GRAM or not self.patterns:
+            return None
+        words = _word_reader(self.stride, (n - _GRAM) // self.stride + 1).unpack_from(buf)
+        if self._keys.isdisjoint(words):
+            return None
+        data = bytes(buf)
+        for word in self._keys.intersection(words):
+            for pattern in self._grams[word]:
+                if pattern in data:
+                    return self.patterns[pattern]
+        return None
+
+    def stream(self):
+        return PatternStream(self)
+
+
+class PatternStream:
+    """Feed a file block by block; .match is the first pattern name found."""
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.match = None
+        self._tail = b""
+        self._keep = patterns.max_len - 1  # bytes a match may straddle
+
+    def feed(self, block):
+        if self.match is not None:
+            return
+        keep = self._keep
+        if self._tail:
+            # Matches crossing the previous block boundary
+            self.match = self.patterns.search(self._tail + bytes(block[:keep]))
+            if self.match is not None:
+                return
+        self.match = self.patterns.search(block)
+        if len(block) >= keep:
+            self._tail = bytes(block[len(block) - keep:])
+        else:
+            self._tail = (self._tail + bytes(block))[-keep:]
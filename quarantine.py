@@ -0,0 +1,396 @@
+"""Quarantine store with batched, crash-safe quarantine and delete.
+
+Layout of QUARANTINE_DIR:
+
+    objects/ab/abcdef...   quarantined files, named by their SHA-256
+    index.db               SQLite: items (what was quarantined from where,
+                           for restore) and journal (batches in progress)
+
+Files are moved to a .part file next to their object with a rename when the
+quarantine is on the same filesystem; otherwise they are copied there and
+synced. The .part file must still hash to the scanned SHA-256; it is then
+renamed into place, and only then is a copied file removed at the source.
+Identical files share one object. Objects are read-only and not
+executable. Symlinks and other non-regular files are not quarantined.
+
+A batch first writes every planned operation to the journal in one
+transaction, runs the operations on a thread pool and marks them done in
+groups. The journal rows are removed when the batch completes. If the app
+dies in between, pending() is non-zero on the next start and recover()
+either finishes the batch or rolls it back (files already quarantined are
+restored; deleted files cannot come back).
+"""
+import errno
+import hashlib
+import os
+import shutil
+import sqlite3
+import stat
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+QUARANTINE_DIR = "quarantine"
+BATCH_WORKERS = 8
+COMMIT_EVERY = 200  # finished operations recorded per transaction
+COPY_BLOCK = 1024 * 1024
+
+QUARANTINE = "quarantine"
+DELETE = "delete"
+PENDING = "pending"
+DONE = "done"
+
+_Op = namedtuple("_Op", ["id", "batch", "op", "path", "sha256", "size", "mode", "mtime_ns", "state"])
+QuarantineItem = namedtuple("QuarantineItem", ["id", "sha256", "path", "size", "mode", "mtime_ns",
+                                               "quarantined"])
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb", buffering=0) as f:
+        for block in iter(lambda: f.read(COPY_BLOCK), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _same_bytes(a, b):
+    with open(a, "rb", buffering=0) as fa, open(b, "rb", buffering=0) as fb:
+        while True:
+            block = fa.read(COPY_BLOCK)
+            if block != fb.read(COPY_BLOCK):
+                return False
+            if not block:
+                return True
+
+
+def _copy_synced(src, dst):
+    """Copy src to dst and fsync it, so a crash never leaves a half object.
+
+    Returns the SHA-256 of the bytes copied.
+    """
+    sha256 = hashlib.sha256()
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "wb") as fdst:
+        for block in iter(lambda: fsrc.read(COPY_BLOCK), b""):
+            sha256.update(block)
+            fdst.write(block)
+        fdst.flush()
+        os.fsync(fdst.fileno())
+    return sha256.hexdigest()
+
+
+class QuarantineStore:
+    def __init__(self, directory=QUARANTINE_DIR, workers=BATCH_WORKERS):
+        self.directory = os.path.abspath(directory)
+        self.objects = os.path.join(self.directory, "objects")
+        self.workers = workers
+        os.makedirs(self.objects, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " id INTEGER PRIMARY KEY, sha256 TEXT, path TEXT, size INTEGER, mode INTEGER,"
+            " mtime_ns INTEGER, quarantined TEXT, batch INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS items_sha256 ON items (sha256)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            " id INTEGER PRIMARY KEY, batch INTEGER, op TEXT, path TEXT, sha256 TEXT,"
+            " size INTEGER, mode INTEGER, mtime_ns INTEGER, state TEXT)"
+        )
+        self._db.commit()
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects, sha256[:2], sha256)
+
+    # === BATCHES ===
+    def quarantine(self, files, on_done=None):
+        """Move files into quarantine; returns [(path, error or None)].
+
+        files are paths or (path, sha256) pairs; the SHA-256 from the scan
+        names the object, and files without one are hashed first.
+        on_done(path, error) is called as each file finishes.
+        """
+        files = [(f, None) if isinstance(f, str) else tuple(f) for f in files]
+        return self._run(QUARANTINE, files, on_done)
+
+    def delete(self, paths, on_done=None):
+        """Delete files through the same journaled batch; returns [(path, error or None)]."""
+        return self._run(DELETE, [(path, None) for path in paths], on_done)
+
+    def _run(self, op, files, on_done):
+        results = []
+
+        def finish(path, error):
+            results.append((path, error))
+            if on_done is not None:
+                on_done(path, error)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sict-quarantine") as pool:
+            planned = []
+            for path, sha256 in files:
+                try:
+                    st = os.lstat(path)
+                except OSError as e:
+                    finish(path, str(e))
+                    continue
+                planned.append([path, sha256, st])
+            if op == QUARANTINE:
+                # Files the scan did not hash (e.g. added by hand) are hashed in parallel
+                missing = [entry for entry in planned if not entry[1]]
+                hashes = pool.map(self._try_hash, [entry[0] for entry in missing])
+                for entry, sha256 in zip(missing, hashes):
+                    entry[1] = sha256
+                for entry in missing:
+                    if isinstance(entry[1], Exception):
+                        finish(entry[0], str(entry[1]))
+                planned = [entry for entry in planned if not isinstance(entry[1], Exception)]
+            ops = self._journal(op, planned)
+            finished = []
+            futures = {pool.submit(self._apply, item): item for item in ops}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    future.result()
+                    finished.append(item)
+                    finish(item.path, None)
+                except Exception as e:
+                    finish(item.path, str(e))
+                if len(finished) >= COMMIT_EVERY:
+                    self._record(finished)
+                    finished = []
+            self._record(finished)
+        if ops:
+            self._end_batch(ops[0].batch)
+        return results
+
+    @staticmethod
+    def _try_hash(path):
+        try:
+            return file_sha256(path)
+        except OSError as e:
+            return e
+
+    def _journal(self, op, planned):
+        """Write the whole batch to the journal in one transaction."""
+        batch = time.time_ns()
+        with self._lock:
+            ops = []
+            with self._db:
+                for path, sha256, st in planned:
+                    values = (batch, op, path, sha256, st.st_size, st.st_mode, st.st_mtime_ns, PENDING)
+                    cursor = self._db.execute(
+                        "INSERT INTO journal (batch, op, path, sha256, size, mode, mtime_ns, state)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values)
+                    ops.append(_Op(cursor.lastrowid, *values))
+            return ops
+
+    def _record(self, finished):
+        """Mark operations done; quarantined files enter the index in the same transaction."""
+        if not finished:
+            return
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._db:
+            for item in finished:
+                self._db.execute("UPDATE journal SET state = ? WHERE id = ?", (DONE, item.id))
+                if item.op == QUARANTINE:
+                    self._db.execute(
+                        "INSERT INTO items (sha256, path, size, mode, mtime_ns, quarantined, batch)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (item.sha256, item.path, item.size, item.mode, item.mtime_ns, stamp, item.batch))
+
+    def _end_batch(self, batch):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM journal WHERE batch = ?", (batch,))
+
+    # === ONE FILE ===
+    def _part_path(self, item):
+        return f"{self.object_path(item.sha256)}.{item.id}.part"
+
+    def _apply(self, item):
+        if item.op == DELETE:
+            os.remove(item.path)
+            return
+        # A symlink would be moved as a link, and chmod would follow it
+        if not stat.S_ISREG(os.lstat(item.path).st_mode):
+            raise ValueError("not a regular file; only regular files are quarantined")
+        target = self.object_path(item.sha256)
+        if os.path.exists(target):
+            # Same content already quarantined: keep one copy
+            if not _same_bytes(item.path, target):
+                raise ValueError("file changed since it was scanned; scan it again")
+            os.remove(item.path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # The object is staged in a .part file and its content checked
+        # against the scanned SHA-256 before it takes the object's name
+        part = self._part_path(item)
+        try:
+            os.rename(item.path, part)
+            moved = True
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            moved = False
+        try:
+            # Another filesystem: copy and sync, hashing on the way
+            sha256 = file_sha256(part) if moved else _copy_synced(item.path, part)
+            if sha256 != item.sha256:
+                raise ValueError("file changed since it was scanned; scan it again")
+            os.replace(part, target)
+        finally:
+            if os.path.exists(part):
+                if moved:
+                    os.rename(part, item.path)
+                else:
+                    os.remove(part)
+        if not moved:
+            os.remove(item.path)
+        os.chmod(target, 0o400)
+
+    def _unstage(self, item):
+        """Put back a file an interrupted batch left in its .part file."""
+        part = self._part_path(item)
+        if item.op == QUARANTINE and os.path.exists(part) and not os.path.lexists(item.path):
+            os.rename(part, item.path)
+
+    # === RECOVERY ===
+    def pending(self):
+        """Operations of interrupted batches (0 when nothing needs recovering)."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+
+    def recover(self, rollback=False):
+        """Finish (or roll back) interrupted batches. Returns [(path, message)] of what was done."""
+        with self._lock:
+            ops = [_Op(*row) for row in self._db.execute(
+                "SELECT id, batch, op, path, sha256, size, mode, mtime_ns, state FROM journal ORDER BY id")]
+        report = []
+        finished = []
+        for item in ops:
+            try:
+                message = self._rollback_one(item) if rollback else self._finish_one(item, finished)
+            except Exception as e:
+                message = f"failed: {e}"
+            if message:
+                report.append((item.path, message))
+        self._record(finished)
+        for part in self._part_files():
+            os.remove(part)
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM journal")
+        return report
+
+    def _finish_one(self, item, finished):
+        if item.state == DONE:
+            return None
+        self._unstage(item)
+        exists = os.path.lexists(item.path)
+        if item.op == DELETE:
+            if exists:
+                os.remove(item.path)
+                finished.append(item)
+                return "deleted"
+            return None
+        target = self.object_path(item.sha256)
+        if exists:
+            # Not moved yet, or copied but not removed at the source
+            self._apply(item)
+            finished.append(item)
+            return "quarantined"
+        if os.path.exists(target):
+            finished.append(item)
+            return "quarantined"
+        return "lost: neither the file nor its quarantined copy exists"
+
+    def _rollback_one(self, item):
+        if item.op == DELETE:
+            return "already deleted" if item.state == DONE else None
+        self._unstage(item)
+        target = self.object_path(item.sha256)
+        if os.path.lexists(item.path):
+            # Never left its place; drop a copy nothing else refers to
+            if os.path.exists(target) and not self._references(item.sha256):
+                os.chmod(target, 0o600)
+                os.remove(target)
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT id FROM items WHERE batch = ? AND path = ?",
+                                   (item.batch, item.path)).fetchone()
+        if row is not None:
+            self.restore(row[0])
+        elif os.path.exists(target):
+            self._put_back(target, item.path, item.mode, item.mtime_ns, keep=self._references(item.sha256) > 0)
+        else:
+            return "lost: neither the file nor its quarantined copy exists"
+        return "restored"
+
+    def _part_files(self):
+        for folder, _, names in os.walk(self.objects):
+            for name in names:
+                if name.endswith(".part"):
+                    yield os.path.join(folder, name)
+
+    # === INDEX ===
+    def items(self):
+        with self._lock:
+            return [QuarantineItem(*row) for row in self._db.execute(
+                "SELECT id, sha256, path, size, mode, mtime_ns, quarantined FROM items ORDER BY id")]
+
+    def _references(self, sha256, exclude=None):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM items WHERE sha256 = ? AND id IS NOT ?",
+                                    (sha256, exclude)).fetchone()[0]
+
+    def restore(self, item_id, dest=None):
+        """Put a quarantined file back (at its original path unless dest is given)."""
+        with self._lock:
+            row = self._db.execute("SELECT id, sha256, path, size, mode, mtime_ns, quarantined FROM items"
+                                   " WHERE id = ?", (item_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no quarantined item {item_id}")
+        item = QuarantineItem(*row)
+        dest = dest or item.path
+        if os.path.lexists(dest):
+            raise FileExistsError(f"{dest} already exists")
+        # Objects shared with other items are copied out, the last one is moved
+        keep = self._references(item.sha256, exclude=item.id) > 0
+        self._put_back(self.object_path(item.sha256), dest, item.mode, item.mtime_ns, keep)
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM items WHERE id = ?", (item.id,))
+        return dest
+
+    def _put_back(self, target, dest, mode, mtime_ns, keep):
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        if keep:
+            shutil.copyfile(target, dest)
+        else:
+            try:
+                os.rename(target, dest)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.copyfile(target, dest)
+                os.chmod(target, 0o600)
+                os.remove(target)
+        os.chmod(dest, mode & 0o7777)
+        os.utime(dest, ns=(mtime_ns, mtime_ns))
+
+    def purge(self, item_id):
+        """Delete a quarantined file for good."""
+        with self._lock:
+            row = self._db.execute("SELECT sha256 FROM items WHERE id = ?", (item_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no quarantined item {item_id}")
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM items WHERE id = ?", (item_id,))
+        if not self._references(row[0]):
+            target = self.object_path(row[0])
+            if os.path.exists(target):
+                os.chmod(target, 0o600)
+                os.remove(target)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
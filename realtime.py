@@ -0,0 +1,278 @@
+"""Real-time scanning: watch a folder and hash files as they change.
+
+On Linux the kernel pushes change events through inotify; elsewhere (or when
+inotify is unavailable or out of watches) the folder is polled. Bursts of
+writes to the same file are coalesced and the file is hashed once, after it
+has gone quiet, instead of on every chunk of a large copy.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+import scanner
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+_EVENT = struct.Struct("iIII")
+
+# Event kinds handed to RealtimeScanner
+CHANGED = "changed"      # file is (still) being written
+CLOSED = "closed"        # writer closed the file / file moved in
+REMOVED = "removed"
+RESCAN = "rescan"        # events were lost, the whole path must be rescanned
+
+DEBOUNCE_SECONDS = 2.0   # quiet time before a file that is still open is hashed
+SETTLE_SECONDS = 0.25    # quiet time after close_write
+POLL_INTERVAL = 5.0
+
+
+class InotifyWatcher:
+    """Watches root and the folders below it.
+
+    Folders that cannot be read are skipped. When the kernel's watch limit
+    (fs.inotify.max_user_watches) is reached, the folders watched so far
+    stay watched and no more are added; files in the others are only picked
+    up by the next full scan.
+    """
+
+    def __init__(self, root, scope=None):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}  # watch descriptor -> directory path
+        self.root = root
+        self.scope = scope
+        self.full = False  # out of inotify watches
+        try:
+            self._watch(root)  # the root itself must be watchable, or we poll
+            self._watch_tree(root)
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def _watch(self, path):
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch failed: {os.strerror(err)}", path)
+        self.dirs[wd] = path
+
+    def _watch_tree(self, top, report=False):
+        """Watch top and every directory below it.
+
+        With report=True, files already inside are returned as CLOSED events
+        (a directory moved or unpacked into the tree before its watch existed).
+        """
+        events = []
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            try:
+                if self.full:
+                    continue
+                self._watch(path)
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.scope is None or self.scope._enter(entry, None):
+                                stack.append(entry.path)
+                        elif report:
+                            events.append((entry.path, CLOSED))
+            except (FileNotFoundError, PermissionError):
+                continue
+            except OSError as e:
+                if e.errno != errno.ENOSPC:
+                    raise
+                self.full = True
+                print(f"⚠️ Out of inotify watches at {path}: folders not watched yet are left"
+                      " to the next full scan (raise fs.inotify.max_user_watches)")
+        return events
+
+    def read_events(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append((self.root, RESCAN))
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        events.extend(self._watch_tree(path, report=True))
+                    except OSError as e:
+                        print(f"⚠️ Cannot watch {path}: {e}")
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                events.append((path, CLOSED))
+            elif mask & (IN_CREATE | IN_MODIFY):
+                events.append((path, CHANGED))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                events.append((path, REMOVED))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher: re-stats the tree every interval and diffs it."""
+
+    def __init__(self, root, interval=POLL_INTERVAL, scope=None):
+        self.root = root
+        self.interval = interval
+        self.scope = scope
+        self._snapshot = self._take_snapshot()
+        self._next_poll = time.monotonic() + interval
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for entry in scanner.walk_entries(self.root, scope=self.scope):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def read_events(self, timeout):
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(delay, 0))
+        self._next_poll = time.monotonic() + self.interval
+        old, new = self._snapshot, self._take_snapshot()
+        self._snapshot = new
+        # A file that changed since the last poll may still be growing; the
+        # debouncer only hashes it once two polls in a row saw the same stat
+        events = [(path, CHANGED) for path, stat in new.items() if old.get(path) != stat]
+        events.extend((path, REMOVED) for path in old.keys() - new.keys())
+        return events
+
+    def close(self):
+        pass
+
+
+def open_watcher(root, scope=None):
+    """inotify where the kernel has it, polling everywhere else."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, scope)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(root, scope=scope)
+
+
+class RealtimeScanner:
+    """Hash created / modified files under root and report each ScanResult.
+
+    on_result is called from the watcher thread. Rescans after lost events
+    have their own pause switch (paused), not the GUI's scan_paused, and
+    take their own cache run token. An error is reported and the watcher
+    keeps going. With a scope.ScanScope, files it leaves out are not
+    hashed, as in a folder scan.
+    """
+
+    def __init__(self, root, on_result, signatures=None, cache=None,
+                 debounce=DEBOUNCE_SECONDS, settle=SETTLE_SECONDS, scope=None):
+        self.root = root
+        self.scope = scope
+        self.on_result = on_result
+        self.signatures = scanner.as_signatures(signatures)
+        self.cache = cache
+        self.debounce = debounce
+        self.settle = settle
+        self._pending = {}  # path -> (time of last event, closed by writer)
+        self.paused = scanner.PauseEvent()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.paused.wake()
+
+    def _run(self):
+        try:
+            watcher = open_watcher(self.root, self.scope)
+        except Exception as e:
+            print(f"⚠️ Real-time scanning of {self.root} failed: {e}")
+            return
+        if isinstance(watcher, PollingWatcher):
+            # Polls are far apart: a file is quiet once one full poll saw no change
+            self.debounce = max(self.debounce, watcher.interval * 1.5)
+        try:
+            while not self._stopped.is_set():
+                try:
+                    for path, kind in watcher.read_events(timeout=self.settle):
+                        self._note(path, kind)
+                    self._scan_quiet_files()
+                except Exception as e:
+                    print(f"⚠️ Real-time scanning error in {self.root}: {e}")
+                    self._stopped.wait(self.settle)
+        finally:
+            watcher.close()
+
+    def _note(self, path, kind):
+        if kind == REMOVED:
+            self._pending.pop(path, None)
+        elif kind == RESCAN:
+            print("⚠️ Real-time event queue overflowed, rescanning", path)
+            for result in scanner.iter_scan(path, self.signatures, self.paused, self._stopped,
+                                            cache=self.cache, scope=self.scope):
+                self.on_result(result)
+        else:
+            self._pending[path] = (time.monotonic(), kind == CLOSED)
+
+    def _scan_quiet_files(self):
+        now = time.monotonic()
+        ready = [path for path, (last, closed) in self._pending.items()
+                 if now - last >= (self.settle if closed else self.debounce)]
+        for path in ready:
+            del self._pending[path]
+            if not os.path.isfile(path):
+                continue
+            if self.scope is not None and not self.scope.accept_path(path, self.root):
+                continue
+            self.on_result(scanner.scan_file(path, self.signatures, self.cache))
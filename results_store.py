@@ -0,0 +1,347 @@
+"""Scan results kept in SQLite, for reports and "where did we see this hash".
+
+    store = ResultStore()
+    scan = store.begin_scan("/srv/share")
+    for result in scanner.iter_scan("/srv/share", ...):
+        store.record(scan, result)
+    store.end_scan(scan)
+
+    python results_store.py hosts <sha256> [--days 7]
+    python results_store.py export --format csv --days 7 -o report.csv
+    python results_store.py scans
+
+Every result becomes one row: scan id, time, path, size, SHA-256 (32 raw
+bytes), verdict, the signature it matched (the hash itself, or the byte
+pattern's name), the error / skip reason and the seconds spent reading
+the file (empty when it was not read: cache hits, size prefilter). The scans table holds the
+host, root, start and end time and the totals. record() only puts the row
+on a queue; a writer thread inserts rows in batches of up to batch_size,
+one transaction per batch, so the scan never waits on SQLite (the queue is
+bounded, so a stalled disk slows the scan down rather than filling memory).
+
+With keep_scans set, end_scan() deletes the rows of all but the newest
+keep_scans scans (scans still running are kept), so an unattended machine
+does not fill its disk.
+
+Exports stream from their own connection with fetchmany, so reports of
+millions of rows are written without loading them, while scans keep
+writing (WAL).
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+RESULTS_FILE = "scan_results.db"
+KEEP_SCANS = 100  # GUI default for settings["results_keep_scans"]
+BATCH_SIZE = 50000  # large batches: the sha256 index is updated at random places
+FLUSH_SECONDS = 1.0  # rows wait at most this long for a batch to fill
+MAX_QUEUED = 200000
+EXPORT_ROWS = 10000  # rows fetched per round trip when exporting
+
+CLEAN, INFECTED, ERROR, SKIPPED = 0, 1, 2, 3
+VERDICTS = {CLEAN: "clean", INFECTED: "infected", ERROR: "error", SKIPPED: "skipped"}
+EXPORT_COLUMNS = ["scan", "host", "time", "path", "size", "sha256", "verdict", "signature", "detail",
+                  "container", "duration"]
+
+
+def verdict(result):
+    if result.error:
+        return ERROR
+    if result.infected:
+        return INFECTED
+    if result.sha256 is None:
+        return SKIPPED  # ruled out by size / head before hashing
+    return CLEAN
+
+
+def _signature(result):
+    if not result.infected:
+        return None
+    return f"pattern:{result.match}" if result.match is not None else result.sha256
+
+
+class _Scan:
+    __slots__ = ("files", "infected", "errors")
+
+    def __init__(self):
+        self.files = self.infected = self.errors = 0
+
+
+class ResultStore:
+    def __init__(self, path=RESULTS_FILE, batch_size=BATCH_SIZE, host=None, keep_scans=0):
+        self.path = path
+        self.batch_size = batch_size
+        self.keep_scans = keep_scans  # 0 = keep every scan
+        self.host = host or socket.gethostname()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA cache_size=-65536")  # 64 MB, keeps most of the index in memory
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scans ("
+            " id INTEGER PRIMARY KEY, host TEXT, root TEXT, started REAL, finished REAL, state TEXT,"
+            " files INTEGER, infected INTEGER, errors INTEGER)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " scan INTEGER, time REAL, path TEXT, size INTEGER, sha256 BLOB, verdict INTEGER,"
+            " signature TEXT, detail TEXT, container TEXT, duration REAL)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(results)")]
+        if "duration" not in columns:  # results file written by an older version
+            self._db.execute("ALTER TABLE results ADD COLUMN duration REAL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_sha256 ON results (sha256)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_scan ON results (scan)")
+        self._db.commit()
+        self._scans = {}  # scan id -> _Scan, while running
+        self._queue = queue.Queue(MAX_QUEUED)
+        self._writer = threading.Thread(target=self._write_loop, name="sict-results", daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """None unless a results file is configured (off by default)."""
+        path = settings.get("results_db", "")
+        return cls(path, keep_scans=settings.get("results_keep_scans", KEEP_SCANS)) if path else None
+
+    # --- writing ---
+    def begin_scan(self, root, host=None):
+        """Start a scan entry and return its id for record() / end_scan()."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO scans (host, root, started, state, files, infected, errors)"
+                " VALUES (?, ?, ?, 'running', 0, 0, 0)", (host or self.host, root, time.time()))
+            self._db.commit()
+            scan = cursor.lastrowid
+            self._scans[scan] = _Scan()
+        return scan
+
+    def record(self, scan, result):
+        code = verdict(result)
+        counts = self._scans.get(scan)
+        if counts is not None and result.container is None:
+            counts.files += 1
+            counts.infected += code == INFECTED
+            counts.errors += code == ERROR
+        sha256 = bytes.fromhex(result.sha256) if result.sha256 else None
+        self._queue.put((scan, time.time(), result.path, result.size, sha256, code, _signature(result),
+                         result.error or result.skipped, result.container, result.duration))
+
+    def end_scan(self, scan, state="done"):
+        """Write the scan's remaining rows and its totals."""
+        self.flush()
+        counts = self._scans.pop(scan, None) or _Scan()
+        with self._lock:
+            self._db.execute(
+                "UPDATE scans SET finished = ?, state = ?, files = ?, infected = ?, errors = ? WHERE id = ?",
+                (time.time(), state, counts.files, counts.infected, counts.errors, scan))
+            self._db.commit()
+        if self.keep_scans:
+            self.prune(self.keep_scans)
+
+    def prune(self, keep):
+        """Delete all but the newest keep scans and their rows; returns the scans deleted."""
+        with self._lock:
+            row = self._db.execute("SELECT id FROM scans ORDER BY id DESC LIMIT 1 OFFSET ?",
+                                   (keep - 1,)).fetchone()
+            if row is None:
+                return 0
+            running = list(self._scans)
+            keep_running = f" AND id NOT IN ({','.join('?' * len(running))})" if running else ""
+            old = [scan for (scan,) in self._db.execute(
+                "SELECT id FROM scans WHERE id < ?" + keep_running, [row[0]] + running)]
+            with self._db:
+                self._db.executemany("DELETE FROM results WHERE scan = ?", [(scan,) for scan in old])
+                self._db.executemany("DELETE FROM scans WHERE id = ?", [(scan,) for scan in old])
+        return len(old)
+
+    def flush(self):
+        """Block until every row recorded so far is written."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        with self._lock:
+            self._db.close()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            rows, waiters = [], []
+            closing = False
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while True:
+                if item is None:
+                    closing = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if rows:
+                self._write(rows)
+            for waiter in waiters:
+                waiter.set()
+            if closing:
+                return
+
+    def _write(self, rows):
+        try:
+            with self._lock:
+                self._db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not save {len(rows)} scan results: {e}")
+
+    # --- reading ---
+    def _reader(self):
+        # A separate connection: long exports do not hold up the writer
+        return sqlite3.connect(self.path)
+
+    def hosts_with_hash(self, sha256, since=None):
+        """[(host, times seen, last seen)] for a hash, newest first; since is a timestamp.
+
+        Raises ValueError if sha256 is not 64 hex digits.
+        """
+        try:
+            digest = bytes.fromhex(sha256)
+        except ValueError:
+            digest = None
+        if digest is None or len(digest) != 32:
+            raise ValueError(f"not a SHA-256 hex digest: {sha256!r}")
+        db = self._reader()
+        try:
+            return db.execute(
+                "SELECT s.host, COUNT(*), MAX(r.time) FROM results r JOIN scans s ON s.id = r.scan"
+                " WHERE r.sha256 = ? AND r.time >= ? GROUP BY s.host ORDER BY 3 DESC",
+                (digest, since or 0)).fetchall()
+        finally:
+            db.close()
+
+    def scans(self, limit=20):
+        db = self._reader()
+        try:
+            return db.execute("SELECT id, host, root, started, finished, state, files, infected, errors"
+                              " FROM scans ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        finally:
+            db.close()
+
+    def iter_rows(self, scan=None, since=None, infected_only=False):
+        """Yield export rows (EXPORT_COLUMNS order) without loading them all."""
+        where, params = ["r.time >= ?"], [since or 0]
+        if scan is not None:
+            where.append("r.scan = ?")
+            params.append(scan)
+        if infected_only:
+            where.append(f"r.verdict = {INFECTED}")
+        db = self._reader()
+        try:
+            cursor = db.execute(
+                "SELECT r.scan, s.host, r.time, r.path, r.size, r.sha256, r.verdict, r.signature, r.detail,"
+                " r.container, r.duration FROM results r JOIN scans s ON s.id = r.scan WHERE " + " AND ".join(where)
+                + " ORDER BY r.rowid", params)
+            while True:
+                rows = cursor.fetchmany(EXPORT_ROWS)
+                if not rows:
+                    return
+                for row in rows:
+                    yield (row[0], row[1], row[2], row[3], row[4], row[5].hex() if row[5] else None,
+                           VERDICTS[row[6]], row[7], row[8], row[9], row[10])
+        finally:
+            db.close()
+
+    def export(self, out, fmt="csv", scan=None, since=None, infected_only=False):
+        """Write rows to the text file out as csv or jsonl; returns the row count."""
+        count = 0
+        rows = self.iter_rows(scan, since, infected_only)
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(EXPORT_COLUMNS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                out.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n")
+                count += 1
+        return count
+
+
+# === COMMAND LINE ===
+def build_parser():
+    parser = argparse.ArgumentParser(description="Query and export stored SICT scan results.")
+    parser.add_argument("--db", default=RESULTS_FILE, help=f"results file (default {RESULTS_FILE})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    hosts = sub.add_parser("hosts", help="hosts where a SHA-256 was seen")
+    hosts.add_argument("sha256")
+    hosts.add_argument("--days", type=float, default=7)
+    scans = sub.add_parser("scans", help="recent scans")
+    scans.add_argument("--limit", type=int, default=20)
+    export = sub.add_parser("export", help="stream results as CSV or JSON lines")
+    export.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    export.add_argument("--scan", type=int)
+    export.add_argument("--days", type=float, help="only the last N days")
+    export.add_argument("--infected", action="store_true", help="only infected files")
+    export.add_argument("-o", "--output", help="file to write (default stdout)")
+    return parser
+
+
+def _since(days):
+    return time.time() - days * 86400 if days else None
+
+
+def _when(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else "-"
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"⚠️ No results file {args.db}", file=sys.stderr)
+        return 2
+    store = ResultStore(args.db)
+    try:
+        if args.command == "hosts":
+            try:
+                hosts = store.hosts_with_hash(args.sha256.lower(), _since(args.days))
+            except ValueError as e:
+                print(f"⚠️ {e}", file=sys.stderr)
+                return 2
+            for host, count, last in hosts:
+                print(f"{host}\t{count}\t{_when(last)}")
+        elif args.command == "scans":
+            for scan, host, root, started, finished, state, files, infected, errors in store.scans(args.limit):
+                print(f"{scan}\t{host}\t{root}\t{_when(started)}\t{_when(finished)}\t{state}\t"
+                      f"{files} files, {infected} infected, {errors} errors")
+        else:
+            out = open(args.output, "w", newline="") if args.output else sys.stdout
+            try:
+                count = store.export(out, args.format, args.scan, _since(args.days), args.infected)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            print(f"✅ Exported {count} rows", file=sys.stderr)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
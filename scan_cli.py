@@ -0,0 +1,243 @@
+"""Command-line scanner: python scan_cli.py [--db FILE] PATH...
+
+Prints one line per file as soon as it is hashed. Exit code is 0 when
+everything is clean, 1 when something is infected and 2 on usage / DB errors.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import time
+
+import scanner
+from hash_cache import HashCache
+from metrics import PROFILE_MODES, MetricsReporter, Profiler, ScanMetrics
+from throttle import Throttle
+from checkpoint import ScanCheckpoint
+from jobs import ScanJobManager
+from archives import ArchiveScanner, DEFAULT_MAX_DEPTH, DEFAULT_MAX_MB, DEFAULT_MAX_MEMBERS
+from dedup import ScanDedup
+from results_store import ResultStore
+from scope import ScanScope
+from signature_index import SignatureIndex
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scan files and folders against the SICT virus DB.")
+    parser.add_argument("paths", nargs="+", help="files or folders to scan")
+    parser.add_argument("--db", action="append", default=[],
+                        help="local signature file (one SHA-256 per line, or an index built "
+                             "with signature_index.py); may be repeated")
+    parser.add_argument("--url", default=scanner.VIRUS_DB_URL,
+                        help="signature DB to download when no --db is given")
+    parser.add_argument("--infected-only", action="store_true", help="do not print safe files")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text")
+    parser.add_argument("--workers", type=int, default=scanner.DEFAULT_WORKERS,
+                        help="hashing threads (1 = scan one file at a time)")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="SQLite hash cache; unchanged files are not re-hashed")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="folders scanned side by side on the shared worker pool")
+    parser.add_argument("--resume", action="store_true",
+                        help="checkpoint folder scans and continue an interrupted one")
+    parser.add_argument("--metrics", action="store_true",
+                        help="print per-stage timings and counters to stderr")
+    parser.add_argument("--metrics-interval", type=float, default=0, metavar="SECONDS",
+                        help="with --metrics, also report every SECONDS while scanning")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="write metrics in Prometheus text format to FILE")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="profile the scan and save the report")
+    parser.add_argument("--background", action="store_true",
+                        help="low CPU / I/O priority, back off while the system is busy")
+    parser.add_argument("--max-mb-per-sec", type=float, default=0, help="read budget (0 = unlimited)")
+    parser.add_argument("--max-files-per-sec", type=float, default=0, help="file budget (0 = unlimited)")
+    parser.add_argument("--archives", action="store_true",
+                        help="also scan the members of zip / tar / gzip archives")
+    parser.add_argument("--archive-depth", type=int, default=DEFAULT_MAX_DEPTH,
+                        help="how deep nested archives are opened")
+    parser.add_argument("--archive-max-mb", type=float, default=DEFAULT_MAX_MB,
+                        help="unpacked MB read per archive at most")
+    parser.add_argument("--archive-max-members", type=int, default=DEFAULT_MAX_MEMBERS,
+                        help="members read per archive at most")
+    parser.add_argument("--dedup", choices=["off", "links", "content"], default="links",
+                        help="hash hard links (links) or also identical copies (content) only once")
+    parser.add_argument("--exclude", action="append", default=[], metavar="RULE",
+                        help="skip matching files and folders: a glob (a name, or a path if it "
+                             "contains /) or re:REGEX; may be repeated")
+    parser.add_argument("--include", action="append", default=[], metavar="RULE",
+                        help="only scan files matching one of these rules")
+    parser.add_argument("--ext", action="append", default=[], help="only scan these extensions")
+    parser.add_argument("--skip-ext", action="append", default=[], help="do not scan these extensions")
+    parser.add_argument("--min-size", type=int, default=0, help="skip files smaller than this (bytes)")
+    parser.add_argument("--max-size-mb", type=float, default=0, help="skip larger files (0 = no limit)")
+    parser.add_argument("--one-filesystem", action="store_true",
+                        help="do not enter folders on other filesystems / mounts")
+    parser.add_argument("--results", metavar="FILE",
+                        help="also store every result in this SQLite file (see results_store.py)")
+    return parser
+
+
+def make_archives(args):
+    if not args.archives:
+        return None
+    return ArchiveScanner(args.archive_depth, args.archive_max_mb, args.archive_max_members)
+
+
+def make_scope(args):
+    scope = ScanScope(args.exclude, args.include, args.ext, args.skip_ext, args.min_size,
+                      int(args.max_size_mb * 1024 * 1024), args.one_filesystem)
+    return scope if scope.active() else None
+
+
+def make_throttle(args):
+    if not (args.background or args.max_mb_per_sec or args.max_files_per_sec):
+        return None
+    return Throttle(bytes_per_sec=int(args.max_mb_per_sec * 1024 * 1024),
+                    files_per_sec=args.max_files_per_sec,
+                    low_priority=args.background, adaptive=args.background)
+
+
+def load_db(args):
+    if not args.db:
+        return scanner.fetch_signatures(args.url)
+    indexes = [scanner.load_signatures(path) for path in args.db]
+    if len(indexes) == 1:
+        return indexes[0]
+    return SignatureIndex.union(indexes)
+
+
+def scan_path(path, args, signatures, cache, metrics, throttle, archives, dedup, scope=None):
+    if not os.path.isdir(path):
+        return scanner.scan_files([path], signatures, cache=cache, metrics=metrics, throttle=throttle,
+                                  archives=archives, dedup=dedup)
+    checkpoint = ScanCheckpoint.load(path) if args.resume else None
+    if checkpoint is not None and checkpoint.resumed:
+        print(f"Resuming {path} after {checkpoint.scanned} files", file=sys.stderr)
+    return scanner.iter_scan(path, signatures, workers=args.workers, cache=cache, metrics=metrics,
+                             throttle=throttle, checkpoint=checkpoint, archives=archives, dedup=dedup,
+                             scope=scope)
+
+
+def run_jobs(folders, args, signatures, cache, metrics, throttle, archives, dedup, scope=None):
+    """Scan folders concurrently (see jobs.py) and yield results as they come."""
+    results = queue.Queue(maxsize=10000)
+    manager = ScanJobManager(args.workers, max_jobs=args.jobs, signatures=signatures, cache=cache,
+                             throttle=throttle, metrics=metrics, resume=args.resume, archives=archives,
+                             dedup=dedup, scope=scope,
+                             on_result=lambda job, result: results.put(result),
+                             on_finish=lambda job: results.put(job))
+    for folder in folders:
+        manager.submit(folder)
+    remaining = len(folders)
+    try:
+        while remaining:
+            item = results.get()
+            if isinstance(item, scanner.ScanResult):
+                yield item
+                continue
+            remaining -= 1
+            if item.error:
+                print(f"⚠️ {item.root}: {item.error}", file=sys.stderr)
+    finally:
+        # Interrupted: stop the jobs and keep draining so they can finish
+        # (and write their checkpoints) instead of blocking on a full queue
+        manager.stop_all()
+        deadline = time.monotonic() + 5
+        while not manager.wait(0.05) and time.monotonic() < deadline:
+            while not results.empty():
+                results.get_nowait()
+        manager.shutdown(wait=False)
+
+
+def format_result(result, fmt):
+    if fmt == "jsonl":
+        return json.dumps(result._asdict())
+    if result.error:
+        return f"[x] Error: {result.path}: {result.error}"
+    if result.infected:
+        if result.match:
+            return f"[!] Infected: {result.path} (pattern {result.match})"
+        return f"[!] Infected: {result.path}"
+    return f"[+] Safe: {result.path}"
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        signatures = load_db(args)
+    except Exception as e:
+        print(f"⚠️ Could not load virus DB: {e}", file=sys.stderr)
+        return 2
+
+    cache = HashCache(args.cache) if args.cache else None
+    throttle = make_throttle(args)
+    archives = make_archives(args)
+    dedup = ScanDedup(content=args.dedup == "content") if args.dedup != "off" else None
+    scope = make_scope(args)
+    metrics = reporter = None
+    if args.metrics or args.metrics_file:
+        metrics = ScanMetrics(args.workers)
+        out = (lambda line: print(line, file=sys.stderr)) if args.metrics else None
+        reporter = MetricsReporter(metrics, args.metrics_interval or 3600, args.metrics_file, out)
+        if args.metrics_interval or args.metrics_file:
+            reporter.start()
+    store = ResultStore(args.results) if args.results else None
+    scan = store.begin_scan(";".join(os.path.abspath(path) for path in args.paths)) if store else None
+    state = "interrupted"
+    sys.stdout.reconfigure(line_buffering=True)
+    infected = 0
+    active = None  # results generator being consumed
+    folders = [path for path in args.paths if os.path.isdir(path)]
+    try:
+        with Profiler(args.profile):
+            if args.jobs > 1 and len(folders) > 1:
+                files = [path for path in args.paths if path not in folders]
+                batches = [scanner.scan_files(files, signatures, cache=cache, metrics=metrics,
+                                              throttle=throttle, archives=archives, dedup=dedup),
+                           run_jobs(folders, args, signatures, cache, metrics, throttle, archives, dedup,
+                                    scope)]
+            else:
+                batches = (scan_path(path, args, signatures, cache, metrics, throttle, archives, dedup, scope)
+                           for path in args.paths)
+            for results in batches:
+                active = results
+                for result in results:
+                    if store is not None:
+                        store.record(scan, result)
+                    if result.infected:
+                        infected += 1
+                    elif args.infected_only and not result.error:
+                        continue
+                    print(format_result(result, args.format))
+        if dedup is not None and dedup.files:
+            print(dedup.summary(), file=sys.stderr)
+        if scope is not None:
+            print(scope.summary(), file=sys.stderr)
+        state = "done"
+    except KeyboardInterrupt:
+        print("⚠️ Scan interrupted", file=sys.stderr)
+        return 130
+    except BrokenPipeError:
+        # Output closed early (| head): stop quietly, and keep Python from
+        # complaining again when it flushes stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 141
+    finally:
+        if active is not None:
+            # The suspended generator's cleanup still writes to the cache
+            active.close()
+        if cache is not None:
+            cache.close()
+        if reporter is not None:
+            metrics.finish()
+            reporter.stop()
+        if store is not None:
+            store.end_scan(scan, state)
+            store.close()
+    return 1 if infected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,534 @@
+"""Long-running scan service: one warm signature index and hash cache for many clients.
+
+    python scan_daemon.py serve [--socket PATH | --port N] [--db FILE] [--cache FILE]
+    python scan_daemon.py scan [--socket PATH | --port N] PATH...
+
+The daemon listens on a Unix socket (or 127.0.0.1:PORT where Unix sockets
+are not available) and speaks JSON lines. The default socket lives in
+$XDG_RUNTIME_DIR, or else in a sict-<uid> directory of the temp dir that
+only its owner can enter; clients refuse a socket served by another user
+(other than root). On TCP any local user can connect, so the daemon
+requires a shared token (--token or $SICT_DAEMON_TOKEN), sent first as
+{"op": "hello", "token": "..."}. Every request may carry an "id",
+which is echoed in its response. Requests are handled concurrently, so a
+client can pipeline many requests without waiting, and responses come back
+as they finish:
+
+    {"id": 1, "op": "scan", "path": "/srv/upload/a.pdf"}
+    {"id": 2, "op": "scan", "paths": ["/a", "/b"]}          -> "results": [...]
+    {"id": 3, "op": "scan_dir", "path": "/srv/share"}       -> one line per file, then "done"
+    {"id": 4, "op": "scan_bytes", "size": 1234, "name": "x"} followed by 1234 raw bytes
+    {"id": 5, "op": "lookup", "sha256": "..."}
+    {"op": "ping"} / {"op": "stats"} / {"op": "reload"}
+
+A file verdict carries path, sha256, infected, error, size, skipped and match
+like scanner.ScanResult. Files unchanged since they were last hashed are
+answered from the hash cache with a stat and one SQLite lookup, well under a
+millisecond. Paths are opened with the daemon's own permissions; the Unix
+socket is created readable by its owner only.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import scanner
+from hash_cache import HashCache
+from signature_index import SignatureIndex
+
+SOCKET_NAME = "sict-scan.sock"
+DEFAULT_PORT = 7341
+CACHE_FLUSH_INTERVAL = 1.0  # new hashes become cache hits after at most this long
+STREAM_BLOCK = 256 * 1024
+MAX_LINE = 16 * 1024 * 1024  # longest request line (a batch of paths)
+
+
+def _socket_dir():
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return runtime
+    # Not a fixed name in the shared temp dir: another user could create it first
+    suffix = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"sict-{suffix}")
+
+
+def default_socket():
+    return os.path.join(_socket_dir(), SOCKET_NAME)
+
+
+def _private_dir(directory):
+    """Create directory for the owner only, or check that an existing one is."""
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise OSError(f"{directory} is not a private directory of this user")
+
+
+def _socket_owner(sock, path):
+    """uid of the process serving the Unix socket (its file's owner where peer credentials are unknown)."""
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        return struct.unpack("3i", creds)[1]
+    return os.stat(path).st_uid
+
+
+def result_dict(result):
+    return {"path": result.path, "sha256": result.sha256, "infected": result.infected,
+            "error": result.error, "size": result.size, "skipped": result.skipped, "match": result.match}
+
+
+class ScanService:
+    """State shared by every connection: signatures, hash cache and hashing pool."""
+
+    def __init__(self, db_paths=(), cache=None, workers=scanner.DEFAULT_WORKERS,
+                 update_minutes=0, url=scanner.VIRUS_DB_URL):
+        self.db_paths = list(db_paths)
+        self.url = url
+        self.cache = cache
+        self.workers = workers
+        self.update_minutes = update_minutes
+        self.signatures = None  # None = scanner.virus_hashes (the downloaded DB)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sict-daemon")
+        self.started = time.time()
+        self.loaded = None
+        self.requests = 0
+        self.files = 0
+        self._stopped = threading.Event()
+
+    def load(self):
+        """(Re)load the DB. The new index is swapped in with one assignment."""
+        if self.db_paths:
+            indexes = [scanner.load_signatures(path) for path in self.db_paths]
+            self.signatures = indexes[0] if len(indexes) == 1 else SignatureIndex.union(indexes)
+        elif not scanner.load_cached_hashes(self.url):
+            scanner.fetch_and_update_hashes(self.url)
+        self.loaded = time.strftime("%Y-%m-%d %H:%M:%S")
+        print(f"✅ Virus DB loaded: {len(self.current())} signatures")
+
+    def current(self):
+        return scanner.virus_hashes if self.signatures is None else self.signatures
+
+    def start(self):
+        threading.Thread(target=self._flush_cache, daemon=True).start()
+        if self.update_minutes and not self.db_paths:
+            threading.Thread(target=self._update, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+    def _flush_cache(self):
+        # HashCache batches its writes; a daemon never "finishes a scan"
+        while not self._stopped.wait(CACHE_FLUSH_INTERVAL):
+            if self.cache is not None:
+                self.cache.flush()
+
+    def _update(self):
+        while not self._stopped.wait(self.update_minutes * 60):
+            scanner.fetch_and_update_hashes(self.url)
+
+    # --- verdicts ---
+    def scan_path(self, path):
+        self.files += 1
+        return result_dict(scanner.scan_file(path, self.current(), self.cache))
+
+    def scan_dir(self, path, stopped):
+        """Results for every file under path, hashed on the shared pool."""
+        entries = scanner.walk_entries(path, stopped)
+        return scanner.scan_files(entries, self.current(), scanner.PauseEvent(), stopped,
+                                  workers=self.workers, cache=self.cache, executor=self.pool)
+
+    def scan_stream(self, rfile, size, name=None):
+        """Verdict for size bytes read from rfile, hashed as they arrive."""
+        signatures = self.current()
+        sha256 = hashlib.sha256()
+        stream = signatures.patterns.stream() if signatures.patterns else None
+        left = size
+        while left:
+            block = rfile.read(min(STREAM_BLOCK, left))
+            if not block:
+                raise EOFError(f"connection closed {left} bytes before the end of the data")
+            sha256.update(block)
+            if stream is not None:
+                stream.feed(block)
+            left -= len(block)
+        self.files += 1
+        digest = sha256.digest()
+        match = stream.match if stream is not None else None
+        return {"path": name, "sha256": digest.hex(), "infected": digest in signatures or match is not None,
+                "error": None, "size": size, "skipped": None, "match": match}
+
+    def lookup(self, sha256):
+        return {"sha256": sha256, "infected": sha256 in self.current()}
+
+    def stats(self):
+        signatures = self.current()
+        stats = {"signatures": len(signatures), "patterns": len(signatures.patterns or ()),
+                 "loaded": self.loaded, "uptime": round(time.time() - self.started, 1),
+                 "requests": self.requests, "files": self.files, "workers": self.workers}
+        if self.cache is not None:
+            stats["cache_hits"] = self.cache.hits
+            stats["cache_misses"] = self.cache.misses
+        return stats
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection: requests are read in order and answered concurrently."""
+
+    def setup(self):
+        super().setup()
+        self.service = self.server.service
+        self.write_lock = threading.Lock()
+        self.stopped = threading.Event()  # set when the client goes away
+        self.futures = []
+        self.threads = []
+
+    def send(self, response):
+        data = (json.dumps(response) + "\n").encode("utf-8")
+        with self.write_lock:
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except OSError:
+                self.stopped.set()
+
+    def handle(self):
+        try:
+            if self.server.token is not None and not self.authenticate():
+                return
+            while not self.stopped.is_set():
+                line = self.rfile.readline(MAX_LINE)
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    self.send({"error": f"bad request: {e}"})
+                    continue
+                self.service.requests += 1
+                self.dispatch(request)
+        finally:
+            self.stopped.set()
+            # Let running requests finish before the socket is closed
+            wait(self.futures)
+            for thread in self.threads:
+                thread.join()
+
+    def authenticate(self):
+        """The first request must be a hello with the daemon's token."""
+        try:
+            hello = json.loads(self.rfile.readline(MAX_LINE))
+        except ValueError:
+            hello = None
+        if not isinstance(hello, dict):
+            hello = {}
+        token = str(hello.get("token") or "")
+        if hello.get("op") != "hello" or not hmac.compare_digest(token.encode("utf-8"),
+                                                                 self.server.token.encode("utf-8")):
+            self.reply(hello.get("id"), {"error": "bad token"})
+            return False
+        self.reply(hello.get("id"), {"welcome": True})
+        return True
+
+    def dispatch(self, request):
+        op = request.get("op")
+        rid = request.get("id")
+        try:
+            if op == "scan" and "paths" in request:
+                self.later(rid, lambda: {"results": [self.service.scan_path(p) for p in request["paths"]]})
+            elif op == "scan":
+                self.later(rid, lambda: self.service.scan_path(request["path"]))
+            elif op == "scan_dir":
+                thread = threading.Thread(target=self.scan_dir, args=(rid, request["path"]), daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            elif op == "scan_bytes":
+                # The bytes follow on this connection, so they are read right here
+                size = int(request["size"])
+                if size < 0:
+                    raise ValueError(f"bad size {size}")
+                self.reply(rid, self.service.scan_stream(self.rfile, size, request.get("name")))
+            elif op == "lookup":
+                self.reply(rid, self.service.lookup(request["sha256"]))
+            elif op == "ping":
+                self.reply(rid, {"pong": True})
+            elif op == "stats":
+                self.reply(rid, self.service.stats())
+            elif op == "reload":
+                self.later(rid, lambda: (self.service.load(), self.service.stats())[1])
+            else:
+                self.reply(rid, {"error": f"unknown op {op!r}"})
+        except EOFError:
+            self.stopped.set()
+        except Exception as e:
+            self.reply(rid, {"error": str(e)})
+
+    def reply(self, rid, response):
+        if rid is not None:
+            response["id"] = rid
+        self.send(response)
+
+    def later(self, rid, func):
+        def run():
+            try:
+                response = func()
+            except Exception as e:
+                response = {"error": str(e)}
+            self.reply(rid, response)
+        self.futures = [future for future in self.futures if not future.done()]
+        self.futures.append(self.service.pool.submit(run))
+
+    def scan_dir(self, rid, path):
+        scanned = infected = 0
+        try:
+            for result in self.service.scan_dir(path, self.stopped):
+                scanned += 1
+                infected += bool(result.infected)
+                self.reply(rid, result_dict(result))
+            self.reply(rid, {"done": True, "scanned": scanned, "infected": infected})
+        except Exception as e:
+            self.reply(rid, {"done": True, "error": str(e), "scanned": scanned, "infected": infected})
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _remove_stale_socket(path):
+    """Remove a socket left behind by a daemon that did not shut down cleanly."""
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise OSError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"another scan daemon is listening on {path}")
+
+
+def make_server(service, socket_path=None, port=None, token=None):
+    """A server bound to the Unix socket (default) or to 127.0.0.1:port.
+
+    With a token, clients must send it first (see the module docstring);
+    TCP needs one (ValueError otherwise). Raises OSError if another daemon
+    is still serving the socket.
+    """
+    if port is None and hasattr(socket, "AF_UNIX"):
+        if socket_path is None:
+            socket_path = default_socket()
+            _private_dir(os.path.dirname(socket_path))
+        _remove_stale_socket(socket_path)
+        old_umask = os.umask(0o077)
+        try:
+            server = _UnixServer(socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+    else:
+        if not token:
+            raise ValueError("a TCP scan daemon needs --token: any local user can connect to it")
+        server = _TCPServer(("127.0.0.1", DEFAULT_PORT if port is None else port), _Handler)
+    server.service = service
+    server.token = token or None
+    return server
+
+
+# === CLIENT ===
+class ScanClient:
+    """Talks to a running daemon. Not thread-safe: use one client per thread."""
+
+    def __init__(self, socket_path=None, port=None, timeout=None, token=None):
+        if port is None and hasattr(socket, "AF_UNIX"):
+            socket_path = socket_path or default_socket()
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.sock.connect(socket_path)
+                # Anyone who could create the socket first could answer "clean" for every file
+                owner = _socket_owner(self.sock, socket_path)
+                if owner not in (os.getuid(), 0):
+                    raise PermissionError(f"{socket_path} is served by uid {owner}, not by this user")
+            except OSError:
+                self.sock.close()
+                raise
+        else:
+            self.sock = socket.create_connection(("127.0.0.1", port or DEFAULT_PORT))
+        self.sock.settimeout(timeout)
+        self.rfile = self.sock.makefile("rb")
+        self._next_id = 0
+        self._early = {}  # responses that arrived before they were asked for
+        if token is not None:
+            response = self.request("hello", token=token)
+            if "error" in response:
+                self.close()
+                raise PermissionError(f"scan daemon refused the connection: {response['error']}")
+
+    def _send(self, request, data=None):
+        self._next_id += 1
+        request["id"] = self._next_id
+        payload = (json.dumps(request) + "\n").encode("utf-8")
+        self.sock.sendall(payload + data if data is not None else payload)
+        return self._next_id
+
+    def _receive(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("scan daemon closed the connection")
+        return json.loads(line)
+
+    def _wait(self, rid):
+        if rid in self._early:
+            return self._early.pop(rid)
+        while True:
+            response = self._receive()
+            if response.get("id") == rid:
+                return response
+            self._early[response.get("id")] = response
+
+    def request(self, op, **fields):
+        return self._wait(self._send(dict(fields, op=op)))
+
+    def scan(self, path):
+        return self.request("scan", path=os.path.abspath(path))
+
+    def scan_many(self, paths, window=256):
+        """Pipelined scans: yields responses as they come, up to window in flight."""
+        in_flight = 0
+        for path in paths:
+            self._send({"op": "scan", "path": os.path.abspath(path)})
+            in_flight += 1
+            if in_flight >= window:
+                yield self._receive()
+                in_flight -= 1
+        for _ in range(in_flight):
+            yield self._receive()
+
+    def scan_dir(self, path):
+        rid = self._send({"op": "scan_dir", "path": os.path.abspath(path)})
+        while True:
+            response = self._wait(rid)
+            if response.get("done"):
+                return
+            yield response
+
+    def scan_bytes(self, data, name=None):
+        return self._wait(self._send({"op": "scan_bytes", "size": len(data), "name": name}, bytes(data)))
+
+    def lookup(self, sha256):
+        return self.request("lookup", sha256=sha256)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+# === COMMAND LINE ===
+def build_parser():
+    parser = argparse.ArgumentParser(description="SICT scan daemon and client.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "scan", "stats"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--socket", help=f"Unix socket path (default {default_socket()})")
+        cmd.add_argument("--port", type=int, help="use 127.0.0.1:PORT instead of a Unix socket (needs --token)")
+        cmd.add_argument("--token", default=os.environ.get("SICT_DAEMON_TOKEN") or None,
+                         help="shared secret clients must send (default $SICT_DAEMON_TOKEN)")
+    serve = sub.choices["serve"]
+    serve.add_argument("--db", action="append", default=[],
+                       help="signature file or index (default: the downloaded DB); may be repeated")
+    serve.add_argument("--cache", metavar="FILE", default="scan_cache.db", help="SQLite hash cache")
+    serve.add_argument("--no-cache", action="store_true")
+    serve.add_argument("--workers", type=int, default=scanner.DEFAULT_WORKERS)
+    serve.add_argument("--update-minutes", type=float, default=60,
+                       help="refresh the downloaded DB this often (0 = never)")
+    sub.choices["scan"].add_argument("paths", nargs="+")
+    return parser
+
+
+def serve(args):
+    cache = None if args.no_cache else HashCache(args.cache)
+    service = ScanService(args.db, cache, args.workers, args.update_minutes)
+    try:
+        service.load()
+    except Exception as e:
+        print(f"⚠️ Could not load virus DB: {e}", file=sys.stderr)
+        return 2
+    try:
+        server = make_server(service, args.socket, args.port, args.token)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not start the scan daemon: {e}", file=sys.stderr)
+        service.stop()
+        return 2
+    service.start()
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=service.load, daemon=True).start())
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"🛡️ Scan daemon listening on {server.server_address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if isinstance(server, _UnixServer):
+            try:
+                os.remove(server.server_address)
+            except OSError:
+                pass
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "serve":
+        return serve(args)
+    try:
+        client = ScanClient(args.socket, args.port, token=args.token)
+    except OSError as e:
+        print(f"⚠️ Scan daemon not reachable: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.command == "stats":
+            print(json.dumps(client.request("stats"), indent=2))
+            return 0
+        infected = False
+        for path in args.paths:
+            responses = client.scan_dir(path) if os.path.isdir(path) else [client.scan(path)]
+            for response in responses:
+                infected |= bool(response.get("infected"))
+                print(json.dumps(response))
+        return 1 if infected else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,698 @@
+"""Headless scan engine for SICT AntiVirus.
+
+Nothing in this module touches Tk, the tray, sound or the network on import,
+so it can be used from main.py, the command line, batch jobs and benchmarks.
+"""
+import contextlib
+import copy
+import os
+import hashlib
+import stat
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from signature_index import SignatureIndex, MAGIC as INDEX_MAGIC
+from signature_updates import SignatureUpdater
+
+# === CONFIG ===
+VIRUS_DB_URL = "https://github.com/Rajapakar/sict/blob/main/virus-signatures.txt"
+virus_hashes = SignatureIndex.from_hex([])
+last_update_time = ""
+last_update_error = None
+
+# hashlib drops the GIL while hashing, so threads are enough to use every core
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class PauseEvent:
+    """threading.Event look-alike for pausing: waiters sleep until clear().
+
+    Unlike polling an Event, paused scans use no CPU and resume the
+    moment the flag is cleared. wake() makes waiters re-check their stop
+    event.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._flag = False
+
+    def is_set(self):
+        return self._flag
+
+    def set(self):
+        with self._cond:
+            self._flag = True
+
+    def clear(self):
+        with self._cond:
+            self._flag = False
+            self._cond.notify_all()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait_resumed(self, stopped):
+        with self._cond:
+            while self._flag and not stopped.is_set():
+                # The timeout only matters if stopped is set without wake()
+                self._cond.wait(1.0)
+        return not stopped.is_set()
+
+
+# Shared pause / stop switches (the GUI buttons flip these)
+scan_paused = PauseEvent()
+scan_stopped = threading.Event()
+
+# skipped names the prefilter stage ("size" / "head") that cleared a file
+# without a full hash, or "special" for a FIFO, socket or device, which is
+# never opened; sha256 is None for those. match is the name of the
+# byte pattern that flagged the file (None for SHA-256 matches). container
+# is set for archive members (see archives.py): the archive file on disk.
+# duration is the seconds spent reading the file (None if it was not read)
+ScanResult = namedtuple("ScanResult",
+                        ["path", "sha256", "infected", "error", "size", "skipped", "match", "container",
+                         "duration"],
+                        defaults=(None, None, None, None, None))
+
+
+# === SIGNATURE DB ===
+# virus_hashes is a SignatureIndex: `x in virus_hashes` takes raw digest()
+# bytes (no hexdigest formatting on the hot path) as well as hex strings.
+def parse_signatures(data):
+    return SignatureIndex.from_hex(data.splitlines())
+
+
+def load_signatures(path):
+    """Load a text DB (one SHA-256 per line) or memory-map a built index."""
+    with open(path, "rb") as f:
+        is_index = f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+    if is_index:
+        return SignatureIndex.open(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return SignatureIndex.from_hex(f)
+
+
+def as_signatures(signatures):
+    """Accept a plain set / list of hex strings wherever an index is expected.
+
+    Every call with a set builds a new index: scan_files / iter_scan convert
+    once per scan, callers of scan_file in a loop should convert up front.
+    """
+    if not isinstance(signatures, (set, frozenset, list, tuple)):
+        return signatures
+    return SignatureIndex.from_hex(signatures)
+
+
+def fetch_signatures(url=VIRUS_DB_URL, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return parse_signatures(response.read().decode("utf-8"))
+
+
+_updaters = {}
+
+
+def _updater(url):
+    updater = _updaters.get(url)
+    if updater is None:
+        updater = _updaters[url] = SignatureUpdater(url)
+    return updater
+
+
+def load_cached_hashes(url=VIRUS_DB_URL):
+    """Load the last downloaded DB from disk (no network). Returns True if found."""
+    global virus_hashes
+    local = _updater(url).load_local()
+    if local is None:
+        return False
+    virus_hashes = local
+    return True
+
+
+def fetch_and_update_hashes(url=VIRUS_DB_URL):
+    """Fetch only what changed in the signature DB and swap it in.
+
+    The new index is fully built before the single assignment to
+    virus_hashes, so running scans never see a half-built DB and are not
+    blocked. Returns True on success (including "nothing changed").
+    """
+    global virus_hashes, last_update_time, last_update_error
+    try:
+        if not len(virus_hashes):
+            load_cached_hashes(url)
+        new_index = _updater(url).update()
+        if new_index is not None:
+            virus_hashes = new_index
+        last_update_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        last_update_error = None
+        status = "Updated" if new_index is not None else "Unchanged"
+        print(f"✅ Virus DB {status}: {last_update_time} | Signatures: {len(virus_hashes)}")
+        return True
+    except Exception as e:
+        last_update_error = e
+        print(f"⚠️ Error updating Virus DB: {e}")
+        return False
+
+
+# === HASHING ===
+# Files are read with readinto() into one preallocated buffer per thread, so
+# there is no new bytes object per block. Small files get a block just big
+# enough to read them in one call, large ones MAX_BLOCK at a time.
+MIN_BLOCK = 64 * 1024
+MAX_BLOCK = 256 * 1024
+_buffers = threading.local()
+
+
+def _block_size(size):
+    if size <= MIN_BLOCK:
+        return MIN_BLOCK
+    return min(MAX_BLOCK, 1 << (size - 1).bit_length())
+
+
+def _read_buffer(size):
+    view = getattr(_buffers, "view", None)
+    if view is None:
+        view = _buffers.view = memoryview(bytearray(MAX_BLOCK))
+    return view[:_block_size(size)]
+
+
+def _hash_file(filepath, size=None, head_filter=None, metrics=None, stream=None):
+    """Raw SHA-256 digest() of a file.
+
+    With head_filter (a SignatureIndex holding head hashes) the first
+    head_filter.head_bytes are hashed and checked first, and None is
+    returned without reading further when no signature starts that way.
+    Otherwise hashing simply carries on from the head.
+
+    stream (a patterns.PatternStream) is fed every block as it is read, so
+    byte patterns are matched in the same pass as the hash.
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb', buffering=0) as f:
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+        buf = _read_buffer(size)
+        readinto = f.readinto
+        update = sha256.update
+        if stream is not None:
+            feed = stream.feed
+            if metrics is not None:
+                feed = metrics.timed("patterns", feed)
+
+            def update(block, hash_update=update):
+                hash_update(block)
+                feed(block)
+        if metrics is not None:
+            readinto = metrics.timed_reader(readinto)
+            update = metrics.timed("hash", update)
+        if head_filter is not None and size > head_filter.head_bytes:
+            head = buf[:head_filter.head_bytes]
+            n = readinto(head)
+            update(head[:n])
+            if n == len(head) and not head_filter.may_match_head(sha256.digest()):
+                return None
+        while True:
+            n = readinto(buf)
+            if not n:
+                break
+            update(buf[:n])
+    return sha256.digest()
+
+
+def calculate_sha256(filepath):
+    try:
+        return _hash_file(filepath).hex()
+    except Exception:
+        return None
+
+
+# === WALKING ===
+def walk_entries(directory, stopped=None, sort=False, scope=None):
+    """Yield an os.DirEntry for every file under directory as it is found.
+
+    Uses an explicit stack of pending directories instead of building a file
+    list, so hashing can start on the first file and memory does not grow
+    with the number of files. Directory symlinks are not followed (same as
+    os.walk). With sort=True each directory's files are yielded by name and
+    then its subdirectories walked by name, so the order is reproducible
+    (used to resume scans, see checkpoint.py). Only regular files are
+    yielded. With a scope.ScanScope, excluded directories are not entered
+    and files outside the scope are not yielded.
+    """
+    root_device = scope.root_device(directory) if scope is not None else None
+    stack = [directory]
+    while stack:
+        if stopped is not None and stopped.is_set():
+            return
+        path = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                if sort:
+                    it = sorted(it, key=lambda e: e.name)
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if scope is None or scope.enter(entry, root_device):
+                                subdirs.append(entry.path)
+                        elif entry.is_file() and (scope is None or scope.accept(entry)):
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        stack.extend(reversed(subdirs))
+
+
+def iter_files(directory):
+    for entry in walk_entries(directory):
+        yield entry.path
+
+
+class ScanProgress:
+    """Progress for a streaming scan.
+
+    The total is not known up front: a background thread counts files while
+    the scan runs, and percent() is refined as the count grows. It never
+    reports 100% before counting has finished.
+    """
+
+    def __init__(self, directory, stopped=None, scope=None):
+        self.scanned = 0
+        self.total = 0
+        self.counting = True
+        self._stopped = stopped
+        # A copy of the scope, so its counters only reflect the scan itself
+        self._scope = copy.copy(scope)
+        threading.Thread(target=self._count, args=(directory,), daemon=True).start()
+
+    def _count(self, directory):
+        for _ in walk_entries(directory, self._stopped, scope=self._scope):
+            self.total += 1
+        self.counting = False
+
+    def advance(self):
+        self.scanned += 1
+
+    def percent(self):
+        total = max(self.total, self.scanned)
+        if not total:
+            return 0.0
+        percent = self.scanned / total * 100
+        return min(percent, 99.0) if self.counting else percent
+
+
+# === SCANNING ===
+def _stat(target):
+    # DirEntry.stat() is cached from the directory walk
+    return target.stat() if isinstance(target, os.DirEntry) else os.stat(target)
+
+
+def _from_cache(target, signatures, cache, metrics=None, run=None):
+    """Result for an unchanged file straight from the hash cache, else None."""
+    filepath = os.fspath(target)
+    if metrics is not None:
+        start = time.perf_counter()
+    try:
+        st = _stat(target)
+    except OSError:
+        return None
+    if signatures is None:
+        signatures = virus_hashes
+    # With byte patterns a cached hash only helps if the file was also
+    # found clean by this exact pattern set
+    patterns = signatures.patterns.fingerprint if signatures.patterns else None
+    file_hash = cache.lookup(filepath, st, patterns, run)
+    if metrics is not None:
+        metrics.add_time("cache", time.perf_counter() - start)
+        metrics.count("cache_hits" if file_hash is not None else "cache_misses")
+    if file_hash is None:
+        return None
+    return ScanResult(filepath, file_hash, bytes.fromhex(file_hash) in signatures, None, st.st_size)
+
+
+def _hash_target(target, signatures, cache, metrics=None, run=None):
+    if signatures is None:
+        signatures = virus_hashes
+    filepath = os.fspath(target)
+    try:
+        # stat before reading: if the file changes while we hash it, the
+        # cached mtime will not match next time and it gets hashed again
+        if metrics is not None:
+            start = time.perf_counter()
+        st = _stat(target)
+        if metrics is not None:
+            metrics.add_time("stat", time.perf_counter() - start)
+        if not stat.S_ISREG(st.st_mode):
+            # FIFOs, sockets and devices: reading one can block forever
+            return ScanResult(filepath, None, False, None, st.st_size, "special")
+        stream = signatures.patterns.stream() if signatures.patterns else None
+        # Prefilters only apply to hashes: with byte patterns every file is read
+        if stream is None:
+            # No signature has this size -> clean without opening it
+            if not signatures.may_match_size(st.st_size):
+                return ScanResult(filepath, None, False, None, st.st_size, "size")
+            head_filter = signatures if signatures.has_heads else None
+        else:
+            head_filter = None
+        began = time.perf_counter()
+        digest = _hash_file(filepath, st.st_size, head_filter, metrics, stream)
+        duration = time.perf_counter() - began
+    except Exception as e:
+        return ScanResult(filepath, None, False, str(e))
+    if digest is None:
+        return ScanResult(filepath, None, False, None, st.st_size, "head", duration=duration)
+    file_hash = digest.hex()
+    match = stream.match if stream is not None else None
+    if cache is not None:
+        # Pattern hits are not cached as clean: they are scanned again each time
+        cache.store(filepath, st, file_hash,
+                    signatures.patterns.fingerprint if stream is not None and match is None else None, run)
+    if metrics is None:
+        infected = digest in signatures
+    else:
+        start = time.perf_counter()
+        infected = digest in signatures
+        metrics.add_time("lookup", time.perf_counter() - start)
+    return ScanResult(filepath, file_hash, infected or match is not None, None, st.st_size, None, match,
+                      duration=duration)
+
+
+def scan_file(target, signatures=None, cache=None, metrics=None):
+    """Scan a path or an os.DirEntry (whose cached stat data is reused).
+
+    signatures should be an index (see as_signatures) when scanning many files.
+    """
+    signatures = as_signatures(signatures)
+    if cache is not None:
+        result = _from_cache(target, signatures, cache, metrics)
+        if result is not None:
+            return result
+    return _hash_target(target, signatures, cache, metrics)
+
+
+def scan_entry(target, signatures=None, cache=None, metrics=None, archives=None, dedup=None, run=None):
+    """Everything scan_files does for one file: [its result, *archive member results]."""
+    signatures = as_signatures(signatures)
+    result = _from_cache(target, signatures, cache, metrics, run) if cache is not None else None
+    if result is None:
+        result = _timed_hash(target, signatures, cache, metrics, None, dedup, run)
+    if archives is not None:
+        result = _with_members(result, signatures, archives, metrics)
+    return result if isinstance(result, list) else [result]
+
+
+def _with_members(result, signatures, archives, metrics=None):
+    """result, or [result, *member results] if it is an archive (see archives.py)."""
+    if result.error or result.skipped == "special":
+        return result
+    members = archives.scan(result.path, virus_hashes if signatures is None else signatures, metrics)
+    if not members:
+        return result
+    if not result.infected and any(member.infected for member in members):
+        result = result._replace(infected=True)
+    return [result] + members
+
+
+def wait_while_paused(paused, stopped):
+    """Block while paused. Returns False once the scan has been stopped."""
+    if isinstance(paused, PauseEvent):
+        return paused.wait_resumed(stopped)
+    while paused.is_set() and not stopped.is_set():
+        stopped.wait(0.2)  # plain threading.Event: poll
+    return not stopped.is_set()
+
+
+def _admit(target, paused, stopped, throttle):
+    """Wait out pause and the throttle budget before target is hashed."""
+    if not wait_while_paused(paused, stopped):
+        return False
+    if throttle is None:
+        return True
+    try:
+        size = _stat(target).st_size
+    except OSError:
+        size = 0
+    return throttle.acquire(size, stopped)
+
+
+def scan_files(paths, signatures=None, paused=None, stopped=None, workers=1, cache=None,
+               metrics=None, throttle=None, executor=None, archives=None, dedup=None, run=None):
+    """Hash each path (or DirEntry) and yield a ScanResult, honouring pause / stop.
+
+    With workers > 1 files are hashed on a thread pool and results come back
+    in completion order, not in walk order. With a HashCache, unchanged
+    files are answered from the cache without being read. With a
+    metrics.ScanMetrics, stage timings and counters are recorded into it.
+    A throttle.Throttle limits the hashing rate and lowers its priority.
+
+    executor is an existing thread pool to hash on instead of a private
+    one; workers then only sets how many files this scan keeps queued on it.
+    With an archives.ArchiveScanner the members of archives are scanned too
+    and follow the archive's own result. A dedup.ScanDedup hashes hard links
+    (and optionally identical copies) only once. run is the caller's
+    HashCache.begin_run() token, if it will prune the cache afterwards.
+    """
+    paused = scan_paused if paused is None else paused
+    stopped = scan_stopped if stopped is None else stopped
+    signatures = as_signatures(signatures)
+    if workers > 1 or executor is not None:
+        results = _scan_parallel(paths, signatures, paused, stopped, max(workers, 1), cache, metrics,
+                                 throttle, executor, archives, dedup, run)
+    else:
+        results = _scan_serial(paths, signatures, paused, stopped, cache, metrics, throttle, archives,
+                               dedup, run)
+    if throttle is not None:
+        results = _throttled(results, throttle)
+    if metrics is not None:
+        results = _counting(results, metrics)
+    if cache is None:
+        return results
+    return _flushing(results, cache)
+
+
+def _throttled(results, throttle):
+    throttle.start()
+    try:
+        yield from results
+    finally:
+        throttle.stop()
+
+
+def _counting(results, metrics):
+    for result in results:
+        metrics.count("files")
+        if result.error:
+            metrics.count("errors")
+        elif result.infected:
+            metrics.count("infected")
+        elif result.skipped:
+            metrics.count("skipped_" + result.skipped)
+        yield result
+
+
+def _flushing(results, cache):
+    try:
+        yield from results
+    finally:
+        cache.flush()
+
+
+def _scan_serial(paths, signatures, paused, stopped, cache, metrics=None, throttle=None, archives=None,
+                 dedup=None, run=None):
+    if throttle is not None:
+        throttle.init_worker()
+    for filepath in paths:
+        if not wait_while_paused(paused, stopped):
+            return
+        result = _from_cache(filepath, signatures, cache, metrics, run) if cache is not None else None
+        if result is None:
+            if not _admit(filepath, paused, stopped, throttle):
+                return
+            result = _timed_hash(filepath, signatures, cache, metrics, throttle, dedup, run)
+        if archives is not None:
+            result = _with_members(result, signatures, archives, metrics)
+            if isinstance(result, list):
+                yield from result
+                continue
+        yield result
+
+
+def _timed_hash(filepath, signatures, cache, metrics, throttle, dedup=None, run=None):
+    if dedup is not None:
+        return _deduplicated(filepath, signatures, cache, metrics, throttle, dedup, run)
+    if metrics is None and throttle is None:
+        return _hash_target(filepath, signatures, cache, run=run)
+    start = time.perf_counter()
+    result = _hash_target(filepath, signatures, cache, metrics, run)
+    elapsed = time.perf_counter() - start
+    if metrics is not None:
+        metrics.add_busy(elapsed)
+    if throttle is not None and result.sha256 is not None:
+        throttle.note_read(result.size, elapsed)
+    return result
+
+
+def _deduplicated(filepath, signatures, cache, metrics, throttle, dedup, run=None):
+    try:
+        st = _stat(filepath)
+    except OSError:
+        return _timed_hash(filepath, signatures, cache, metrics, throttle, run=run)
+    if signatures is None:
+        signatures = virus_hashes
+    # A hash cached under another pattern set still identifies the content
+    known = None
+    if dedup.content and cache is not None and signatures.patterns:
+        known = cache.lookup(filepath, st, run=run)
+    result = dedup.scan(filepath, st,
+                        lambda: _timed_hash(filepath, signatures, cache, metrics, throttle, run=run), known)
+    if result.skipped != "duplicate":
+        return result
+    if metrics is not None:
+        metrics.count("dedup_bytes", st.st_size)
+    if cache is not None and result.sha256 is not None:
+        # Cached under its own path too, so the next scan skips it up front
+        patterns = signatures.patterns.fingerprint if signatures.patterns and result.match is None else None
+        cache.store(result.path, st, result.sha256, patterns, run)
+    return result
+
+
+def _scan_parallel(paths, signatures, paused, stopped, workers, cache, metrics=None, throttle=None,
+                   executor=None, archives=None, dedup=None, run=None):
+    def task(filepath, result=None):
+        # Re-check here so pause / stop reach files already queued on the pool.
+        # A paused file goes back to the feeder rather than holding a pool
+        # thread, which may be shared with other scans (jobs.py)
+        if stopped.is_set():
+            return None
+        if paused.is_set():
+            return _Deferred(filepath)
+        if result is None:
+            result = _timed_hash(filepath, signatures, cache, metrics, throttle, dedup, run)
+        if archives is not None:
+            return _with_members(result, signatures, archives, metrics)
+        return result
+
+    def submit(filepath, result=None):
+        pending.add(pool.submit(task, filepath, result))
+        if metrics is not None:
+            metrics.set_queue_depth(len(pending))
+
+    # Keep only a couple of files per worker queued so memory stays bounded
+    max_inflight = workers * 2
+    pending = set()
+    deferred = []
+    if executor is not None:
+        # Shared pool (jobs.py): it outlives this scan, so it is not shut down here
+        context = contextlib.nullcontext(executor)
+    else:
+        initializer = throttle.init_worker if throttle is not None else None
+        context = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sict-scan",
+                                     initializer=initializer)
+    with context as pool:
+        try:
+            for filepath in paths:
+                if not wait_while_paused(paused, stopped):
+                    break
+                while deferred:
+                    submit(deferred.pop())
+                # Cache hits are answered here without a round trip through the pool
+                result = _from_cache(filepath, signatures, cache, metrics, run) if cache is not None else None
+                if result is not None and archives is None:
+                    yield result
+                    continue
+                if result is not None:
+                    # Members are not cached: the pool still looks inside
+                    submit(filepath, result)
+                # The budget is spent here, so one throttle paces all workers
+                elif throttle is not None and not _admit(filepath, paused, stopped, throttle):
+                    break
+                else:
+                    submit(filepath)
+                if len(pending) >= max_inflight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from _collect(done, deferred)
+            while pending or deferred:
+                if not wait_while_paused(paused, stopped):
+                    break
+                while deferred:
+                    submit(deferred.pop())
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from _collect(done, deferred)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class _Deferred:
+    __slots__ = ("target",)
+
+    def __init__(self, target):
+        self.target = target
+
+
+def _collect(futures, deferred):
+    for future in futures:
+        result = future.result()
+        if isinstance(result, _Deferred):
+            deferred.append(result.target)
+        elif isinstance(result, list):
+            yield from result
+        elif result is not None:
+            yield result
+
+
+def iter_scan(directory, signatures=None, paused=None, stopped=None, workers=1, progress=None,
+              cache=None, metrics=None, throttle=None, checkpoint=None, executor=None, archives=None,
+              dedup=None, scope=None):
+    """Stream results for everything under directory while it is being walked.
+
+    With a HashCache, entries for files that disappeared from directory are
+    evicted once the walk has completed without being stopped. With a
+    checkpoint.ScanCheckpoint the scan resumes where an interrupted scan of
+    directory stopped, and saves its own position as it goes. A
+    scope.ScanScope limits which folders and files are scanned.
+    """
+    stopped = scan_stopped if stopped is None else stopped
+    signatures = as_signatures(signatures)  # once for the whole scan
+    run = None
+    if cache is not None:
+        directory = os.path.abspath(directory)
+        if checkpoint is not None and checkpoint.run is not None:
+            # Files before the checkpoint were seen under the old run token
+            run = cache.resume_run(checkpoint.run)
+        else:
+            run = cache.begin_run()
+        if checkpoint is not None:
+            checkpoint.run = run
+    entries = walk_entries(directory, stopped, sort=checkpoint is not None, scope=scope)
+    if checkpoint is not None:
+        entries = checkpoint.track(entries, progress.advance if progress is not None else None)
+    if metrics is not None:
+        entries = metrics.timed_iter("walk", entries)
+    results = scan_files(entries, signatures, paused, stopped, workers, cache, metrics, throttle,
+                         executor, archives, dedup, run)
+    completed = False
+    try:
+        for result in results:
+            # Archive members are not files of the walk
+            if result.container is None:
+                if checkpoint is not None:
+                    checkpoint.done(result)
+                if progress is not None:
+                    progress.advance()
+            yield result
+        completed = not stopped.is_set()
+    finally:
+        if checkpoint is not None:
+            if completed:
+                checkpoint.finish()
+            else:
+                checkpoint.save()
+    if metrics is not None:
+        metrics.finish()
+    if cache is not None and completed:
+        cache.prune(directory, run)
@@ -0,0 +1,182 @@
+"""What a folder scan looks at: path rules, extensions, sizes, filesystems.
+
+A ScanScope passed to scanner.walk_entries / iter_scan (scope=...) is
+checked while the tree is walked, so an excluded directory is never opened.
+
+Path rules are globs, or regular expressions when prefixed with "re:".
+A glob without "/" matches the file or directory name anywhere in the tree
+("node_modules", "*.tmp"); one with "/" matches the whole path ("/proc",
+"*/cache/*"; "*" also matches "/"). A regex is searched in the whole path.
+Exclude rules prune directories and drop files; include rules, if any,
+only keep the files that match one (directories are still walked).
+
+Extensions ("exe", ".dll") and min / max size apply to files only. With
+one_filesystem=True, directories on another device than the scan root
+(/proc, network and container mounts) are not entered. The walk only yields
+regular files; sockets, FIFOs and devices given any other way (a path on
+the command line, a real-time event, a daemon request) are skipped by the
+scan engine itself, since reading a FIFO can block the scan forever.
+
+In settings.json (all optional):
+
+    "scan_exclude": ["node_modules", "/proc", "re:\\\\.cache/"],
+    "scan_include": [],
+    "scan_extensions": [], "scan_skip_extensions": ["iso"],
+    "scan_min_size": 0, "scan_max_size_mb": 0,
+    "scan_one_filesystem": false
+"""
+import fnmatch
+import os
+import re
+
+REGEX_PREFIX = "re:"
+
+# Left out when settings have no "scan_exclude": virtual filesystems and
+# container layers only waste time. .git is scanned, a payload can hide there.
+DEFAULT_EXCLUDE = ("/proc", "/sys", "/dev", "/var/lib/docker/overlay2", "/var/lib/containers/storage/overlay")
+
+
+def _normpath(path):
+    return path.replace(os.sep, "/") if os.sep != "/" else path
+
+
+def _extension(ext):
+    ext = ext.lower()
+    return ext if ext.startswith(".") else "." + ext
+
+
+class _Rules:
+    """Globs and regexes compiled into one name regex and one path regex."""
+
+    def __init__(self, rules):
+        names, paths = [], []
+        for rule in rules:
+            if rule.startswith(REGEX_PREFIX):
+                paths.append(f"(?:{rule[len(REGEX_PREFIX):]})")
+            elif "/" in rule:
+                paths.append(f"(?:^{fnmatch.translate(rule.rstrip('/') or '/')})")
+            else:
+                names.append(f"(?:{fnmatch.translate(rule)})")
+        # fnmatch.translate is case-sensitive as written; os.path.normcase decides
+        flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+        self.names = re.compile("|".join(names), flags) if names else None
+        self.paths = re.compile("|".join(paths), flags) if paths else None
+
+    def __bool__(self):
+        return self.names is not None or self.paths is not None
+
+    def match(self, name, path):
+        return bool((self.names is not None and self.names.match(name))
+                    or (self.paths is not None and self.paths.search(_normpath(path))))
+
+
+class _PathEntry:
+    """os.DirEntry stand-in for a path that did not come from a directory walk."""
+
+    __slots__ = ("path", "name")
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def stat(self, follow_symlinks=True):
+        return os.stat(self.path, follow_symlinks=follow_symlinks)
+
+
+class ScanScope:
+    def __init__(self, exclude=(), include=(), extensions=(), skip_extensions=(), min_size=0,
+                 max_size=0, one_filesystem=False):
+        self.exclude = _Rules(exclude)
+        self.include = _Rules(include)
+        self.extensions = frozenset(_extension(ext) for ext in extensions)
+        self.skip_extensions = frozenset(_extension(ext) for ext in skip_extensions)
+        self.min_size = min_size
+        self.max_size = max_size  # 0 = no limit
+        self.one_filesystem = one_filesystem
+        self.pruned = 0  # directories not entered
+        self.skipped = 0  # files left out
+
+    @classmethod
+    def from_settings(cls, settings):
+        """None when no rule is set, so walks without rules pay nothing."""
+        scope = cls(exclude=settings.get("scan_exclude", DEFAULT_EXCLUDE), include=settings.get("scan_include", ()),
+                    extensions=settings.get("scan_extensions", ()),
+                    skip_extensions=settings.get("scan_skip_extensions", ()),
+                    min_size=settings.get("scan_min_size", 0),
+                    max_size=int(settings.get("scan_max_size_mb", 0) * 1024 * 1024),
+                    one_filesystem=settings.get("scan_one_filesystem", False))
+        return scope if scope.active() else None
+
+    def active(self):
+        return bool(self.exclude or self.include or self.extensions or self.skip_extensions
+                    or self.min_size or self.max_size or self.one_filesystem)
+
+    def root_device(self, directory):
+        if not self.one_filesystem:
+            return None
+        try:
+            return os.stat(directory).st_dev
+        except OSError:
+            return None
+
+    def enter(self, entry, root_device=None):
+        """Whether the walk descends into the directory entry."""
+        if not self._enter(entry, root_device):
+            self.pruned += 1
+            return False
+        return True
+
+    def _enter(self, entry, root_device):
+        if self.exclude and self.exclude.match(entry.name, entry.path):
+            return False
+        if root_device is not None:
+            try:
+                if entry.stat(follow_symlinks=False).st_dev != root_device:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def accept(self, entry):
+        """Whether the file entry is scanned."""
+        if not self._accept(entry):
+            self.skipped += 1
+            return False
+        return True
+
+    def _accept(self, entry):
+        if self.exclude and self.exclude.match(entry.name, entry.path):
+            return False
+        if self.include and not self.include.match(entry.name, entry.path):
+            return False
+        if self.extensions or self.skip_extensions:
+            ext = os.path.splitext(entry.name)[1].lower()
+            if self.extensions and ext not in self.extensions:
+                return False
+            if ext in self.skip_extensions:
+                return False
+        if self.min_size or self.max_size:
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                return False
+            if size < self.min_size or (self.max_size and size > self.max_size):
+                return False
+        return True
+
+    def accept_path(self, path, root):
+        """Whether a file reported outside a walk (a real-time event) is in scope under root.
+
+        Every folder between root and the file must be one the walk would
+        enter. Not counted in pruned / skipped.
+        """
+        root_device = self.root_device(root)
+        directory = root
+        for part in os.path.relpath(path, root).split(os.sep)[:-1]:
+            directory = os.path.join(directory, part)
+            if not self._enter(_PathEntry(directory), root_device):
+                return False
+        return self._accept(_PathEntry(path))
+
+    def summary(self):
+        return f"🔎 Scope: {self.pruned} folders and {self.skipped} files left out"
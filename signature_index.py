@@ -0,0 +1,399 @@
+"""Compact SHA-256 signature store.
+
+Signatures are kept as sorted 32-byte binary digests (about 32 bytes per
+signature instead of a ~130-byte Python str in a set). A 65536-entry table
+indexed by the first two digest bytes narrows every lookup to one small
+bucket, which is then binary-searched. An optional Bloom filter answers most
+misses without touching the digests at all.
+
+Text DB lines are "<sha256>" or "<sha256> <size> [<head sha256>]" (commas
+work too), plus "pattern:<name>:<hex>" byte patterns (see patterns.py). When every signature carries its file size, files of any other
+size cannot match and are never read. When every signature also carries the
+SHA-256 of its first HEAD_BYTES, one small head read rules out most of the
+rest before the full hash.
+
+Index files can be memory-mapped, so loading is near-instant and several
+processes share one copy through the page cache:
+
+    python signature_index.py build virus-db.txt -o virus-db.idx --bloom-bits 10
+"""
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from patterns import PATTERN_PREFIX, PatternSet
+
+MAGIC = b"SICTSIG1"
+VERSION = 2
+DIGEST_SIZE = 32
+BUCKETS = 1 << 16
+HEAD_BYTES = 4096
+FLAG_SIZES = 1  # every signature has a size
+FLAG_HEADS = 2  # every signature has a head hash
+FLAG_PATTERNS = 4  # byte patterns follow the sizes, one text line each
+# magic, version, flags, count, bloom size in bytes, bloom hash count,
+# head bytes, number of distinct sizes, number of distinct head hashes
+_HEADER = struct.Struct("<8sIIQQIIQQ")
+_HEADER_V1 = struct.Struct("<8sIIQQI4x")
+_TABLE_BYTES = (BUCKETS + 1) * 8
+
+
+def to_digest(key):
+    """Accept raw digest bytes or a hex string; None if it is not a SHA-256."""
+    if isinstance(key, str):
+        try:
+            key = bytes.fromhex(key.strip())
+        except ValueError:
+            return None
+    if len(key) != DIGEST_SIZE:
+        return None
+    return bytes(key)
+
+
+def parse_record(line):
+    """(digest, size or None, head digest or None) for one DB line, or None."""
+    fields = line.replace(",", " ").split()
+    if not fields:
+        return None
+    digest = to_digest(fields[0])
+    if digest is None:
+        return None
+    size = head = None
+    if len(fields) > 1 and fields[1].isdigit():
+        size = int(fields[1])
+    if len(fields) > 2:
+        head = to_digest(fields[2])
+    return digest, size, head
+
+
+def _chunks(blob):
+    return (blob[i:i + DIGEST_SIZE] for i in range(0, len(blob), DIGEST_SIZE))
+
+
+def _bloom_positions(digest, k, nbits):
+    # SHA-256 output is uniformly distributed, so slices of it are already
+    # independent hash values; no need to hash again
+    for i in range(k):
+        yield int.from_bytes(digest[4 * i + 2:4 * i + 6], "little") % nbits
+
+
+def _build_bloom(digests, count, bits_per_entry):
+    nbits = max(64, count * bits_per_entry)
+    k = max(1, min(7, round(bits_per_entry * 0.69)))
+    bloom = bytearray((nbits + 7) // 8)
+    for digest in digests:
+        for pos in _bloom_positions(digest, k, nbits):
+            bloom[pos >> 3] |= 1 << (pos & 7)
+    return bloom, k
+
+
+def _bucket_table(digests_blob, count):
+    # table[b] = index of the first digest whose two-byte prefix is >= b
+    end = count * DIGEST_SIZE
+    pairs = bytearray(2 * count)
+    pairs[0::2] = digests_blob[0:end:DIGEST_SIZE]
+    pairs[1::2] = digests_blob[1:end:DIGEST_SIZE]
+    prefixes = array("H", pairs)
+    if sys.byteorder == "little":
+        prefixes.byteswap()
+    # One pass over the distinct prefixes (at most one per bucket), each
+    # filling the run of empty buckets before it with its first index
+    table = array("Q", bytes(_TABLE_BYTES))
+    i = 0
+    last = 0  # buckets up to and including last are filled
+    while i < count:
+        prefix = prefixes[i]
+        if prefix > last:
+            table[last + 1:prefix + 1] = array("Q", [i]) * (prefix - last)
+            last = prefix
+        i = bisect_right(prefixes, prefix, i)
+    table[last + 1:] = array("Q", [count]) * (BUCKETS - last)
+    return table
+
+
+def _search(buf, base, lo, hi, digest):
+    while lo < hi:
+        mid = (lo + hi) // 2
+        probe = buf[base + mid * DIGEST_SIZE:base + (mid + 1) * DIGEST_SIZE]
+        if probe < digest:
+            lo = mid + 1
+        elif probe > digest:
+            hi = mid
+        else:
+            return True
+    return False
+
+
+class SignatureIndex:
+    """Read-only set of SHA-256 digests supporting `digest in index`.
+
+    buf is a bytes object or an mmap (both slice to bytes). It holds the
+    digests at offset base, then the Bloom filter and the head hashes.
+    sizes is a sorted sequence of ints, or None when not every signature
+    has a size; heads_count is None when not every signature has a head.
+    """
+
+    def __init__(self, buf, count, base=0, bloom_size=0, bloom_k=0, table=None,
+                 sizes=None, heads_count=None, head_bytes=HEAD_BYTES, patterns=None):
+        self._buf = buf
+        self._base = base
+        self._count = count
+        self._bloom_at = base + count * DIGEST_SIZE
+        self._bloom_size = bloom_size
+        self._bloom_k = bloom_k
+        self._bloom_bits = bloom_size * 8
+        self._heads_at = self._bloom_at + bloom_size
+        self._heads_count = heads_count
+        self._sizes = sizes
+        self.head_bytes = head_bytes
+        self._table = table if table is not None else _bucket_table(buf, count)
+        self.patterns = patterns if patterns else None  # PatternSet
+
+    # --- construction ---
+    @classmethod
+    def build(cls, digests, bloom_bits=0, sizes=None, heads=None, head_bytes=HEAD_BYTES,
+              patterns=None):
+        """Build in memory from sorted, duplicate-free digests.
+
+        sizes / heads are sets covering every signature, or None.
+        """
+        blob = b"".join(digests)
+        count = len(blob) // DIGEST_SIZE
+        table = _bucket_table(blob, count)
+        parts = [blob]
+        bloom_size = bloom_k = 0
+        if bloom_bits:
+            bloom, bloom_k = _build_bloom(_chunks(blob), count, bloom_bits)
+            bloom_size = len(bloom)
+            parts.append(bloom)
+        heads_count = None
+        if heads is not None:
+            parts.append(b"".join(sorted(heads)))
+            heads_count = len(heads)
+        sizes = array("Q", sorted(sizes)) if sizes is not None else None
+        buf = b"".join(parts) if len(parts) > 1 else blob
+        return cls(buf, count, 0, bloom_size, bloom_k, table, sizes, heads_count, head_bytes,
+                   patterns)
+
+    @classmethod
+    def from_digests(cls, digests, bloom_bits=0):
+        """Build from an iterable of 32-byte digests (any order, dupes ok)."""
+        return cls.build(sorted(set(digests)), bloom_bits)
+
+    @classmethod
+    def from_records(cls, records, bloom_bits=0, patterns=None):
+        """Build from parse_record() tuples, keeping sizes / heads when complete."""
+        digests, sizes, heads = set(), set(), set()
+        for digest, size, head in records:
+            digests.add(digest)
+            # a single signature without a size / head turns that stage off
+            if size is None:
+                sizes = None
+            elif sizes is not None:
+                sizes.add(size)
+            if head is None:
+                heads = None
+            elif heads is not None:
+                heads.add(head)
+        if not digests:
+            sizes = heads = None  # an empty DB should not rule out every file
+        return cls.build(sorted(digests), bloom_bits, sizes, heads, patterns=patterns)
+
+    @classmethod
+    def from_hex(cls, lines, bloom_bits=0):
+        """Build from text DB lines; blank and malformed lines are ignored."""
+        pattern_lines = []
+
+        def records():
+            for line in lines:
+                if line.startswith(PATTERN_PREFIX):
+                    pattern_lines.append(line)
+                    continue
+                record = parse_record(line)
+                if record is not None:
+                    yield record
+        index = cls.from_records(records(), bloom_bits)
+        if pattern_lines:
+            index.patterns = PatternSet.from_lines(pattern_lines) or None
+        return index
+
+    @classmethod
+    def from_sorted_digests(cls, digests, bloom_bits=0, sizes=None, heads=None, patterns=None):
+        """Build from an already sorted, duplicate-free digest stream."""
+        return cls.build(digests, bloom_bits, sizes, heads, patterns=patterns)
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map an index file written by save()."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = struct.unpack_from("<8sI", mm, 0)
+        if magic != MAGIC or version not in (1, VERSION):
+            mm.close()
+            raise ValueError(f"{path} is not a signature index")
+        if version == 1:
+            _, _, flags, count, bloom_size, bloom_k = _HEADER_V1.unpack_from(mm, 0)
+            head_bytes, sizes_count, heads_count, header_size = HEAD_BYTES, 0, 0, _HEADER_V1.size
+        else:
+            (_, _, flags, count, bloom_size, bloom_k,
+             head_bytes, sizes_count, heads_count) = _HEADER.unpack_from(mm, 0)
+            header_size = _HEADER.size
+        table = array("Q")
+        table.frombytes(mm[header_size:header_size + _TABLE_BYTES])
+        if sys.byteorder == "big":
+            table.byteswap()
+        base = header_size + _TABLE_BYTES
+        sizes = None
+        start = base + count * DIGEST_SIZE + bloom_size + heads_count * DIGEST_SIZE
+        if flags & FLAG_SIZES:
+            sizes = array("Q")
+            sizes.frombytes(mm[start:start + sizes_count * 8])
+            if sys.byteorder == "big":
+                sizes.byteswap()
+        patterns = None
+        if flags & FLAG_PATTERNS:
+            lines = mm[start + sizes_count * 8:].decode("utf-8").splitlines()
+            patterns = PatternSet.from_lines(lines)
+        return cls(mm, count, base, bloom_size, bloom_k, table, sizes,
+                   heads_count if flags & FLAG_HEADS else None, head_bytes, patterns)
+
+    def save(self, path):
+        """Write the index atomically (readers of the old file keep their mapping)."""
+        table = array("Q", self._table)
+        sizes = array("Q", self._sizes if self._sizes is not None else [])
+        if sys.byteorder == "big":
+            table.byteswap()
+            sizes.byteswap()
+        flags = ((FLAG_SIZES if self.has_sizes else 0) | (FLAG_HEADS if self.has_heads else 0)
+                 | (FLAG_PATTERNS if self.patterns else 0))
+        heads_count = self._heads_count or 0
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, flags, self._count, self._bloom_size,
+                                 self._bloom_k, self.head_bytes, len(sizes), heads_count))
+            f.write(table.tobytes())
+            f.write(self._buf[self._base:self._heads_at + heads_count * DIGEST_SIZE])
+            f.write(sizes.tobytes())
+            if self.patterns:
+                f.write("".join(line + "\n" for line in self.patterns.lines()).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+
+    # --- lookup ---
+    def __contains__(self, key):
+        digest = key if type(key) is bytes and len(key) == DIGEST_SIZE else to_digest(key)
+        if digest is None:
+            return False
+        buf = self._buf
+        if self._bloom_size:
+            at = self._bloom_at
+            for pos in _bloom_positions(digest, self._bloom_k, self._bloom_bits):
+                if not buf[at + (pos >> 3)] & (1 << (pos & 7)):
+                    return False
+        bucket = (digest[0] << 8) | digest[1]
+        return _search(buf, self._base, self._table[bucket], self._table[bucket + 1], digest)
+
+    # --- prefilter ---
+    @property
+    def has_sizes(self):
+        return self._sizes is not None
+
+    @property
+    def has_heads(self):
+        return self._heads_count is not None
+
+    def may_match_size(self, size):
+        """False only if no signature can have this file size."""
+        sizes = self._sizes
+        if sizes is None:
+            return True
+        i = bisect_left(sizes, size)
+        return i < len(sizes) and sizes[i] == size
+
+    def may_match_head(self, head_digest):
+        """False only if no signature's first head_bytes hash to head_digest."""
+        if self._heads_count is None:
+            return True
+        return _search(self._buf, self._heads_at, 0, self._heads_count, head_digest)
+
+    def sizes(self):
+        return None if self._sizes is None else set(self._sizes)
+
+    def heads(self):
+        if self._heads_count is None:
+            return None
+        at = self._heads_at
+        return set(_chunks(self._buf[at:at + self._heads_count * DIGEST_SIZE]))
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """Yield the digests in sorted order."""
+        buf, base = self._buf, self._base
+        for i in range(self._count):
+            yield buf[base + i * DIGEST_SIZE:base + (i + 1) * DIGEST_SIZE]
+
+    @classmethod
+    def union(cls, indexes, bloom_bits=None):
+        """One index with the signatures and patterns of all of indexes.
+
+        bloom_bits=None keeps the densest Bloom filter of the inputs (bits per
+        signature); 0 builds none.
+        """
+        indexes = list(indexes)
+        if bloom_bits is None:
+            bloom_bits = max((index._bloom_bits // max(1, len(index)) for index in indexes), default=0)
+        sizes, heads = set(), set()
+        patterns = []
+        for index in indexes:
+            sizes = sizes | index.sizes() if sizes is not None and index.has_sizes else None
+            heads = heads | index.heads() if heads is not None and index.has_heads else None
+            if index.patterns:
+                patterns.extend(index.patterns)
+        return cls.build(_unique(heapq.merge(*indexes)), bloom_bits, sizes, heads,
+                         patterns=PatternSet(patterns) if patterns else None)
+
+
+def _unique(sorted_digests):
+    last = None
+    for digest in sorted_digests:
+        if digest != last:
+            yield digest
+            last = digest
+
+
+def build_index(source, dest, bloom_bits=0):
+    with open(source, "r", encoding="utf-8") as f:
+        index = SignatureIndex.from_hex(f, bloom_bits)
+    index.save(dest)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a memory-mappable signature index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="convert a text DB (\"<sha256> [<size> [<head sha256>]]\" lines)")
+    build.add_argument("source")
+    build.add_argument("-o", "--output", required=True)
+    build.add_argument("--bloom-bits", type=int, default=0,
+                       help="Bloom filter bits per signature (0 = no filter, 10 ~ 1%% false positives)")
+    args = parser.parse_args(argv)
+    index = build_index(args.source, args.output, args.bloom_bits)
+    print(f"✅ Wrote {len(index)} signatures and {len(index.patterns or ())} patterns to {args.output}"
+          f" (size prefilter: {'on' if index.has_sizes else 'off'},"
+          f" head prefilter: {'on' if index.has_heads else 'off'})")
+
+
+if __name__ == "__main__":
+    main()
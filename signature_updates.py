@@ -0,0 +1,242 @@
+"""Incremental signature DB updates.
+
+Two feed layouts are understood:
+
+* a plain text DB (one SHA-256 per line), like VIRUS_DB_URL. It is fetched
+  with If-None-Match / If-Modified-Since, so an unchanged feed costs a 304.
+* a versioned feed: a JSON manifest such as
+
+      {"version": 42, "full": "virus-db-42.txt",
+       "deltas": [{"from": 41, "to": 42, "url": "delta-41-42.txt"}]}
+
+  Delta files hold "+<sha256>" and "-<sha256>" lines (and "+pattern:..." /
+  "-pattern:..." for byte patterns). A client at version
+  40 applies 40->41 and 41->42 instead of downloading the full DB again,
+  and falls back to "full" when the chain is incomplete.
+
+The current index is kept on disk (memory-mapped) in DB_DIR so the next
+start can load it without the network. Every update writes a new file
+instead of overwriting the one that running scans may still have mapped.
+"""
+import argparse
+import glob
+import heapq
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from patterns import PATTERN_PREFIX, PatternSet, parse_pattern
+from signature_index import SignatureIndex, parse_record, to_digest
+
+DB_DIR = "virus_db"
+STATE_FILE = "state.json"
+MAX_DELTA_CHAIN = 50
+
+
+class SignatureUpdater:
+    def __init__(self, url, db_dir=DB_DIR, timeout=30):
+        self.url = url
+        self.db_dir = db_dir
+        self.timeout = timeout
+        self.state_path = os.path.join(db_dir, STATE_FILE)
+        self.state = self._load_state()
+        self.downloaded_bytes = 0
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            if state.get("url") == self.url:
+                return state
+        except (OSError, ValueError):
+            pass
+        return {"url": self.url, "generation": 0}
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp, self.state_path)
+
+    @property
+    def index_path(self):
+        name = self.state.get("index")
+        return os.path.join(self.db_dir, name) if name else None
+
+    def load_local(self):
+        """The last downloaded index, or None if there is none yet."""
+        path = self.index_path
+        if path and os.path.exists(path):
+            return SignatureIndex.open(path)
+        return None
+
+    # --- HTTP ---
+    def _get(self, url, validators=None):
+        """GET url. Returns (body, headers), or (None, None) on 304 Not Modified."""
+        request = urllib.request.Request(url)
+        for header, key in (("If-None-Match", "etag"), ("If-Modified-Since", "last_modified")):
+            if validators and validators.get(key):
+                request.add_header(header, validators[key])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                self.downloaded_bytes += len(body)
+                return body, response.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, None
+            raise
+
+    # --- update ---
+    def update(self, current=None):
+        """Fetch changes. Returns the new SignatureIndex, or None if nothing changed.
+
+        current is the index in use; deltas are applied on top of it (the
+        local copy is loaded when it is not given).
+        """
+        os.makedirs(self.db_dir, exist_ok=True)
+        have_local = self.index_path is not None and os.path.exists(self.index_path)
+        body, headers = self._get(self.url, self.state if have_local else None)
+        if body is None:
+            return None
+        validators = {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+
+        if body.lstrip()[:1] == b"{":
+            index, version = self._update_from_manifest(json.loads(body), current, have_local)
+        else:
+            index, version = SignatureIndex.from_hex(body.decode("utf-8").splitlines()), None
+        self.state.update(validators)
+        if index is None:
+            self._save_state()
+            return None
+        self.state["version"] = version
+        self._store(index)
+        return self.load_local()
+
+    def _update_from_manifest(self, manifest, current, have_local):
+        target = manifest["version"]
+        local = self.state.get("version")
+        if have_local and local == target:
+            return None, target
+
+        chain = self._delta_chain(manifest.get("deltas", []), local, target) if have_local else None
+        if chain:
+            if current is None:
+                current = self.load_local()
+            for delta in chain:
+                body, _ = self._get(urllib.parse.urljoin(self.url, delta["url"]))
+                current = apply_delta(current, body.decode("utf-8").splitlines())
+            return current, target
+
+        body, _ = self._get(urllib.parse.urljoin(self.url, manifest["full"]))
+        return SignatureIndex.from_hex(body.decode("utf-8").splitlines()), target
+
+    @staticmethod
+    def _delta_chain(deltas, local, target):
+        if local is None:
+            return None
+        by_from = {d["from"]: d for d in deltas}
+        chain = []
+        version = local
+        while version != target:
+            delta = by_from.get(version)
+            if delta is None or delta["to"] <= version or len(chain) >= MAX_DELTA_CHAIN:
+                return None
+            chain.append(delta)
+            version = delta["to"]
+        return chain
+
+    def _store(self, index):
+        # A fresh file name per generation: scans may still have the previous
+        # index mapped, and Windows will not replace a mapped file
+        self.state["generation"] = self.state.get("generation", 0) + 1
+        name = f"signatures-{self.state['generation']}.idx"
+        index.save(os.path.join(self.db_dir, name))
+        self.state["index"] = name
+        self._save_state()
+        for old in glob.glob(os.path.join(self.db_dir, "signatures-*.idx")):
+            if os.path.basename(old) != name:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass  # still mapped somewhere; removed on a later update
+
+
+def apply_delta(index, lines):
+    """New index = index + "+hash" lines - "-hash" lines, merged in one sorted pass.
+
+    "+" lines may carry a size and head hash like full DB lines. Sizes and
+    heads of removed signatures are kept: a superset only costs a few
+    extra full hashes, never a missed file.
+    """
+    added, removed = set(), set()
+    sizes, heads = index.sizes(), index.heads()
+    patterns = dict((p, name) for name, p in index.patterns) if index.patterns else {}
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] not in "+-":
+            continue
+        if line[1:].startswith(PATTERN_PREFIX):
+            parsed = parse_pattern(line[1:])
+            if parsed is not None:
+                name, pattern = parsed
+                if line[0] == "+":
+                    patterns[pattern] = name
+                else:
+                    patterns.pop(pattern, None)
+            continue
+        if line[0] == "+":
+            record = parse_record(line[1:])
+            if record is None:
+                continue
+            digest, size, head = record
+            added.add(digest)
+            removed.discard(digest)
+            sizes = _add_or_drop(sizes, size)
+            heads = _add_or_drop(heads, head)
+        else:
+            digest = to_digest(line[1:])
+            if digest is None:
+                continue
+            removed.add(digest)
+            added.discard(digest)
+    merged = heapq.merge(index, sorted(added))
+    pattern_set = PatternSet((name, p) for p, name in patterns.items()) if patterns else None
+    return SignatureIndex.from_sorted_digests(_dedupe(merged, removed), sizes=sizes, heads=heads,
+                                              patterns=pattern_set)
+
+
+def _add_or_drop(values, value):
+    # Prefilter sets are only usable while every signature has a value
+    if values is None or value is None:
+        return None
+    values.add(value)
+    return values
+
+
+def _dedupe(sorted_digests, removed):
+    last = None
+    for digest in sorted_digests:
+        if digest != last and digest not in removed:
+            yield digest
+        last = digest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the local signature index.")
+    parser.add_argument("url", help="plain text DB or JSON manifest URL")
+    parser.add_argument("--dir", default=DB_DIR, help="where the index and update state are kept")
+    args = parser.parse_args(argv)
+    updater = SignatureUpdater(args.url, args.dir)
+    index = updater.update()
+    if index is None:
+        print(f"✅ Virus DB unchanged ({updater.downloaded_bytes} bytes downloaded)")
+    else:
+        print(f"✅ Virus DB updated: {len(index)} signatures in {updater.index_path}"
+              f" ({updater.downloaded_bytes} bytes downloaded)")
+
+
+if __name__ == "__main__":
+    main()
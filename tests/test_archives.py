@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+
+import archives
+from archives import GZIP, TAR, ZIP, ArchiveScanner, archive_kind
+from signature_index import SignatureIndex
+
+EVIL = b"evil file contents"
+
+
+def _signatures():
+    return SignatureIndex.from_hex([hashlib.sha256(EVIL).hexdigest()])
+
+
+def _zip_bytes(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def _nested(depth):
+    """A zip in a zip ... depth levels deep, EVIL in the innermost one."""
+    data = _zip_bytes({"evil": EVIL})
+    for level in range(depth - 1):
+        data = _zip_bytes({f"level{depth - 1 - level}.zip": data})
+    return data
+
+
+def _scan(path, **limits):
+    return ArchiveScanner(workers=1, **limits).scan(str(path), _signatures())
+
+
+def test_archive_kind_reads_magic_bytes(tmp_path):
+    assert archive_kind(_zip_bytes({"a": b"a"})) == ZIP
+    assert archive_kind(gzip.compress(b"data")) == GZIP
+    tar = io.BytesIO()
+    with tarfile.open(fileobj=tar, mode="w") as tf:
+        info = tarfile.TarInfo("a")
+        info.size = 1
+        tf.addfile(info, io.BytesIO(b"a"))
+    assert archive_kind(tar.getvalue()[:512]) == TAR
+    assert archive_kind(b"just text" * 100) is None
+    # The name does not matter, only the content
+    disguised = tmp_path / "photo.jpg"
+    disguised.write_bytes(_zip_bytes({"evil": EVIL}))
+    assert [r.path for r in _scan(disguised) if r.infected] == [f"{disguised}!evil"]
+    fake = tmp_path / "fake.zip"
+    fake.write_bytes(b"not an archive")
+    assert _scan(fake) == []
+
+
+def test_tar_gz_and_gzip_members(tmp_path):
+    tar = tmp_path / "bundle.tar.gz"
+    with tarfile.open(tar, "w:gz") as tf:
+        info = tarfile.TarInfo("dir/evil")
+        info.size = len(EVIL)
+        tf.addfile(info, io.BytesIO(EVIL))
+    assert [r.path for r in _scan(tar) if r.infected] == [f"{tar}!dir/evil"]
+    single = tmp_path / "evil.gz"
+    single.write_bytes(gzip.compress(EVIL))
+    assert [r.path for r in _scan(single) if r.infected] == [f"{single}!evil"]
+
+
+def test_zip_bomb_stops_at_the_byte_budget(tmp_path):
+    bomb = tmp_path / "bomb.zip"
+    bomb.write_bytes(_zip_bytes({"zeros": bytes(8 * 1024 * 1024), "evil": EVIL}))
+    assert bomb.stat().st_size < 64 * 1024
+    results = _scan(bomb, max_mb=1)
+    # The member over the budget is not reported as scanned, the archive gets the error
+    assert [r.error for r in results] == ["archive not fully scanned: more than 1 MB unpacked"]
+    assert results[0].path == str(bomb) and not results[0].infected
+
+
+def test_too_many_members(tmp_path):
+    many = tmp_path / "many.zip"
+    many.write_bytes(_zip_bytes({f"f{i}": b"%d" % i for i in range(50)}))
+    results = _scan(many, max_members=10)
+    scanned = [r for r in results if r.error is None]
+    assert len(scanned) == 10
+    assert results[-1].error == "archive not fully scanned: more than 10 members"
+
+
+def test_nesting_depth_limit(tmp_path):
+    deep = tmp_path / "deep.zip"
+    deep.write_bytes(_nested(5))
+    found = [r.path for r in _scan(deep, max_depth=5) if r.infected]
+    assert found == [f"{deep}!level1.zip!level2.zip!level3.zip!level4.zip!evil"]
+    # Not descended past max_depth: the innermost zip is hashed, not opened
+    results = _scan(deep, max_depth=3)
+    assert not any(r.infected for r in results)
+    assert results[-1].path == f"{deep}!level1.zip!level2.zip!level3.zip" and results[-1].error is None
+
+
+def test_large_nested_archive_is_not_held_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(archives, "MAX_NESTED_BYTES", 1024)
+    outer = tmp_path / "outer.zip"
+    inner = _zip_bytes({"evil": EVIL, "padding": os.urandom(4096)})
+    outer.write_bytes(_zip_bytes({"inner.zip": inner}))
+    results = _scan(outer)
+    assert [r.path for r in results] == [f"{outer}!inner.zip"] * 2
+    assert "not scanned inside" in results[1].error and not any(r.infected for r in results)
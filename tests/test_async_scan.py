@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import async_scan
+import scanner
+from async_scan import scan_async
+from signature_index import SignatureIndex
+
+EVIL = b"evil file contents"
+
+
+class _FakeEngine:
+    """scanner.scan_entry stand-in that records calls and can be held at a gate."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, target, *args):
+        self.calls.append(target)
+        self.gate.wait(10)
+        return [scanner.ScanResult(target, "00" * 32, False, None, 0)]
+
+
+class _FakeCache:
+    def __init__(self):
+        self.flushed_on = []
+
+    def flush(self):
+        self.flushed_on.append(threading.current_thread())
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = _FakeEngine()
+    monkeypatch.setattr(scanner, "scan_entry", engine)
+    return engine
+
+
+def _paths(n):
+    return [f"/data/{i}" for i in range(n)]
+
+
+def test_iterable_and_async_iterable_sources(tmp_path):
+    (tmp_path / "evil").write_bytes(EVIL)
+    (tmp_path / "safe").write_bytes(b"safe")
+    signatures = SignatureIndex.from_hex([hashlib.sha256(EVIL).hexdigest()])
+    paths = [str(tmp_path / "evil"), str(tmp_path / "safe")]
+
+    async def from_async():
+        for path in paths:
+            yield path
+
+    async def collect(source):
+        return {r.path: r.infected async for r in scan_async(source, signatures, workers=2)}
+
+    expected = {paths[0]: True, paths[1]: False}
+    assert asyncio.run(collect(iter(paths))) == expected
+    assert asyncio.run(collect(from_async())) == expected
+    assert asyncio.run(collect(str(tmp_path))) == expected
+
+
+def test_backpressure_bounds_files_in_flight(engine):
+    async def main():
+        results = scan_async(_paths(100), workers=2, max_pending=4)
+        await results.__anext__()
+        # The consumer stops reading: only the window is submitted, not the source
+        await asyncio.sleep(0.3)
+        in_flight = len(engine.calls)
+        await results.aclose()
+        return in_flight
+
+    assert asyncio.run(main()) <= 2 * 4
+
+
+def test_break_closes_the_scan_and_flushes_off_the_loop(engine):
+    cache = _FakeCache()
+
+    async def main():
+        async for _ in scan_async(_paths(1000), workers=2, max_pending=4, cache=cache):
+            break
+        await asyncio.sleep(0.2)  # the dropped generator is closed by the loop
+        return len(engine.calls)
+
+    calls = asyncio.run(main())
+    assert calls < 1000 and len(engine.calls) == calls
+    assert len(cache.flushed_on) == 1 and cache.flushed_on[0] is not threading.main_thread()
+
+
+class _RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submitted = []
+
+    def submit(self, *args, **kwargs):
+        future = super().submit(*args, **kwargs)
+        self.submitted.append(future)
+        return future
+
+
+def test_cancelling_the_consumer_releases_the_executor(engine):
+    executor = _RecordingExecutor(max_workers=1)
+    engine.gate.clear()
+
+    async def consume():
+        async for _ in scan_async(_paths(100), workers=1, max_pending=2 * async_scan.MAX_CHUNK,
+                                  executor=executor):
+            pass
+
+    async def main():
+        task = asyncio.get_running_loop().create_task(consume())
+        await asyncio.sleep(0.2)  # the first chunk is hashing, a second is queued behind it
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    try:
+        asyncio.run(main())
+        assert engine.calls == ["/data/0"]
+        first, queued = executor.submitted
+        assert queued.cancelled() and not first.cancelled()
+        engine.gate.set()
+        # The running chunk stops after its current file and the queued one
+        # was cancelled: the pool is free and nothing else is scanned
+        assert executor.submit(lambda: "free").result(timeout=5) == "free"
+        assert engine.calls == ["/data/0"]
+    finally:
+        executor.shutdown()
@@ -0,0 +1,75 @@
+import os
+import threading
+
+import scanner
+from checkpoint import ScanCheckpoint, walk_key
+
+# Names whose order differs between plain string sorting of paths, sorting
+# by name and sorting with files first: "a" / "a.txt" / "a-b" / "a b" / "B"
+NAMES = ["a", "a.txt", "a-b", "a b", "B", "b", "_x", "z9", "été"]
+
+
+def _tree(root):
+    files = []
+
+    def make(directory, depth):
+        os.makedirs(directory, exist_ok=True)
+        for name in NAMES:
+            path = os.path.join(directory, name)
+            if depth and name in ("a", "a b", "B"):
+                make(path, depth - 1)
+            else:
+                with open(path, "w") as f:
+                    f.write(path)
+                files.append(path)
+        for i in range(20):
+            path = os.path.join(directory, f"f{i}")
+            with open(path, "w") as f:
+                f.write(str(i))
+            files.append(path)
+
+    make(root, 3)
+    return set(files)
+
+
+def test_walk_key_follows_the_sorted_walk(tmp_path):
+    root = str(tmp_path / "tree")
+    files = _tree(root)
+    paths = [entry.path for entry in scanner.walk_entries(root, threading.Event(), sort=True)]
+    assert set(paths) == files
+    keys = [walk_key(root, path) for path in paths]
+    assert keys == sorted(keys)
+
+
+def _scan(root, directory, stop_after=None):
+    stopped = threading.Event()
+    checkpoint = ScanCheckpoint.load(root, directory, interval=3600)
+    scanned = []
+    for result in scanner.iter_scan(root, set(), stopped=stopped, workers=8, checkpoint=checkpoint):
+        scanned.append(result.path)
+        if stop_after is not None and len(scanned) >= stop_after:
+            stopped.set()
+    return scanned, checkpoint
+
+
+def test_stop_and_resume_with_workers_leaves_no_gaps(tmp_path):
+    root = str(tmp_path / "tree")
+    files = _tree(root)
+    directory = str(tmp_path / "checkpoints")
+    seen = set()
+    for stop_after in (37, 101, 15):
+        scanned, checkpoint = _scan(root, directory, stop_after)
+        assert len(scanned) == len(set(scanned))
+        seen.update(scanned)
+        assert ScanCheckpoint.exists(root, directory)
+        # Every file up to the saved position has been scanned by some run
+        saved = ScanCheckpoint.load(root, directory)
+        done = {path for path in files if walk_key(root, path) <= saved.position}
+        assert done <= seen
+        assert saved.scanned == len(done)
+    scanned, checkpoint = _scan(root, directory)
+    seen.update(scanned)
+    assert seen == files
+    assert not ScanCheckpoint.exists(root, directory)
+    # The last run only rescans files past the previous low-water mark
+    assert not {path for path in scanned if walk_key(root, path) <= saved.position}
@@ -0,0 +1,79 @@
+import hashlib
+import os
+
+import scanner
+from dedup import ScanDedup
+from hash_cache import HashCache
+from signature_index import SignatureIndex
+
+EVIL = b"evil file contents"
+PATTERN = b"needle in the haystack"
+
+
+def _signatures(*patterns):
+    lines = [hashlib.sha256(EVIL).hexdigest()]
+    lines += [f"pattern:P{i}:{pattern.hex()}" for i, pattern in enumerate(patterns)]
+    return SignatureIndex.from_hex(lines)
+
+
+def _count_reads(monkeypatch):
+    reads = []
+    hash_file = scanner._hash_file
+
+    def counting(path, *args, **kwargs):
+        reads.append(path)
+        return hash_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(scanner, "_hash_file", counting)
+    return reads
+
+
+def _scan(root, signatures, dedup, cache=None, workers=1):
+    return {r.path: r for r in scanner.iter_scan(str(root), signatures, workers=workers, cache=cache,
+                                                 dedup=dedup)}
+
+
+def test_hard_links_are_hashed_once(tmp_path, monkeypatch):
+    first = tmp_path / "first"
+    first.write_bytes(EVIL + bytes(1000))
+    for i in range(3):
+        os.link(first, tmp_path / f"link{i}")
+    reads = _count_reads(monkeypatch)
+    dedup = ScanDedup()
+    results = _scan(tmp_path, _signatures(), dedup, workers=4)
+    assert len(results) == 4 and len(reads) == 1
+    assert len({r.sha256 for r in results.values()}) == 1
+    assert [r.skipped for r in results.values()].count("duplicate") == 3
+    assert dedup.files == 3
+
+
+def test_copies_share_the_cached_hash_after_a_pattern_update(tmp_path, monkeypatch):
+    root = tmp_path / "tree"
+    root.mkdir()
+    data = os.urandom(100 * 1024) + PATTERN
+    for i in range(4):
+        (root / f"copy{i}").write_bytes(data)
+    (root / "other").write_bytes(os.urandom(100 * 1024))
+    cache = HashCache(str(tmp_path / "cache.db"))
+    # Hashed once under an old pattern set: every copy is in the cache
+    _scan(root, _signatures(b"an older pattern set"), None, cache)
+    reads = _count_reads(monkeypatch)
+    dedup = ScanDedup(content=True)
+    results = _scan(root, _signatures(PATTERN), dedup, cache)
+    copies = [results[str(root / f"copy{i}")] for i in range(4)]
+    # The new pattern set reads each content once, the copies get its verdict
+    assert len(reads) == 2
+    assert len({r.sha256 for r in copies}) == 1 and all(r.infected and r.match == "P0" for r in copies)
+    assert [r.skipped for r in copies].count("duplicate") == 3
+    assert dedup.bytes_saved == 3 * len(data)
+
+
+def test_content_mode_without_a_cached_hash_reads_every_copy(tmp_path, monkeypatch):
+    data = os.urandom(100 * 1024)
+    for i in range(3):
+        (tmp_path / f"copy{i}").write_bytes(data)
+    reads = _count_reads(monkeypatch)
+    dedup = ScanDedup(content=True)
+    results = _scan(tmp_path, _signatures(PATTERN), dedup)
+    assert len(reads) == 3 and dedup.files == 0
+    assert len({r.sha256 for r in results.values()}) == 1
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import scanner
+from distributed import (DONE, FAILED, FILES, QUEUED, RUNNING, TREE, Coordinator, ScanWorker, WorkUnit,
+                         serve, shard)
+
+EVIL = b"evil file contents"
+
+
+def _units(count):
+    return [WorkUnit(i + 1, FILES, [f"/data/{i + 1}"]) for i in range(count)]
+
+
+def _tree(root):
+    for i in range(6):
+        sub = root / f"d{i}" / "inner"
+        sub.mkdir(parents=True)
+        for j in range(5):
+            (sub / f"f{j}").write_bytes(b"%d %d" % (i, j))
+        (root / f"d{i}" / "top").write_bytes(b"top %d" % i)
+    for j in range(7):
+        (root / f"loose{j}").write_bytes(b"loose %d" % j)
+    (root / "evil").write_bytes(EVIL)
+
+
+def test_shard_covers_the_same_files_as_a_local_walk(tmp_path):
+    root = tmp_path / "tree"
+    _tree(root)
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "target").write_bytes(b"linked")
+    (outside / "in-linked-dir").write_bytes(b"not reached")
+    os.symlink(outside / "target", root / "file-link")
+    os.symlink(outside, root / "dir-link")
+    local = {entry.path for entry in scanner.walk_entries(str(root))}
+    assert str(root / "file-link") in local
+    for units, per_unit in ((1, 3), (4, 3), (20, 2), (1000, 100)):
+        covered = []
+        for unit in shard(str(root), units, per_unit):
+            if unit.kind == TREE:
+                covered.extend(entry.path for entry in scanner.walk_entries(unit.paths[0]))
+            else:
+                assert len(unit.paths) <= per_unit
+                covered.extend(unit.paths)
+        assert sorted(covered) == sorted(local)
+
+
+def test_lease_expires_without_heartbeat():
+    coordinator = Coordinator(_units(1), lease=0.2)
+    a, b = coordinator.register("a"), coordinator.register("b")
+    unit = coordinator.next_unit(a)
+    assert unit.state == RUNNING and unit.attempts == 1
+    # Heartbeats keep the lease
+    for _ in range(3):
+        time.sleep(0.1)
+        coordinator.renew(a, unit.id)
+        assert coordinator.next_unit(b, timeout=0) is None
+    time.sleep(0.3)
+    again = coordinator.next_unit(b, timeout=2)
+    assert again is unit and unit.attempts == 2 and list(unit.holders) == [b]
+    assert coordinator.complete(b, unit.id, 10, 0, [])
+    assert coordinator.wait(0)
+
+
+def test_disconnected_worker_unit_is_requeued():
+    coordinator = Coordinator(_units(2))
+    a, b = coordinator.register("a"), coordinator.register("b")
+    first = coordinator.next_unit(a)
+    coordinator.release(a)
+    assert first.state == QUEUED
+    assert coordinator.next_unit(b) is first
+
+
+def test_straggler_gets_a_second_copy_and_first_finish_counts():
+    coordinator = Coordinator(_units(1), straggler_after=0)
+    a, b = coordinator.register("a"), coordinator.register("b")
+    unit = coordinator.next_unit(a)
+    copy = coordinator.next_unit(b, timeout=2)
+    assert copy is unit and unit.copies == 1 and set(unit.holders) == {a, b}
+    # No third copy
+    assert coordinator.next_unit(coordinator.register("c"), timeout=0) is None
+    infected = [{"path": "/data/1/evil"}]
+    assert coordinator.complete(b, unit.id, 5, 1, infected)
+    assert not coordinator.complete(a, unit.id, 5, 1, infected)  # late copy
+    assert (coordinator.scanned, coordinator.errors, coordinator.infected_files) == (5, 1, ["/data/1/evil"])
+    assert unit.state == DONE and coordinator.wait(0)
+
+
+def test_unit_fails_after_max_attempts():
+    coordinator = Coordinator(_units(2), lease=0.05, max_attempts=2)
+    worker = coordinator.register("flaky")
+    bad = coordinator.next_unit(worker)
+    coordinator.release(worker)
+    assert coordinator.next_unit(worker) is bad and bad.attempts == 2
+    time.sleep(0.1)  # the lease runs out a second time
+    good = coordinator.next_unit(worker, timeout=2)
+    assert good is not bad
+    assert bad.state == FAILED and coordinator.failed == [bad]
+    assert coordinator.complete(worker, good.id, 1, 0, [])
+    assert coordinator.wait(0)
+
+
+def test_malformed_done_leaves_the_unit_running():
+    coordinator = Coordinator(_units(1))
+    worker = coordinator.register("a")
+    unit = coordinator.next_unit(worker)
+    with pytest.raises(KeyError):
+        coordinator.complete(worker, unit.id, 1, 0, [{"no path": True}])
+    assert unit.state == RUNNING and coordinator.scanned == 0 and not coordinator.infected_files
+
+
+def test_non_loopback_address_needs_a_token():
+    with pytest.raises(ValueError, match="token"):
+        serve(Coordinator([]), "0.0.0.0", 0)
+
+
+def _connect(server):
+    sock = socket.create_connection(server.server_address[:2], timeout=10)
+    return sock, sock.makefile("rb")
+
+
+def _send(sock, message):
+    sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+def test_bad_token_and_malformed_messages_over_tcp(capsys):
+    coordinator = Coordinator(_units(1), token="secret")
+    server = serve(coordinator, "127.0.0.1", 0)
+    try:
+        sock, rfile = _connect(server)
+        _send(sock, {"op": "hello", "name": "intruder"})
+        assert json.loads(rfile.readline())["error"] == "bad token"
+        sock.close()
+
+        sock, rfile = _connect(server)
+        _send(sock, {"op": "hello", "name": "broken", "token": "secret"})
+        assert json.loads(rfile.readline())["op"] == "welcome"
+        _send(sock, {"op": "next"})
+        unit_id = json.loads(rfile.readline())["unit"]
+        _send(sock, {"op": "done", "unit": unit_id})  # no counts, no results
+        assert rfile.readline() == b""  # the coordinator drops the worker...
+        sock.close()
+        assert coordinator.units[unit_id].state == QUEUED  # ...and re-queues its unit
+        assert "KeyError" in capsys.readouterr().err
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_workers_scan_a_tree_end_to_end(tmp_path):
+    root = tmp_path / "tree"
+    _tree(root)
+    coordinator = Coordinator(shard(str(root), 4, 3), token="secret")
+    server = serve(coordinator, "127.0.0.1", 0)
+    signatures = scanner.as_signatures({hashlib.sha256(EVIL).hexdigest()})
+    workers = [ScanWorker(server.server_address[:2], signatures, workers=2, token="secret", name=f"w{i}")
+               for i in range(3)]
+    threads = [threading.Thread(target=worker.run, daemon=True) for worker in workers]
+    try:
+        for thread in threads:
+            thread.start()
+        assert coordinator.wait(30)
+        for thread in threads:
+            thread.join(10)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert coordinator.scanned == len(list(scanner.walk_entries(str(root))))
+    assert coordinator.infected_files == [str(root / "evil")]
+    assert sum(worker.units for worker in workers) == len(coordinator.units)
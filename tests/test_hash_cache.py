@@ -0,0 +1,82 @@
+import os
+from types import SimpleNamespace
+
+import scanner
+from hash_cache import HashCache
+
+SHA = "ab" * 32
+
+
+def _st(size=10, mtime_ns=1000, ino=7):
+    return SimpleNamespace(st_size=size, st_mtime_ns=mtime_ns, st_ino=ino)
+
+
+def test_hash_is_reused_only_while_size_mtime_and_inode_match(tmp_path):
+    cache = HashCache(str(tmp_path / "cache.db"))
+    path = str(tmp_path / "f")
+    cache.store(path, _st(), SHA)
+    cache.flush()  # stores are batched
+    assert cache.lookup(path, _st()) == SHA
+    assert cache.lookup(path, _st(size=11)) is None
+    assert cache.lookup(path, _st(mtime_ns=1001)) is None
+    assert cache.lookup(path, _st(ino=8)) is None  # replaced by another file
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.close()
+
+
+def test_patterns_change_invalidates_entries(tmp_path):
+    cache = HashCache(str(tmp_path / "cache.db"))
+    path = str(tmp_path / "f")
+    cache.store(path, _st(), SHA, patterns="set-1")
+    cache.flush()
+    assert cache.lookup(path, _st(), patterns="set-1") == SHA
+    assert cache.lookup(path, _st(), patterns="set-2") is None
+    # Without patterns only the hash matters
+    assert cache.lookup(path, _st()) == SHA
+    cache.close()
+
+
+def test_prune_evicts_files_not_seen_by_the_run(tmp_path):
+    cache = HashCache(str(tmp_path / "cache.db"))
+    root = str(tmp_path / "root")
+    old = cache.begin_run()
+    for name in ("a", "b", "c"):
+        cache.store(os.path.join(root, name), _st(), SHA, run=old)
+    cache.store(str(tmp_path / "rootless"), _st(), SHA, run=old)  # shares the prefix, not the folder
+    cache.flush()
+    run = cache.begin_run()
+    assert cache.lookup(os.path.join(root, "a"), _st(), run=run) == SHA
+    cache.store(os.path.join(root, "b"), _st(), SHA, run=run)
+    assert cache.prune(root, run) == 1  # c is gone
+    assert len(cache) == 3
+    cache.close()
+
+
+def test_prune_after_a_resumed_run_keeps_files_seen_before_the_interruption(tmp_path):
+    cache = HashCache(str(tmp_path / "cache.db"))
+    root = str(tmp_path / "root")
+    first = cache.begin_run()
+    cache.store(os.path.join(root, "before"), _st(), SHA, run=first)  # scanned, then interrupted
+    cache.begin_run()  # another scan somewhere meanwhile
+    run = cache.resume_run(first)
+    assert run == first
+    cache.store(os.path.join(root, "after"), _st(), SHA, run=run)
+    assert cache.prune(root, run) == 0
+    assert len(cache) == 2
+    cache.close()
+
+
+def test_relative_paths_are_stored_absolute(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("tree")
+    for name in ("a", "b"):
+        with open(os.path.join("tree", name), "w") as f:
+            f.write(name)
+    cache = HashCache(str(tmp_path / "cache.db"))
+    list(scanner.scan_files(scanner.walk_entries("tree"), set(), cache=cache))
+    run = cache.begin_run()
+    os.remove(os.path.join("tree", "a"))
+    list(scanner.scan_files(scanner.walk_entries("tree"), set(), cache=cache, run=run))
+    assert cache.prune("tree", run) == 1
+    assert cache.lookup(str(tmp_path / "tree" / "b"), os.stat(os.path.join("tree", "b"))) is not None
+    cache.close()
@@ -0,0 +1,27 @@
+import os
+
+from hash_cache import HashCache
+from jobs import DONE, ScanJobManager
+
+
+def _tree(root, files):
+    os.makedirs(root)
+    for i in range(files):
+        with open(os.path.join(root, f"f{i}"), "wb") as f:
+            f.write(os.urandom(64))
+
+
+def test_jobs_sharing_a_cache_keep_each_others_rows(tmp_path):
+    roots = [str(tmp_path / name) for name in ("a", "b", "c")]
+    for root in roots:
+        _tree(root, 200)
+    cache = HashCache(str(tmp_path / "cache.db"))
+    for _ in range(2):
+        manager = ScanJobManager(workers=4, max_jobs=3, signatures=set(), cache=cache)
+        jobs = [manager.submit(root) for root in roots]
+        assert manager.wait(30)
+        manager.shutdown()
+        assert [job.state for job in jobs] == [DONE] * 3
+        cache.flush()
+        assert len(cache) == 600
+    cache.close()
@@ -0,0 +1,86 @@
+import threading
+
+import metrics
+from metrics import ScanMetrics
+
+GOLDEN = """\
+# TYPE sict_scan_elapsed_seconds gauge
+sict_scan_elapsed_seconds 2.0
+# TYPE sict_scan_bytes_read_total counter
+sict_scan_bytes_read_total 4096
+# TYPE sict_scan_files_total counter
+sict_scan_files_total 3
+# TYPE sict_scan_skipped_odd_reason_total counter
+sict_scan_skipped_odd_reason_total 1
+# TYPE sict_scan_stage_seconds_total counter
+sict_scan_stage_seconds_total{stage="walk"} 0.0
+sict_scan_stage_seconds_total{stage="stat"} 0.0
+sict_scan_stage_seconds_total{stage="cache"} 0.0
+sict_scan_stage_seconds_total{stage="read"} 0.0
+sict_scan_stage_seconds_total{stage="hash"} 0.75
+sict_scan_stage_seconds_total{stage="patterns"} 0.0
+sict_scan_stage_seconds_total{stage="lookup"} 0.0
+sict_scan_stage_seconds_total{stage="gui"} 0.0
+# TYPE sict_scan_stage_calls_total counter
+sict_scan_stage_calls_total{stage="walk"} 0
+sict_scan_stage_calls_total{stage="stat"} 0
+sict_scan_stage_calls_total{stage="cache"} 0
+sict_scan_stage_calls_total{stage="read"} 0
+sict_scan_stage_calls_total{stage="hash"} 2
+sict_scan_stage_calls_total{stage="patterns"} 0
+sict_scan_stage_calls_total{stage="lookup"} 0
+sict_scan_stage_calls_total{stage="gui"} 0
+# TYPE sict_scan_workers gauge
+sict_scan_workers 2
+# TYPE sict_scan_worker_utilization gauge
+sict_scan_worker_utilization 0.25
+# TYPE sict_scan_queue_depth gauge
+sict_scan_queue_depth 1
+# TYPE sict_scan_max_queue_depth gauge
+sict_scan_max_queue_depth 5
+"""
+
+
+def test_prometheus_golden_output():
+    m = ScanMetrics(workers=2)
+    m.started, m.finished = 100.0, 102.0
+    m.count("files", 3)
+    m.count("bytes_read", 4096)
+    m.count("skipped_odd-reason")  # not a valid metric name as it is
+    m.add_time("hash", 0.5)
+    m.add_time("hash", 0.25)
+    m.add_busy(1.0)
+    m.set_queue_depth(5)
+    m.set_queue_depth(1)
+    assert m.prometheus() == GOLDEN
+
+
+def test_label_values_are_escaped():
+    assert metrics._label_value('C:\\scan "x"\nnext') == 'C:\\\\scan \\"x\\"\\nnext'
+
+
+def test_timers_accumulate_across_threads(monkeypatch):
+    m = ScanMetrics()
+    clock = iter(range(0, 10 ** 6, 2))  # every call takes 2 "seconds"
+    monkeypatch.setattr(metrics.time, "perf_counter", lambda: next(clock))
+    add = m.timed("lookup", lambda a, b: a + b)
+    assert add(1, 2) == 3
+    reader = m.timed_reader(lambda buf: len(buf))
+    assert reader(bytearray(10)) == 10 and reader(bytearray(0)) == 0
+    assert list(m.timed_iter("walk", "ab")) == ["a", "b"]
+    monkeypatch.undo()
+    snap = m.snapshot()
+    assert snap["stages"]["lookup"] == {"seconds": 2, "calls": 1}
+    assert snap["stages"]["read"] == {"seconds": 4, "calls": 2}
+    assert snap["stages"]["walk"] == {"seconds": 6, "calls": 3}  # two items and the end
+    assert snap["counters"]["bytes_read"] == 10
+
+    shared = ScanMetrics()
+    threads = [threading.Thread(target=lambda: [shared.add_time("hash", 0.001) for _ in range(1000)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shared.stage_calls["hash"] == 8000
+    assert abs(shared.stage_seconds["hash"] - 8.0) < 1e-6
@@ -0,0 +1,65 @@
+import os
+import random
+
+from patterns import PatternSet, format_pattern, parse_pattern
+
+SHORT = b"0123456789abcdefXY"  # 18 bytes: stride 12
+LONG = bytes(range(100, 160))  # 60 bytes
+
+
+def _set():
+    return PatternSet([("Short", SHORT), ("Long", LONG)])
+
+
+def _stream(patterns, data, block_size):
+    stream = patterns.stream()
+    for start in range(0, len(data), block_size):
+        stream.feed(memoryview(data)[start:start + block_size])
+    return stream.match
+
+
+def test_parse_and_format():
+    line = format_pattern("Short", SHORT)
+    assert parse_pattern(line) == ("Short", SHORT)
+    assert parse_pattern("pattern:Tiny:abcd") is None  # below MIN_PATTERN_BYTES
+    assert parse_pattern("pattern:Bad:zz" + "00" * 20) is None
+    assert parse_pattern("e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855") is None
+    assert _set().stride == 12 and _set().max_len == len(LONG)
+
+
+def test_search_finds_a_pattern_at_every_offset():
+    # Occurrences that start between the stride words are found through the
+    # grams at their later offsets; compare with a plain substring search
+    patterns = _set()
+    rng = random.Random(1)
+    for pattern, name in ((SHORT, "Short"), (LONG, "Long")):
+        for offset in range(3 * patterns.stride):
+            noise = bytes(rng.randrange(256) for _ in range(200))
+            buf = noise[:offset] + pattern + noise[offset:]
+            assert patterns.search(buf) == name, offset
+            assert patterns.search(buf[:offset + len(pattern) - 1]) is None
+
+
+def test_pattern_split_across_blocks():
+    patterns = _set()
+    filler = os.urandom(4096)
+    for cut in range(1, len(LONG)):
+        data = filler[:4096 - cut] + LONG + filler
+        # The pattern straddles the first block boundary at every cut point
+        assert _stream(patterns, data, 4096) == "Long", cut
+    # Blocks shorter than the pattern keep enough tail to cover it
+    assert _stream(patterns, filler[:100] + LONG + filler[:100], 7) == "Long"
+
+
+def test_pattern_at_start_and_end_of_file():
+    patterns = _set()
+    filler = bytes(5000)
+    assert _stream(patterns, SHORT + filler, 1024) == "Short"
+    assert _stream(patterns, filler + SHORT, 1024) == "Short"
+    assert _stream(patterns, SHORT, 1024) == "Short"  # the whole file
+    assert _stream(patterns, filler + SHORT[:-1], 1024) is None
+
+
+def test_clean_data_has_no_match():
+    assert _stream(_set(), os.urandom(1 << 16), 4096) is None
+    assert PatternSet([]).search(b"anything at all") is None
@@ -0,0 +1,78 @@
+import errno
+import os
+
+import quarantine
+from quarantine import QuarantineStore, file_sha256
+
+
+def _file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_quarantine_moves_the_file_under_its_hash(tmp_path):
+    store = QuarantineStore(str(tmp_path / "q"))
+    path = _file(tmp_path / "evil", b"evil bytes")
+    sha256 = file_sha256(path)
+    assert store.quarantine([(path, sha256)]) == [(path, None)]
+    assert not os.path.exists(path)
+    assert file_sha256(store.object_path(sha256)) == sha256
+
+
+def test_file_changed_after_the_scan_is_left_in_place(tmp_path):
+    store = QuarantineStore(str(tmp_path / "q"))
+    path = _file(tmp_path / "evil", b"evil bytes")
+    sha256 = file_sha256(path)
+    _file(path, b"rewritten since the scan")
+    [(_, error)] = store.quarantine([(path, sha256)])
+    assert "changed" in error
+    assert open(path, "rb").read() == b"rewritten since the scan"
+    assert not os.path.exists(store.object_path(sha256))
+    assert not list(store._part_files())
+
+
+def test_changed_file_copied_across_filesystems_is_left_in_place(tmp_path, monkeypatch):
+    store = QuarantineStore(str(tmp_path / "q"))
+    path = _file(tmp_path / "evil", b"evil bytes")
+    sha256 = file_sha256(path)
+    _file(path, b"rewritten since the scan")
+    rename = os.rename
+
+    def cross_device(src, dst):
+        if src == path:
+            raise OSError(errno.EXDEV, "cross-device link")
+        rename(src, dst)
+
+    monkeypatch.setattr(quarantine.os, "rename", cross_device)
+    [(_, error)] = store.quarantine([(path, sha256)])
+    assert "changed" in error
+    assert os.path.exists(path)
+    assert not os.path.exists(store.object_path(sha256))
+    assert not list(store._part_files())
+
+
+def test_symlinks_are_not_quarantined(tmp_path):
+    store = QuarantineStore(str(tmp_path / "q"))
+    real = _file(tmp_path / "real", b"evil bytes")
+    link = str(tmp_path / "link")
+    os.symlink(real, link)
+    mode = os.stat(real).st_mode
+    [(_, error)] = store.quarantine([(link, file_sha256(real))])
+    assert "regular file" in error
+    assert os.path.islink(link)
+    assert os.stat(real).st_mode == mode
+
+
+def test_recover_puts_back_a_staged_file(tmp_path):
+    store = QuarantineStore(str(tmp_path / "q"))
+    path = _file(tmp_path / "evil", b"evil bytes")
+    sha256 = file_sha256(path)
+    [item] = store._journal(quarantine.QUARANTINE, [(path, sha256, os.lstat(path))])
+    # Crash right after the file was moved to its .part file
+    os.makedirs(os.path.dirname(store.object_path(sha256)), exist_ok=True)
+    os.rename(path, store._part_path(item))
+    assert store.pending() == 1
+    store.recover(rollback=True)
+    assert open(path, "rb").read() == b"evil bytes"
+    assert store.pending() == 0
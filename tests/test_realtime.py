@@ -0,0 +1,159 @@
+import errno
+import os
+import shutil
+import sys
+import threading
+import time
+
+import pytest
+
+import realtime
+from realtime import InotifyWatcher, PollingWatcher, RealtimeScanner
+from scope import ScanScope
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+
+
+class _Collector:
+    def __init__(self):
+        self.results = []
+        self.changed = threading.Condition()
+
+    def __call__(self, result):
+        with self.changed:
+            self.results.append(result)
+            self.changed.notify_all()
+
+    def wait_for(self, path, timeout=10):
+        with self.changed:
+            return self.changed.wait_for(lambda: path in self.paths(), timeout)
+
+    def paths(self):
+        return [result.path for result in self.results]
+
+
+@pytest.fixture
+def watched(tmp_path):
+    root = tmp_path / "watched"
+    (root / "sub").mkdir(parents=True)
+    collector = _Collector()
+    scanner = RealtimeScanner(str(root), collector, signatures=set(), debounce=0.2, settle=0.05,
+                              scope=ScanScope(exclude=["skip"]))
+    scanner.start()
+    time.sleep(0.3)  # watches in place
+    yield root, collector
+    scanner.stop()
+
+
+def _write(path, data=b"data"):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@linux_only
+def test_created_modified_and_moved_in_files_are_scanned(watched, tmp_path):
+    root, collector = watched
+    created = str(root / "sub" / "new")
+    _write(created)
+    assert collector.wait_for(created)
+    collector.results.clear()
+    with open(created, "ab") as f:  # modified in place
+        f.write(b" more")
+    assert collector.wait_for(created)
+    # Moved in from outside, as a file and inside a whole folder
+    _write(tmp_path / "outside")
+    moved = str(root / "moved")
+    os.rename(tmp_path / "outside", moved)
+    (tmp_path / "folder").mkdir()
+    _write(tmp_path / "folder" / "inner")
+    shutil.move(str(tmp_path / "folder"), str(root / "sub" / "folder"))
+    assert collector.wait_for(moved)
+    assert collector.wait_for(str(root / "sub" / "folder" / "inner"))
+
+
+@linux_only
+def test_events_outside_the_scope_are_not_scanned(watched):
+    root, collector = watched
+    (root / "skip").mkdir()
+    _write(root / "skip" / "excluded")
+    _write(root / "sub" / "skip")
+    _write(root / "kept")
+    assert collector.wait_for(str(root / "kept"))
+    time.sleep(0.5)
+    assert collector.paths() == [str(root / "kept")]
+
+
+def test_polling_fallback_scans_changes(tmp_path, monkeypatch):
+    class NoInotify:
+        def __init__(self, *args):
+            raise OSError(errno.ENOSYS, "no inotify here")
+
+    class FastPolling(PollingWatcher):
+        def __init__(self, root, interval=0.1, scope=None):
+            super().__init__(root, interval, scope)
+
+    monkeypatch.setattr(realtime, "InotifyWatcher", NoInotify)
+    monkeypatch.setattr(realtime, "PollingWatcher", FastPolling)
+    collector = _Collector()
+    scanner = RealtimeScanner(str(tmp_path), collector, signatures=set(), debounce=0.1, settle=0.05)
+    scanner.start()
+    try:
+        time.sleep(0.3)
+        _write(tmp_path / "polled")
+        assert collector.wait_for(str(tmp_path / "polled"))
+    finally:
+        scanner.stop()
+
+
+@linux_only
+def test_unreadable_folders_are_skipped(tmp_path, monkeypatch):
+    (tmp_path / "locked").mkdir()
+    (tmp_path / "open").mkdir()
+    scandir = os.scandir
+
+    def locked_scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(errno.EACCES, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(realtime.os, "scandir", locked_scandir)
+    watcher = InotifyWatcher(str(tmp_path))
+    try:
+        assert str(tmp_path / "open") in watcher.dirs.values()
+    finally:
+        watcher.close()
+
+
+@linux_only
+def test_watch_limit_keeps_the_watches_made_so_far(tmp_path, monkeypatch, capsys):
+    for name in "abcdef":
+        (tmp_path / name).mkdir()
+    watch = InotifyWatcher._watch
+
+    def limited(self, path):
+        if len(self.dirs) >= 3:
+            raise OSError(errno.ENOSPC, "No space left on device", path)
+        watch(self, path)
+
+    monkeypatch.setattr(InotifyWatcher, "_watch", limited)
+    watcher = InotifyWatcher(str(tmp_path))
+    try:
+        assert watcher.full and len(watcher.dirs) == 3
+        assert "inotify watches" in capsys.readouterr().out
+    finally:
+        watcher.close()
+
+
+@linux_only
+def test_failed_setup_closes_the_inotify_fd(tmp_path, monkeypatch):
+    opened = []
+
+    def broken(self, top, report=False):
+        opened.append(self.fd)
+        raise RuntimeError("setup failed")
+
+    monkeypatch.setattr(InotifyWatcher, "_watch_tree", broken)
+    with pytest.raises(RuntimeError):
+        InotifyWatcher(str(tmp_path))
+    with pytest.raises(OSError):
+        os.fstat(opened[0])
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import json
+import sqlite3
+
+import pytest
+
+import results_store
+import scanner
+from results_store import ResultStore
+from scanner import ScanResult
+
+
+def _result(i):
+    return ScanResult(f"/data/f{i}", hashlib.sha256(b"%d" % i).hexdigest(), False, None, i)
+
+
+def test_keep_scans_prunes_old_scans_but_not_running_ones(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), keep_scans=2)
+    running = store.begin_scan("/long")
+    store.record(running, _result(0))
+    finished = []
+    for n in range(5):
+        scan = store.begin_scan("/data")
+        for i in range(10):
+            store.record(scan, _result(i))
+        store.end_scan(scan)
+        finished.append(scan)
+    store.flush()
+    scans = [row[0] for row in store.scans()]
+    assert scans == [finished[-1], finished[-2], running]
+    assert [row[0] for row in store.iter_rows()] == [running] + [finished[-2]] * 10 + [finished[-1]] * 10
+    store.end_scan(running)
+    assert [row[0] for row in store.scans()] == [finished[-1], finished[-2]]
+    store.close()
+
+
+def test_results_are_off_unless_configured(tmp_path):
+    assert ResultStore.from_settings({}) is None
+    store = ResultStore.from_settings({"results_db": str(tmp_path / "r.db")})
+    assert store.keep_scans
+    store.close()
+
+
+def test_hosts_with_hash_rejects_malformed_digests(tmp_path, capsys):
+    path = str(tmp_path / "results.db")
+    store = ResultStore(path, host="alpha")
+    scan = store.begin_scan("/data")
+    store.record(scan, _result(1))
+    store.end_scan(scan)
+    sha256 = _result(1).sha256
+    assert [row[:2] for row in store.hosts_with_hash(sha256)] == [("alpha", 1)]
+    for bad in ("zz" * 32, sha256[:-2], sha256 + "00", ""):
+        with pytest.raises(ValueError, match="not a SHA-256"):
+            store.hosts_with_hash(bad)
+    store.close()
+    assert results_store.main(["--db", path, "hosts", "not-a-hash"]) == 2
+    assert "not a SHA-256" in capsys.readouterr().err
+
+
+def test_per_file_duration_is_stored_and_exported(tmp_path):
+    (tmp_path / "file").write_bytes(b"x" * 100000)
+    result = scanner.scan_file(str(tmp_path / "file"), set())
+    assert result.duration is not None and result.duration >= 0
+    store = ResultStore(str(tmp_path / "results.db"))
+    scan = store.begin_scan(str(tmp_path))
+    store.record(scan, result)
+    store.record(scan, result._replace(path="/cached", duration=None))
+    store.end_scan(scan)
+    out = io.StringIO()
+    assert store.export(out, "jsonl") == 2
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert rows[0]["duration"] == result.duration and rows[1]["duration"] is None
+    store.close()
+
+
+def test_older_results_files_get_the_duration_column(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE scans (id INTEGER PRIMARY KEY, host TEXT, root TEXT, started REAL,"
+               " finished REAL, state TEXT, files INTEGER, infected INTEGER, errors INTEGER)")
+    db.execute("INSERT INTO scans VALUES (1, 'old', '/old', 0, 0, 'done', 1, 0, 0)")
+    db.execute("CREATE TABLE results (scan INTEGER, time REAL, path TEXT, size INTEGER, sha256 BLOB,"
+               " verdict INTEGER, signature TEXT, detail TEXT, container TEXT)")
+    db.execute("INSERT INTO results VALUES (1, 0, '/old', 1, NULL, 0, NULL, NULL, NULL)")
+    db.commit()
+    db.close()
+    store = ResultStore(path)
+    scan = store.begin_scan("/new")
+    store.record(scan, _result(2))
+    store.end_scan(scan)
+    assert [(row[3], row[-1]) for row in store.iter_rows()] == [("/old", None), ("/data/f2", None)]
+    store.close()
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from hash_cache import HashCache
+import scan_daemon
+from scan_daemon import ScanClient, ScanService, make_server
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+EVIL = b"evil file contents"
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    db = tmp_path / "db.txt"
+    db.write_text(hashlib.sha256(EVIL).hexdigest() + "\n")
+    service = ScanService([str(db)], HashCache(str(tmp_path / "cache.db")), workers=4)
+    service.load()
+    service.start()
+    path = str(tmp_path / "daemon.sock")
+    server = make_server(service, path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+@pytest.fixture
+def client(daemon):
+    client = ScanClient(daemon, timeout=10)
+    yield client
+    client.close()
+
+
+def _file(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_scan_requests(client, tmp_path):
+    evil = _file(tmp_path / "evil", EVIL)
+    safe = _file(tmp_path / "safe", b"nothing to see")
+    assert client.scan(evil)["infected"] is True
+    response = client.scan(safe)
+    assert response["infected"] is False and response["sha256"] == hashlib.sha256(b"nothing to see").hexdigest()
+    batch = client.request("scan", paths=[evil, safe])["results"]
+    assert [r["infected"] for r in batch] == [True, False]
+    pipelined = {r["path"]: r["infected"] for r in client.scan_many([evil, safe] * 20, window=8)}
+    assert pipelined == {evil: True, safe: False}
+    assert client.scan_bytes(EVIL, "upload")["infected"] is True
+    assert client.lookup(hashlib.sha256(EVIL).hexdigest())["infected"] is True
+    assert client.request("ping")["pong"] is True
+
+
+def test_scan_dir(client, tmp_path):
+    tree = tmp_path / "tree"
+    (tree / "sub").mkdir(parents=True)
+    _file(tree / "evil", EVIL)
+    for i in range(30):
+        _file(tree / "sub" / f"f{i}", b"%d" % i)
+    results = list(client.scan_dir(str(tree)))
+    assert len(results) == 31
+    assert [r["path"] for r in results if r["infected"]] == [str(tree / "evil")]
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="no FIFOs on this platform")
+def test_special_files_do_not_tie_up_the_daemon(client, tmp_path):
+    fifo = str(tmp_path / "fifo")
+    os.mkfifo(fifo)
+    for path in (fifo, "/dev/zero"):
+        assert client.scan(path)["skipped"] == "special"
+    assert client.request("ping")["pong"] is True
+
+
+def test_bad_requests_get_errors(client, daemon):
+    assert "bad size" in client.request("scan_bytes", size=-1)["error"]
+    assert "unknown op" in client.request("nope")["error"]
+    assert "error" in client.request("scan")  # no path
+    # The connection still works after each of them
+    assert client.scan_bytes(b"abc")["sha256"] == hashlib.sha256(b"abc").hexdigest()
+    raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    raw.connect(daemon)
+    raw.sendall(b"not json\n")
+    assert "bad request" in json.loads(raw.makefile("rb").readline())["error"]
+    raw.close()
+
+
+def test_live_socket_is_not_taken_over(daemon):
+    with pytest.raises(OSError, match="another scan daemon"):
+        make_server(ScanService(), daemon)
+    # ...and the running daemon still answers
+    client = ScanClient(daemon, timeout=10)
+    assert client.request("ping")["pong"] is True
+    client.close()
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = str(tmp_path / "stale.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()  # the file stays, nobody listens
+    server = make_server(ScanService(), path)
+    server.server_close()
+    regular = _file(tmp_path / "not-a-socket", b"keep me")
+    with pytest.raises(OSError, match="not a socket"):
+        make_server(ScanService(), regular)
+    assert os.path.exists(regular)
+
+
+def test_client_refuses_a_socket_served_by_another_user(daemon, monkeypatch):
+    monkeypatch.setattr(scan_daemon, "_socket_owner", lambda sock, path: 4242)
+    with pytest.raises(PermissionError, match="uid 4242"):
+        ScanClient(daemon, timeout=10)
+
+
+def test_default_socket_is_per_user(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    assert scan_daemon.default_socket() == str(tmp_path / "run" / "sict-scan.sock")
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setattr(tempfile, "gettempdir", lambda: str(tmp_path))
+    path = scan_daemon.default_socket()
+    assert path == str(tmp_path / f"sict-{os.getuid()}" / "sict-scan.sock")
+    scan_daemon._private_dir(os.path.dirname(path))
+    assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+    # Someone made the directory first (or loosened it): not used
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(OSError):
+        scan_daemon._private_dir(str(shared))
+
+
+def test_tcp_needs_a_token(tmp_path):
+    with pytest.raises(ValueError, match="token"):
+        make_server(ScanService(), port=0)
+    service = ScanService([], HashCache(str(tmp_path / "cache.db")))
+    service.start()
+    server = make_server(service, port=0, token="s3cret")
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with pytest.raises(PermissionError, match="bad token"):
+            ScanClient(port=port, timeout=10, token="guess")
+        # A client that skips the hello is dropped too
+        client = ScanClient(port=port, timeout=10)
+        assert client.request("ping") == {"error": "bad token", "id": 1}
+        with pytest.raises(ConnectionError):
+            client.request("ping")
+        client.close()
+        client = ScanClient(port=port, timeout=10, token="s3cret")
+        assert client.request("ping")["pong"] is True
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
@@ -0,0 +1,73 @@
+import hashlib
+import os
+
+import pytest
+
+import scan_cli
+import scanner
+from metrics import ScanMetrics
+from signature_index import HEAD_BYTES, SignatureIndex
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="no FIFOs on this platform")
+def test_special_files_are_skipped_not_read(tmp_path):
+    fifo = str(tmp_path / "fifo")
+    os.mkfifo(fifo)
+    # Opening either of these for reading would block or never reach EOF
+    for path in (fifo, "/dev/zero"):
+        result = scanner.scan_file(path, set())
+        assert result.skipped == "special" and result.sha256 is None and not result.error
+    results = list(scanner.scan_files([fifo], set(), workers=2))
+    assert [result.skipped for result in results] == ["special"]
+    db = tmp_path / "db.txt"
+    db.write_text("")
+    assert scan_cli.main(["--db", str(db), fifo]) == 0
+
+
+def _prefilter_db(*extra):
+    """An index where every signature has a size and a head hash, for one evil file."""
+    head_bytes = HEAD_BYTES
+    evil = os.urandom(3 * head_bytes)
+    head = hashlib.sha256(evil[:head_bytes]).hexdigest()
+    lines = [f"{hashlib.sha256(evil).hexdigest()} {len(evil)} {head}", *extra]
+    return SignatureIndex.from_hex(lines), evil, head_bytes
+
+
+def _scan(path, signatures):
+    metrics = ScanMetrics()
+    result = scanner.scan_file(str(path), signatures, metrics=metrics)
+    return result, metrics.counters["bytes_read"]
+
+
+def test_size_and_head_prefilters_skip_hashing(tmp_path):
+    signatures, evil, head_bytes = _prefilter_db()
+    assert signatures.has_sizes and signatures.has_heads
+    (tmp_path / "evil").write_bytes(evil)
+    result, read = _scan(tmp_path / "evil", signatures)
+    assert result.infected and read == len(evil)
+    # Another size: cleared from the stat alone, never opened
+    (tmp_path / "other-size").write_bytes(evil + b"!")
+    result, read = _scan(tmp_path / "other-size", signatures)
+    assert (result.skipped, result.sha256, read) == ("size", None, 0)
+    # Same size, other first bytes: only the head is read
+    (tmp_path / "other-head").write_bytes(b"?" + evil[1:])
+    result, read = _scan(tmp_path / "other-head", signatures)
+    assert (result.skipped, result.sha256, read) == ("head", None, head_bytes)
+    # Same head, other tail: hashed in full and found clean
+    (tmp_path / "other-tail").write_bytes(evil[:-1] + b"?")
+    result, read = _scan(tmp_path / "other-tail", signatures)
+    assert result.skipped is None and not result.infected and read == len(evil)
+
+
+def test_byte_patterns_turn_the_prefilters_off(tmp_path):
+    needle = b"needle in the haystack"
+    signatures, evil, head_bytes = _prefilter_db(f"pattern:Needle:{needle.hex()}")
+    # Neither the size nor the head matches a signature, but the pattern is there
+    data = os.urandom(5 * head_bytes) + needle
+    (tmp_path / "patterned").write_bytes(data)
+    result, read = _scan(tmp_path / "patterned", signatures)
+    assert result.infected and result.match == "Needle" and result.skipped is None
+    assert read == len(data)
+    (tmp_path / "clean").write_bytes(b"?" + evil[1:])
+    result, read = _scan(tmp_path / "clean", signatures)
+    assert not result.infected and result.skipped is None and read == len(evil)
@@ -0,0 +1,84 @@
+import os
+
+import scanner
+from scope import DEFAULT_EXCLUDE, ScanScope
+
+
+def _tree(root):
+    files = {
+        "keep.txt": b"k",
+        "app.EXE": b"x" * 100,
+        "notes.tmp": b"t",
+        "big.bin": b"b" * 5000,
+        "src/main.py": b"print()",
+        "src/node_modules/dep.js": b"js",
+        "src/cache/blob": b"c",
+        "src/.cache/blob": b"c",
+        "logs/today.log": b"l",
+        "logs/old/archive.log": b"l",
+    }
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return root
+
+
+def _walk(root, scope):
+    return sorted(os.path.relpath(entry.path, root).replace(os.sep, "/")
+                  for entry in scanner.walk_entries(str(root), scope=scope))
+
+
+def test_name_path_and_regex_excludes(tmp_path):
+    root = _tree(tmp_path)
+    scope = ScanScope(exclude=["node_modules", "*.tmp", f"{root}/logs/old", "*/cache/*", r"re:/\.cache/"])
+    assert _walk(root, scope) == ["app.EXE", "big.bin", "keep.txt", "logs/today.log", "src/main.py"]
+    # node_modules and logs/old are pruned; */cache/* drops the file, not the folder
+    assert scope.pruned == 2
+    assert scope.skipped == 3
+
+
+def test_include_extension_and_size_filters(tmp_path):
+    root = _tree(tmp_path)
+    assert _walk(root, ScanScope(include=["*.log"])) == ["logs/old/archive.log", "logs/today.log"]
+    assert _walk(root, ScanScope(extensions=["exe", ".py"])) == ["app.EXE", "src/main.py"]
+    assert "app.EXE" not in _walk(root, ScanScope(skip_extensions=["EXE"]))
+    assert _walk(root, ScanScope(min_size=50)) == ["app.EXE", "big.bin"]
+    assert _walk(root, ScanScope(min_size=50, max_size=1000)) == ["app.EXE"]
+
+
+def test_excluded_folders_are_never_opened(tmp_path, monkeypatch):
+    root = _tree(tmp_path)
+    opened = []
+    scandir = os.scandir
+    monkeypatch.setattr(scanner.os, "scandir", lambda path: (opened.append(path), scandir(path))[1])
+    _walk(root, ScanScope(exclude=["src"]))
+    assert str(root / "logs") in opened
+    assert not [path for path in opened if "src" in os.path.relpath(path, root)]
+
+
+def test_one_filesystem_stays_on_the_root_device(tmp_path, monkeypatch):
+    root = _tree(tmp_path)
+    scope = ScanScope(one_filesystem=True)
+    assert scope.root_device(str(root)) == os.stat(root).st_dev
+    assert len(_walk(root, scope)) == 10 and scope.pruned == 0
+    # Every subfolder looks like another mount
+    monkeypatch.setattr(scope, "root_device", lambda directory: os.stat(directory).st_dev + 1)
+    assert _walk(root, scope) == ["app.EXE", "big.bin", "keep.txt", "notes.tmp"]
+    assert scope.pruned == 2
+
+
+def test_accept_path_checks_every_parent_folder(tmp_path):
+    root = _tree(tmp_path)
+    scope = ScanScope(exclude=["node_modules"], extensions=["js", "py"])
+    assert scope.accept_path(str(root / "src" / "main.py"), str(root))
+    assert not scope.accept_path(str(root / "src" / "node_modules" / "dep.js"), str(root))
+    assert not scope.accept_path(str(root / "keep.txt"), str(root))
+
+
+def test_settings_default_exclude():
+    scope = ScanScope.from_settings({})
+    assert scope is not None
+    assert scope.exclude.match("proc", "/proc") and not scope.exclude.match(".git", "/repo/.git")
+    assert ".git" not in DEFAULT_EXCLUDE
+    assert ScanScope.from_settings({"scan_exclude": []}) is None
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import sys
+from array import array
+
+import pytest
+
+import signature_index
+from signature_index import MAGIC, SignatureIndex
+
+PATTERN_LINE = "pattern:Needle:" + b"needle in the haystack".hex()
+
+
+def _digest(prefix, fill):
+    return bytes(prefix) + bytes([fill]) * 30
+
+
+def test_build_save_and_open(tmp_path):
+    digests = [hashlib.sha256(b"%d" % i).digest() for i in range(500)]
+    lines = [f"{d.hex()} {i + 10} {hashlib.sha256(b'head').hexdigest()}" for i, d in enumerate(digests)]
+    index = SignatureIndex.from_hex(lines + [PATTERN_LINE], bloom_bits=10)
+    path = str(tmp_path / "db.idx")
+    index.save(path)
+    opened = SignatureIndex.open(path)
+    try:
+        assert len(opened) == 500 and list(opened) == sorted(digests)
+        assert all(d in opened and d.hex() in opened for d in digests)
+        assert hashlib.sha256(b"missing").digest() not in opened
+        assert opened.may_match_size(10) and not opened.may_match_size(9)
+        assert opened.may_match_head(hashlib.sha256(b"head").digest())
+        assert not opened.may_match_head(hashlib.sha256(b"other").digest())
+        assert [name for name, _ in opened.patterns] == ["Needle"]
+    finally:
+        opened.close()
+    (tmp_path / "text.idx").write_bytes(b"not an index at all")
+    with pytest.raises(ValueError):
+        SignatureIndex.open(str(tmp_path / "text.idx"))
+
+
+def test_hits_and_misses_at_bucket_boundaries():
+    # First and last digest of neighbouring buckets, and empty buckets between
+    present = [_digest((0, 0), 0), _digest((0, 0), 255), _digest((0, 1), 0), _digest((0, 255), 7),
+               _digest((1, 0), 0), _digest((255, 255), 255)]
+    index = SignatureIndex.from_digests(present)
+    assert all(d in index for d in present)
+    for missing in (_digest((0, 0), 1), _digest((0, 2), 0), _digest((0, 254), 7), _digest((0, 255), 8),
+                    _digest((1, 1), 0), _digest((255, 255), 0), _digest((128, 0), 0)):
+        assert missing not in index
+    assert b"short" not in index and "zz" * 32 not in index
+    empty = SignatureIndex.from_digests([])
+    assert present[0] not in empty and len(empty) == 0
+
+
+def _write_v1(path, index):
+    # Version 1 files: the shorter header, no heads, sizes or patterns
+    table = array("Q", index._table)
+    if sys.byteorder == "big":
+        table.byteswap()
+    with open(path, "wb") as f:
+        f.write(signature_index._HEADER_V1.pack(MAGIC, 1, 0, len(index), index._bloom_size, index._bloom_k))
+        f.write(table.tobytes())
+        f.write(index._buf[index._base:index._heads_at])
+
+
+def test_version_1_files_still_open(tmp_path):
+    digests = [hashlib.sha256(os.urandom(8)).digest() for _ in range(300)]
+    path = str(tmp_path / "v1.idx")
+    _write_v1(path, SignatureIndex.from_digests(digests, bloom_bits=8))
+    index = SignatureIndex.open(path)
+    try:
+        assert all(d in index for d in digests)
+        assert hashlib.sha256(b"missing").digest() not in index
+        assert not index.has_sizes and not index.has_heads and index.patterns is None
+        assert index.may_match_size(123)
+    finally:
+        index.close()
+
+
+def test_bloom_filter_never_hides_a_signature():
+    digests = [hashlib.sha256(b"sig %d" % i).digest() for i in range(5000)]
+    for bits in (1, 4, 10):
+        index = SignatureIndex.from_digests(digests, bloom_bits=bits)
+        assert index._bloom_size and all(d in index for d in digests)
+    # With 10 bits per signature most misses stop at the filter
+    index = SignatureIndex.from_digests(digests, bloom_bits=10)
+    probes = [hashlib.sha256(b"miss %d" % i).digest() for i in range(2000)]
+    passed = sum(all(index._buf[index._bloom_at + (p >> 3)] & (1 << (p & 7))
+                     for p in signature_index._bloom_positions(d, index._bloom_k, index._bloom_bits))
+                 for d in probes)
+    assert passed < 100
+    assert not any(d in index for d in probes)
+
+
+def test_union_merges_signatures_prefilters_and_patterns():
+    a = SignatureIndex.from_hex([f"{hashlib.sha256(b'a').hexdigest()} 1", PATTERN_LINE], bloom_bits=10)
+    b = SignatureIndex.from_hex([f"{hashlib.sha256(b'b').hexdigest()} 2",
+                                 f"{hashlib.sha256(b'a').hexdigest()} 1"], bloom_bits=4)
+    union = SignatureIndex.union([a, b])
+    assert len(union) == 2 and hashlib.sha256(b"b").digest() in union
+    assert union.sizes() == {1, 2} and union.patterns is not None
+    # The densest input filter is kept unless asked otherwise
+    assert union._bloom_bits // len(union) >= 10
+    assert SignatureIndex.union([a, b], bloom_bits=0)._bloom_size == 0
+    # One input without sizes turns the size prefilter off
+    c = SignatureIndex.from_hex([hashlib.sha256(b"c").hexdigest()])
+    assert not SignatureIndex.union([a, c]).has_sizes
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from signature_index import SignatureIndex
+from signature_updates import SignatureUpdater, apply_delta
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _record(i, size=True):
+    """A full DB line for signature i: "<sha256> <size> <head sha256>"."""
+    line = _sha(b"file %d" % i)
+    return f"{line} {100 + i} {_sha(b'head %d' % i)}" if size else line
+
+
+PATTERN_A = "pattern:EvilA:" + (b"evil-pattern-a-bytes".hex())
+PATTERN_B = "pattern:EvilB:" + (b"evil-pattern-b-bytes".hex())
+
+
+def _assert_same(delta_index, full_index):
+    assert list(delta_index) == list(full_index)
+    assert sorted(delta_index.patterns or ()) == sorted(full_index.patterns or ())
+    # Sizes / heads of removed signatures may be kept: the delta-built
+    # prefilter can be weaker than a rebuild, never stricter
+    for mine, theirs in ((delta_index.sizes(), full_index.sizes()),
+                         (delta_index.heads(), full_index.heads())):
+        if mine is not None:
+            assert theirs is not None and mine >= theirs
+
+
+def test_delta_chain_matches_full_rebuild():
+    index = SignatureIndex.from_hex([_record(i) for i in range(50)] + [PATTERN_A])
+    deltas = [
+        ["+" + _record(i) for i in range(50, 60)] + ["-" + _sha(b"file %d" % i) for i in range(0, 10)],
+        ["+" + _record(5), "-" + _sha(b"file 55"), "+" + PATTERN_B, "-" + PATTERN_A, "junk", ""],
+    ]
+    for delta in deltas:
+        index = apply_delta(index, delta)
+    final = ([_record(i) for i in range(5, 6)] + [_record(i) for i in range(10, 60) if i != 55]
+             + [PATTERN_B])
+    full = SignatureIndex.from_hex(final)
+    _assert_same(index, full)
+    assert index.has_sizes and index.has_heads
+    assert index.sizes() == full.sizes() | {100 + i for i in range(10) if i != 5} | {155}
+
+
+def test_delta_without_sizes_drops_the_prefilters():
+    index = SignatureIndex.from_hex([_record(i) for i in range(20)])
+    assert index.has_sizes and index.has_heads
+    index = apply_delta(index, ["+" + _record(20, size=False), "-" + _sha(b"file 3")])
+    full = SignatureIndex.from_hex([_record(i) for i in range(20) if i != 3] + [_record(20, size=False)])
+    _assert_same(index, full)
+    assert not index.has_sizes and not index.has_heads
+    assert not full.has_sizes and not full.has_heads
+    # Once dropped, later deltas with sizes do not bring a partial set back
+    index = apply_delta(index, ["+" + _record(21)])
+    assert not index.has_sizes and not index.has_heads
+    assert bytes.fromhex(_sha(b"file 21")) in index
+
+
+# === HTTP feed ===
+class _Feed:
+    """Files served over HTTP with ETags; records every request."""
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []  # (path, status)
+
+    def handler(self):
+        feed = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = feed.files.get(self.path.lstrip("/"))
+                if body is None:
+                    feed.requests.append((self.path, 404))
+                    self.send_error(404)
+                    return
+                etag = '"%s"' % _sha(body)[:16]
+                if self.headers.get("If-None-Match") == etag:
+                    feed.requests.append((self.path, 304))
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                feed.requests.append((self.path, 200))
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def feed():
+    feed = _Feed()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), feed.handler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    feed.url = f"http://127.0.0.1:{server.server_address[1]}/manifest.json"
+    yield feed
+    server.shutdown()
+    server.server_close()
+
+
+def _publish(feed, version, lines, deltas=()):
+    feed.files[f"full-{version}.txt"] = "\n".join(lines).encode()
+    manifest = {"version": version, "full": f"full-{version}.txt", "deltas": []}
+    for start, end, delta in deltas:
+        name = f"delta-{start}-{end}.txt"
+        feed.files[name] = "\n".join(delta).encode()
+        manifest["deltas"].append({"from": start, "to": end, "url": name})
+    feed.files["manifest.json"] = json.dumps(manifest).encode()
+
+
+def test_updater_applies_deltas_and_switches_generation(feed, tmp_path):
+    db_dir = str(tmp_path / "db")
+    v1 = [_record(i) for i in range(30)]
+    _publish(feed, 1, v1)
+    updater = SignatureUpdater(feed.url, db_dir)
+    index = updater.update()
+    assert len(index) == 30 and updater.state["version"] == 1
+    first = updater.index_path
+
+    # Unchanged manifest: the ETag is sent back and the server answers 304
+    feed.requests.clear()
+    assert updater.update(index) is None
+    assert feed.requests == [("/manifest.json", 304)]
+
+    d12 = ["+" + _record(i) for i in range(30, 40)]
+    d23 = ["-" + _sha(b"file %d" % i) for i in range(0, 5)] + ["+" + PATTERN_A]
+    v3 = [_record(i) for i in range(5, 40)] + [PATTERN_A]
+    _publish(feed, 3, v3, [(1, 2, d12), (2, 3, d23)])
+    feed.requests.clear()
+    new = updater.update(index)
+    # Only the manifest and the two deltas are downloaded, not the full DB
+    assert [path for path, _ in feed.requests] == ["/manifest.json", "/delta-1-2.txt", "/delta-2-3.txt"]
+    _assert_same(new, SignatureIndex.from_hex(v3))
+    assert updater.state["version"] == 3
+    # A new index file per generation; the old one is removed
+    assert updater.index_path != first
+    assert not os.path.exists(first)
+    index.close()
+
+    # A fresh updater (next start) loads the same index without the network
+    again = SignatureUpdater(feed.url, db_dir).load_local()
+    assert list(again) == list(new)
+    again.close()
+    new.close()
+
+
+def test_updater_falls_back_to_full_db_when_chain_is_incomplete(feed, tmp_path):
+    updater = SignatureUpdater(feed.url, str(tmp_path / "db"))
+    _publish(feed, 1, [_record(i) for i in range(10)])
+    updater.update().close()
+    v5 = [_record(i) for i in range(3, 15)]
+    _publish(feed, 5, v5, [(1, 2, ["+" + _record(10)])])  # 2 -> 5 is missing
+    feed.requests.clear()
+    index = updater.update()
+    assert [path for path, _ in feed.requests] == ["/manifest.json", "/full-5.txt"]
+    _assert_same(index, SignatureIndex.from_hex(v5))
+    index.close()
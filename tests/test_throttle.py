@@ -0,0 +1,120 @@
+import threading
+
+import throttle
+from throttle import Throttle, TokenBucket
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Waits:
+    """threading.Event stand-in for stopped= that records the delays asked for."""
+
+    def __init__(self, stop=False):
+        self.delays = []
+        self.stop = stop
+
+    def wait(self, delay):
+        self.delays.append(delay)
+        return self.stop
+
+
+def test_token_bucket_rate_and_debt(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(throttle.time, "monotonic", clock)
+    bucket = TokenBucket(100)
+    waits = _Waits()
+    assert bucket.take(100, 100, waits) and waits.delays == []  # one second's burst is free
+    assert bucket.take(50, 100, waits) and waits.delays == [0.5]
+    clock.now += 1.0
+    assert bucket.take(50, 100, waits) and waits.delays == [0.5]  # the debt was paid off
+    # A file bigger than the bucket leaves it in debt for the next take
+    assert bucket.take(300, 100, waits) and waits.delays[-1] == 3.0
+    clock.now += 0.5
+    assert bucket.take(10, 100, waits) and waits.delays[-1] == 2.6
+    assert not bucket.take(10, 100, _Waits(stop=True))  # stopped while waiting
+    assert TokenBucket(0).take(10 ** 9, 0, waits)  # rate 0 = unlimited
+
+
+def test_acquire_scales_the_budget_with_the_factor(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(throttle.time, "monotonic", clock)
+    limited = Throttle(bytes_per_sec=1000, files_per_sec=10, adaptive=False)
+    limited.factor = 0.5
+    waits = _Waits()
+    for _ in range(5):
+        assert limited.acquire(100, waits)  # 5 files / 500 bytes: the halved burst
+    assert waits.delays == []
+    assert limited.acquire(100, waits)
+    assert waits.delays == [0.2, 0.2]  # one file at 5/s, 100 bytes at 500 B/s
+    limited.unlimited = True
+    assert limited.acquire(10 ** 9, waits) and len(waits.delays) == 2
+
+
+class _Rounds:
+    """Drives the governor: one round per wait(), with the load given for it."""
+
+    def __init__(self, monkeypatch, loads):
+        self.loads = list(loads)
+        self.load = None
+        monkeypatch.setattr(throttle, "_load_per_cpu", lambda: self.load)
+
+    def wait(self, timeout):
+        if not self.loads:
+            return True
+        self.load = self.loads.pop(0)
+        return False
+
+
+def _govern(monkeypatch, loads, **kwargs):
+    monkeypatch.setattr(throttle._DiskLatency, "sample", lambda self: None)
+    governed = Throttle(bytes_per_sec=1000, **kwargs)
+    governed._stopped = _Rounds(monkeypatch, loads)
+    governed._govern()
+    return governed
+
+
+def test_governor_backs_off_under_load(monkeypatch):
+    governed = _govern(monkeypatch, [2.0] * 3)
+    assert governed.factor == 1 / 8 and governed.state == "backoff" and not governed.unlimited
+    governed = _govern(monkeypatch, [2.0] * 20)
+    assert governed.factor == throttle.MIN_FACTOR
+
+
+def test_governor_ramps_up_and_lifts_the_budget_when_idle(monkeypatch):
+    governed = _govern(monkeypatch, [2.0] * 4 + [0.5])  # busy, then normal load
+    assert governed.factor == 1 / 16 * 1.25 and governed.state == "normal"
+    rounds = [2.0] * 2 + [0.1] * (throttle.IDLE_ROUNDS - 1)
+    governed = _govern(monkeypatch, rounds)
+    assert governed.factor == 1 / 4 and governed.state == "backoff"  # not idle long enough yet
+    governed = _govern(monkeypatch, rounds + [0.1] * 2)
+    assert governed.factor == 1.0 and governed.unlimited and governed.state == "idle"
+    governed = _govern(monkeypatch, [0.1] * 5, idle_full_speed=False)
+    assert governed.factor == 1.0 and not governed.unlimited
+
+
+def test_manual_scans_keep_normal_priority():
+    settings = {"low_priority_scans": True, "adaptive_throttle": True, "throttle_mb_per_sec": 2}
+    background = Throttle.from_settings(settings)
+    assert background.low_priority and background.adaptive
+    manual = Throttle.from_settings(settings, background=False)
+    assert not manual.low_priority and not manual.adaptive
+    assert manual.bytes_per_sec == 2 * 1024 * 1024  # a hard budget still applies
+
+
+def test_process_nice_is_applied_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(throttle.sys, "platform", "darwin")
+    monkeypatch.setattr(throttle.os, "nice", calls.append, raising=False)
+    monkeypatch.setattr(throttle, "_process_lowered", False)
+    workers = [threading.Thread(target=throttle.lower_thread_priority) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert calls == [10]
@@ -0,0 +1,241 @@
+"""Background-friendly scanning: bandwidth budgets, low priority, adaptive backoff.
+
+A Throttle passed to scanner.iter_scan / scan_files (throttle=...) limits
+how fast files are handed to the hashing threads:
+
+* token buckets cap bytes/s and files/s (0 = no limit),
+* hashing threads run at low CPU priority (nice) and, on Linux, in the
+  idle I/O class (ionice -c3), so production work on the same disks wins,
+* a governor thread watches load average and disk latency every second,
+  halves the budget when the machine is busy and ramps back up when it is
+  quiet. With idle_full_speed the budgets are lifted entirely while the
+  machine is idle.
+"""
+import ctypes
+import ctypes.util
+import os
+import platform
+import sys
+import threading
+import time
+
+GOVERNOR_INTERVAL = 1.0
+MIN_FACTOR = 1 / 32     # never slow down below this share of the budget
+BUSY_LOAD = 0.75        # load average per CPU above which scans back off
+IDLE_LOAD = 0.25        # ... and below which the machine counts as idle
+BUSY_LATENCY_MS = 20.0  # average disk I/O time above which scans back off
+SLOW_READ_RATIO = 3.0   # without disk stats: back off when reads are this much slower than the best seen
+IDLE_ROUNDS = 3         # quiet governor rounds before ramping up
+
+# ioprio_set(2): IOPRIO_WHO_PROCESS with a thread id applies to that thread
+_IOPRIO_SET = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "armv7l": 314}
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+
+# Off Linux nice applies to the whole process: lowered once, not per thread
+_process_lowered = False
+_process_lock = threading.Lock()
+
+
+class TokenBucket:
+    """rate units per second with bursts up to one second's worth; rate 0 = unlimited."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, amount, rate, stopped):
+        """Wait until amount can be spent at rate. Returns False if stopped meanwhile.
+
+        Amounts bigger than the bucket (a large file) are allowed: the bucket
+        goes into debt and the following takes wait it off.
+        """
+        if not rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(rate, self.tokens + (now - self.stamp) * rate)
+            self.stamp = now
+            self.tokens -= amount
+            delay = -self.tokens / rate if self.tokens < 0 else 0
+        if delay > 0:
+            return not stopped.wait(delay)
+        return True
+
+
+class Throttle:
+    def __init__(self, bytes_per_sec=0, files_per_sec=0, low_priority=True, adaptive=True,
+                 idle_full_speed=True):
+        self.bytes_per_sec = bytes_per_sec
+        self.files_per_sec = files_per_sec
+        self.low_priority = low_priority
+        self.adaptive = adaptive
+        self.idle_full_speed = idle_full_speed
+        self.factor = 1.0  # share of the budget currently allowed
+        self.unlimited = False  # True while the machine is idle
+        self.state = "normal"
+        self._bytes = TokenBucket(bytes_per_sec)
+        self._files = TokenBucket(files_per_sec)
+        self._reads = [0, 0.0]  # bytes hashed, seconds spent (latency fallback)
+        self._reads_lock = threading.Lock()
+        self._best_read = None  # fastest seconds per byte seen
+        self._stopped = threading.Event()
+        self._governor = None
+        self._users = 0  # scans currently using this throttle
+        self._users_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings, background=True):
+        """background=False (a scan the user is waiting for) keeps normal priority, no backoff."""
+        return cls(bytes_per_sec=int(settings.get("throttle_mb_per_sec", 0) * 1024 * 1024),
+                   files_per_sec=settings.get("throttle_files_per_sec", 0),
+                   low_priority=background and settings.get("low_priority_scans", True),
+                   adaptive=background and settings.get("adaptive_throttle", True))
+
+    # --- used by the scanner ---
+    def start(self):
+        # One throttle may pace several concurrent scans (jobs.py); the
+        # governor runs while any of them does
+        with self._users_lock:
+            self._users += 1
+            if self.adaptive and self._governor is None:
+                self._stopped = threading.Event()
+                self._governor = threading.Thread(target=self._govern, daemon=True)
+                self._governor.start()
+
+    def stop(self):
+        with self._users_lock:
+            self._users -= 1
+            if self._users <= 0:
+                self._users = 0
+                self._stopped.set()
+                self._governor = None
+
+    def acquire(self, size, stopped):
+        """Block until one more file of size bytes fits the budget. False once stopped."""
+        if self.unlimited:
+            return True
+        return (self._files.take(1, self.files_per_sec * self.factor, stopped)
+                and self._bytes.take(size, self.bytes_per_sec * self.factor, stopped))
+
+    def note_read(self, size, seconds):
+        """Time one file took to read and hash (latency fallback off Linux)."""
+        with self._reads_lock:
+            self._reads[0] += size
+            self._reads[1] += seconds
+
+    def init_worker(self):
+        """Lower the calling thread's CPU and I/O priority (pool initializer)."""
+        if self.low_priority:
+            lower_thread_priority()
+
+    # --- governor ---
+    def _govern(self):
+        quiet = 0
+        disk = _DiskLatency()
+        stopped = self._stopped
+        while not stopped.wait(GOVERNOR_INTERVAL):
+            load = _load_per_cpu()
+            latency = disk.sample()
+            if latency is not None:
+                slow_disk = latency > BUSY_LATENCY_MS
+            else:
+                slow_disk = self._reads_slowed_down()
+            busy = (load is not None and load > BUSY_LOAD) or slow_disk
+            idle = load is not None and load < IDLE_LOAD and not busy
+            if busy:
+                quiet = 0
+                self.unlimited = False
+                self.factor = max(MIN_FACTOR, self.factor / 2)
+                self.state = "backoff"
+            elif idle:
+                quiet += 1
+                if quiet >= IDLE_ROUNDS:
+                    self.factor = min(1.0, self.factor * 2)
+                    self.unlimited = self.idle_full_speed and self.factor == 1.0
+                    self.state = "idle"
+            else:
+                quiet = 0
+                self.unlimited = False
+                self.factor = min(1.0, self.factor * 1.25)
+                self.state = "normal"
+
+    def _reads_slowed_down(self):
+        # Compares our own read speed with the best seen so far; also counts
+        # hashing time, so only a large slowdown means the disk is contended
+        with self._reads_lock:
+            size, seconds = self._reads
+            self._reads = [0, 0.0]
+        if size < 1024 * 1024:
+            return False
+        per_byte = seconds / size
+        if self._best_read is None or per_byte < self._best_read:
+            self._best_read = per_byte
+        return per_byte > self._best_read * SLOW_READ_RATIO
+
+
+def _load_per_cpu():
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):  # Windows
+        return None
+
+
+class _DiskLatency:
+    """Average milliseconds per completed disk I/O since the last sample (Linux)."""
+
+    def __init__(self):
+        self._last = self._totals()
+
+    @staticmethod
+    def _totals():
+        try:
+            with open("/proc/diskstats") as f:
+                ios = ms = 0
+                for line in f:
+                    fields = line.split()
+                    # whole disks only, skip partitions / loop / ram devices
+                    name = fields[2]
+                    if name.startswith(("loop", "ram", "zram")) or not os.path.isdir(f"/sys/block/{name}"):
+                        continue
+                    ios += int(fields[3]) + int(fields[7])
+                    ms += int(fields[6]) + int(fields[10])
+                return ios, ms
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def sample(self):
+        current = self._totals()
+        last, self._last = self._last, current
+        if current is None or last is None or current[0] == last[0]:
+            return None
+        return (current[1] - last[1]) / (current[0] - last[0])
+
+
+def lower_thread_priority():
+    """nice +10 and idle I/O class for the calling thread, best-effort.
+
+    Elsewhere than Linux nice is per process, so the process is lowered
+    once, on the first call, instead of another +10 per hashing thread.
+    """
+    global _process_lowered
+    try:
+        if sys.platform.startswith("linux"):
+            # On Linux priorities are per thread; tid 0 is the caller
+            os.setpriority(os.PRIO_PROCESS, 0, min(19, os.getpriority(os.PRIO_PROCESS, 0) + 10))
+        elif hasattr(os, "nice"):
+            with _process_lock:
+                if not _process_lowered:
+                    _process_lowered = True
+                    os.nice(10)
+    except OSError as e:
+        print(f"⚠️ Could not lower scan priority: {e}")
+    if sys.platform.startswith("linux"):
+        number = _IOPRIO_SET.get(platform.machine())
+        if number is None:
+            return
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if libc.syscall(number, 1, 0, _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT) != 0:
+            print(f"⚠️ Could not set idle I/O priority: {os.strerror(ctypes.get_errno())}")